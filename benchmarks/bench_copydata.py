@@ -0,0 +1,54 @@
+"""
+Compare `pulse.core.copyData` against the pymetanode
+encode/decode round trip that it replaced.
+
+Usage:
+    mayapy benchmarks/bench_copydata.py src/pulse [--nodes 500] [--number 10]
+"""
+
+import argparse
+import timeit
+
+import mayastandalone
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('package', help='path to the pulse package, e.g. src/pulse')
+    parser.add_argument('--nodes', type=int, default=500,
+                        help='number of node references in the copied data')
+    parser.add_argument('--number', type=int, default=10,
+                        help='number of copies to time for each method')
+    args = parser.parse_args()
+
+    mayastandalone.initialize(args.package)
+
+    # lazy loading to wait for maya env to be initialized
+    import pymel.core as pm
+    import pymetanode as meta
+    import pulse
+
+    pm.newFile(force=True)
+    nodes = [pm.group(em=True, n='node{0}'.format(i)) for i in range(args.nodes)]
+    data = {
+        'name': 'test',
+        'count': 3,
+        'nodes': nodes,
+        'nested': {'values': [1, 2.0, [3, 4]], 'node': nodes[0]},
+    }
+
+    methods = [
+        ('copyData', lambda: pulse.core.copyData(data)),
+        ('encode/decode', lambda: meta.decodeMetaData(meta.encodeMetaData(data))),
+    ]
+    print('{0} node(s), {1} copies each'.format(args.nodes, args.number))
+    baseline = None
+    for name, func in methods:
+        seconds = timeit.timeit(func, number=args.number)
+        if baseline is None:
+            baseline = seconds
+        print('{0:>14}: {1:.4f}s ({2:.1f}x)'.format(
+            name, seconds, seconds / baseline if baseline else 0))
+
+
+main()
@@ -0,0 +1,73 @@
+"""
+Time the `runBatch` implementations of built-in actions on a large batch,
+and compare them with running each action of the batch separately.
+
+Usage:
+    mayapy benchmarks/bench_runbatch.py src/pulse [--actions 500] [--number 5]
+"""
+
+import argparse
+import time
+
+import mayastandalone
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('package', help='path to the pulse package, e.g. src/pulse')
+    parser.add_argument('--actions', type=int, default=500,
+                        help='number of actions in each batch')
+    parser.add_argument('--number', type=int, default=5,
+                        help='number of times to run each method')
+    args = parser.parse_args()
+
+    mayastandalone.initialize(args.package)
+
+    # lazy loading to wait for maya env to be initialized
+    import pymel.core as pm
+    import pulse
+
+    pulse.loadBuiltinActions()
+
+    def createAnimControls():
+        return [pulse.getActionClass('AnimControl')(
+            controlNode=pm.group(em=True, n='ctl{0}'.format(i)),
+            keyableAttrs=['t', 'r'])
+            for i in range(args.actions)]
+
+    def createConstraints():
+        actions = []
+        for i in range(args.actions):
+            leader = pm.group(em=True, n='leader{0}'.format(i))
+            follower = pm.group(em=True, n='follower{0}'.format(i))
+            pm.move(leader, i, 0, 0)
+            actions.append(pulse.getActionClass('SimpleConstrain')(leader=leader, follower=follower))
+        return actions
+
+    def runEach(actions):
+        for action in actions:
+            action.run()
+
+    def runBatch(actions):
+        errors = actions[0].runBatch(actions)
+        assert not any(errors), errors
+
+    methods = [
+        ('AnimControl', createAnimControls),
+        ('SimpleConstrain', createConstraints),
+    ]
+    print('{0} action(s) per batch, best of {1} runs'.format(args.actions, args.number))
+    for name, createActions in methods:
+        for runName, run in [('run', runEach), ('runBatch', runBatch)]:
+            times = []
+            for _ in range(args.number):
+                # every run changes the scene, so start each one with new nodes
+                pm.newFile(force=True)
+                actions = createActions()
+                startTime = time.time()
+                run(actions)
+                times.append(time.time() - startTime)
+            print('{0:>16} {1:>8}: {2:.4f}s'.format(name, runName, min(times)))
+
+
+main()
@@ -0,0 +1,64 @@
+"""
+Time `pulse.BlueprintValidator` on a large blueprint, and compare its
+serial attribute checks with the same checks mapped over a thread pool.
+
+Usage:
+    mayapy benchmarks/bench_validation.py src/pulse [--actions 1500] [--number 10]
+"""
+
+import argparse
+import timeit
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import mayastandalone
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('package', help='path to the pulse package, e.g. src/pulse')
+    parser.add_argument('--actions', type=int, default=1500,
+                        help='number of actions in the validated blueprint')
+    parser.add_argument('--number', type=int, default=10,
+                        help='number of times to run each method')
+    parser.add_argument('--chunkSize', type=int, default=200,
+                        help='number of actions checked by each thread task')
+    args = parser.parse_args()
+
+    mayastandalone.initialize(args.package)
+
+    # lazy loading to wait for maya env to be initialized
+    import pymel.core as pm
+    import pulse
+
+    pm.newFile(force=True)
+    pulse.loadBuiltinActions()
+    blueprint = pulse.Blueprint()
+    group = pulse.BuildGroup(displayName='Main')
+    blueprint.rootGroup.addChild(group)
+    for i in range(args.actions):
+        action = pulse.getActionClass('AnimControl')()
+        action.controlNode = pm.group(em=True, n='ctl{0}'.format(i))
+        group.addChild(action)
+
+    validator = pulse.BlueprintValidator(blueprint)
+    items = list(blueprint.getPlan().actionIterator())
+    chunks = [items[i:i + args.chunkSize] for i in range(0, len(items), args.chunkSize)]
+    pool = ThreadPool(cpu_count())
+
+    methods = [
+        ('serial checks', lambda: validator._checkAttrValues(items)),
+        ('threaded checks', lambda: pool.map(validator._checkAttrValues, chunks)),
+        ('full validation', validator.run),
+    ]
+    print('{0} action(s), {1} thread(s), {2} runs each'.format(len(items), cpu_count(), args.number))
+    try:
+        for name, func in methods:
+            seconds = timeit.timeit(func, number=args.number) / args.number
+            print('{0:>16}: {1:.4f}s'.format(name, seconds))
+    finally:
+        pool.close()
+        pool.join()
+
+
+main()
@@ -0,0 +1,30 @@
+
+import sys
+import os
+import maya.standalone
+
+
+def updateSysPaths():
+    """
+    Update sys.path to contain any missing script paths
+    found in MAYA_SCRIPT_PATH. This must be performed
+    after maya standalone is initialized
+    """
+    scriptPaths = os.environ['MAYA_SCRIPT_PATH'].split(os.pathsep)
+    for p in scriptPaths:
+        if p not in sys.path:
+            sys.path.append(p)
+
+
+def initialize(packagePath):
+    """
+    Initialize maya standalone and make the given
+    pulse package importable ahead of any installed version
+
+    Args:
+        packagePath: A str path to the pulse package, e.g. 'src/pulse'
+    """
+    maya.standalone.initialize()
+    updateSysPaths()
+    moduleScripts = os.path.join(packagePath, 'scripts')
+    sys.path.insert(0, os.path.abspath(moduleScripts))
@@ -5,6 +5,7 @@ import logging
 from .version import *
 from .core import *
 from .loader import *
+from .validation import *
 
 
 LOG = logging.getLogger("pulse")
@@ -7,6 +7,30 @@ import pulse.nodes
 
 class SimpleConstrainAction(pulse.BuildAction):
 
+    @classmethod
+    def runBatch(cls, actions):
+        # maya's constraint commands only constrain one node at a time,
+        # so the offsets of all followers are created first, then every
+        # follower is constrained, without the constraints being
+        # evaluated each time another offset is inserted
+        errors = [None] * len(actions)
+        followers = [None] * len(actions)
+        for index, action in enumerate(actions):
+            try:
+                action.validate()
+                followers[index] = action.getConstrainedNode()
+            except Exception as error:
+                errors[index] = error
+
+        for index, action in enumerate(actions):
+            if errors[index] is not None:
+                continue
+            try:
+                action.constrain(followers[index])
+            except Exception as error:
+                errors[index] = error
+        return errors
+
     def validate(self):
         if not self.leader:
             raise pulse.BuildActionError("leader must be set")
@@ -14,7 +38,14 @@ class SimpleConstrainAction(pulse.BuildAction):
             raise pulse.BuildActionError("follower must be set")
 
     def run(self):
+        self.validate()
+        self.constrain(self.getConstrainedNode())
 
+    def getConstrainedNode(self):
+        """
+        Return the node to constrain, creating an offset
+        transform for the follower if necessary
+        """
         shouldCreateOffset = False
         if self.createFollowerOffset == 0:
             # Always
@@ -23,19 +54,26 @@ class SimpleConstrainAction(pulse.BuildAction):
             # Exclude Joints and the follower is not a joint
             shouldCreateOffset = True
 
-        _follower = self.follower
         if shouldCreateOffset:
-            _follower = pulse.nodes.createOffsetGroup(self.follower)
+            return pulse.nodes.createOffsetGroup(self.follower)
+        return self.follower
+
+    def constrain(self, follower):
+        """
+        Constrain a node to the leader
 
+        Args:
+            follower: The follower, or its offset transform
+        """
         # parent constrain (translate and rotate)
-        pc = pm.parentConstraint(self.leader, _follower, mo=True)
+        pc = pm.parentConstraint(self.leader, follower, mo=True)
         # set interpolation mode to Shortest
         pc.interpType.set(2)
 
         # scale constrain
-        sc = pm.scaleConstraint(self.leader, _follower, mo=True)
+        sc = pm.scaleConstraint(self.leader, follower, mo=True)
         if self.worldSpaceScaling:
-            pulse.nodes.makeScaleConstraintWorldSpace(sc)
+            pulse.nodes.convertScaleConstraintToWorldSpace(sc)
 
         # lockup the constraints
         pulse.nodes.setConstraintLocked(pc, True)
@@ -7,31 +7,88 @@ import pulse
 import pulse.nodes
 
 
+# attributes that are locked unless they are keyable
+LOCKABLE_ATTRS = ['t', 'r', 'rp', 's', 'sp', 'ra', 'sh', 'v']
+
+
+def getAttrStates(keyableAttrs):
+    """
+    Return the expanded (keyable, locked) attribute names of a control
+
+    Args:
+        keyableAttrs: A list of attribute names that can be animated
+    """
+    keyableAttrs = pulse.nodes.getExpandedAttrNames(keyableAttrs)
+    lockedAttrs = pulse.nodes.getExpandedAttrNames(LOCKABLE_ATTRS)
+    lockedAttrs = list(set(lockedAttrs) - set(keyableAttrs))
+    return keyableAttrs, lockedAttrs
+
+def setAttrStates(nodeName, keyableAttrs, lockedAttrs):
+    """
+    Make attributes of a control keyable or locked, setting all
+    states of an attribute with one setAttr command instead of
+    one pymel call per state
+
+    Args:
+        nodeName: A string long name of the control
+        keyableAttrs: A list of expanded attribute names to make keyable
+        lockedAttrs: A list of expanded attribute names to lock
+    """
+    for attrName in keyableAttrs:
+        pm.cmds.setAttr(nodeName + '.' + attrName, keyable=True)
+
+    for attrName in lockedAttrs:
+        pm.cmds.setAttr(nodeName + '.' + attrName, keyable=False, channelBox=False, lock=True)
+
+    # show rotate order in channel box
+    pm.cmds.setAttr(nodeName + '.rotateOrder', lock=True, channelBox=True)
+
+
 class AnimControlAction(pulse.BuildAction):
 
+    @classmethod
+    def runBatch(cls, actions):
+        # maya's setAttr only changes one attribute at a time, so all
+        # controls are set up first, then the attribute states of every
+        # control are set, expanding attribute names once per set of keyable attrs
+        errors = [None] * len(actions)
+        for index, action in enumerate(actions):
+            try:
+                action.setupControl()
+            except Exception as error:
+                errors[index] = error
+
+        # {keyable attrs: (expanded keyable attrs, expanded locked attrs)}
+        attrStates = {}
+        for index, action in enumerate(actions):
+            if errors[index] is not None:
+                continue
+            try:
+                key = tuple(action.keyableAttrs)
+                if key not in attrStates:
+                    attrStates[key] = getAttrStates(action.keyableAttrs)
+                setAttrStates(action.controlNode.longName(), *attrStates[key])
+            except Exception as error:
+                errors[index] = error
+        return errors
+
+    def validate(self):
+        if not self.controlNode:
+            raise pulse.BuildActionError("controlNode must be set")
+
     def run(self):
+        self.setupControl()
+        setAttrStates(self.controlNode.longName(), *getAttrStates(self.keyableAttrs))
+
+    def setupControl(self):
+        """
+        Tag the control node and create its offset transform
+        """
+        self.validate()
+
         # add meta class to the control, making it
         # easy to search for by anim tools, etc
         meta.setMetaData(self.controlNode, self.config['controlMetaClass'], {})
 
         if self.createOffset:
-            offsetNode = pulse.nodes.createOffsetGroup(self.controlNode)
-
-        # lockup attributes
-        keyableAttrs = pulse.nodes.getExpandedAttrNames(self.keyableAttrs)
-        lockedAttrs = pulse.nodes.getExpandedAttrNames(['t', 'r', 'rp', 's', 'sp', 'ra', 'sh', 'v'])
-        lockedAttrs = list(set(lockedAttrs) - set(keyableAttrs))
-
-        for attrName in keyableAttrs:
-            attr = self.controlNode.attr(attrName)
-            attr.setKeyable(True)
-
-        for attrName in lockedAttrs:
-            attr = self.controlNode.attr(attrName)
-            attr.setKeyable(False)
-            attr.showInChannelBox(False)
-            attr.setLocked(True)
-
-        # show rotate order in channel box
-        self.controlNode.rotateOrder.setLocked(True)
-        self.controlNode.rotateOrder.showInChannelBox(True)
+            pulse.nodes.createOffsetGroup(self.controlNode)
@@ -0,0 +1,34 @@
+
+import pymel.core as pm
+
+import pulse
+import pulse.controlshapes
+
+
+class CreateControlAction(pulse.BuildAction):
+
+    # the control and its shapes are the only nodes created,
+    # so they can be cached and imported when nothing has changed
+    memoize = True
+
+    def validate(self):
+        if not self.controlName:
+            raise pulse.BuildActionError("controlName must be set")
+        if not self.getShapeData():
+            raise pulse.BuildActionError("Control shape not found: {0}".format(self.shape))
+
+    def getShapeData(self):
+        """
+        Return the registered control shape data for this control
+        """
+        pulse.controlshapes.loadBuiltinControlShapes()
+        return pulse.controlshapes.CONTROLSHAPES.get(self.shape)
+
+    def getMemoInputs(self):
+        # the shape data can change without changing the shape name
+        return super(CreateControlAction, self).getMemoInputs() + [self.getShapeData()]
+
+    def run(self):
+        self.validate()
+        pulse.controlshapes.createControl(
+            self.getShapeData(), name=self.controlName, targetNode=self.targetNode, parent=self.parent)
@@ -0,0 +1,447 @@
+"""
+Headless building of one or more Blueprint scene files.
+
+Usage:
+    mayapy -m pulse.build [-h] [-w WORKERS] [-o OUTPUT] [--save] [--logDir LOGDIR]
+                          [--cacheDir CACHEDIR] [--checkpoints] [--trace] [--countCommands]
+                          [--trackMemory] [--noTelemetry] [--telemetryFile TELEMETRYFILE]
+                          [--timeout TIMEOUT]
+                          FILE [FILE ...]
+
+Blueprint scenes are built by WORKERS persistent mayapy processes that
+each take files from a shared queue until it is empty, so maya startup is
+paid once per worker rather than once per file. Results, errors and
+timings for every rig are collected into a single json summary.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import traceback
+import subprocess
+import Queue
+from multiprocessing import cpu_count
+
+from . import telemetry as _telemetry
+
+
+__all__ = [
+    'BuildWorker',
+    'buildBlueprintFile',
+    'buildBlueprintFiles',
+]
+
+# not named after this module, since 'pulse.build' is the logger
+# whose handlers are replaced by every BlueprintBuilder
+LOG = logging.getLogger('pulse.buildcli')
+
+# the start of the line a worker writes to stdout with the
+# json results of each file, separating it from maya's output
+RESULT_PREFIX = 'PULSE_BUILD_RESULT:'
+
+
+def _createResult(blueprintFile, **kwargs):
+    """
+    Return a new results dict for a blueprint file, with every key that
+    the results of a build have, so that failed builds can be read the same way
+
+    Args:
+        blueprintFile: A string path to the blueprint file
+        **kwargs: Any values to set in the results
+    """
+    result = dict(
+        blueprintFile=blueprintFile,
+        rigName=None,
+        success=False,
+        errors=[],
+        buildTime=None,
+        logFile=None,
+        traceFile=None,
+        savedFile=None,
+        cacheKey=None,
+    )
+    result.update(kwargs)
+    return result
+
+
+def buildBlueprintFile(blueprintFile, logDir=None, save=False, disableUndo=True, cacheDir=None,
+                       checkpoints=False, trace=False, countCommands=False, trackMemory=False, telemetry=True, telemetryFile=None):
+    """
+    Open a maya scene and build the Blueprint it contains.
+    Must be run inside an initialized maya session.
+
+    Args:
+        blueprintFile: A string path to a maya file containing a blueprint
+        logDir: A string path to the directory for build log files
+        save: A bool, whether to save the built rig scene after building. The scene
+            must have been renamed by a SaveBuiltRig action, the blueprint file is never overwritten
+        disableUndo: A bool, whether to turn off undo while building
+        cacheDir: A string path to a build cache directory. When given, unchanged
+            blueprints are restored from the cache instead of being built, and
+            actions that support memoization cache the nodes they create
+        checkpoints: A bool, whether to save a checkpoint after each top-level
+            BuildGroup, and resume from the last checkpoint that is still valid
+        trace: A bool, whether to save a trace of the timing and node count
+            change of every action next to the log file
+        countCommands: A bool, whether to count the maya commands run by each
+            action, and include the actions that spend the most time in commands
+            in the results
+        trackMemory: A bool, whether to measure the memory and scene growth of each
+            action, and include the actions with the largest increases in the results
+        telemetry: A bool, whether to save the timings of the build to the
+            telemetry database, and use previous builds to estimate the remaining time
+        telemetryFile: A string path to the telemetry database. Defaults
+            to the per-user database, see `telemetry.getDefaultDatabasePath`
+
+    Returns:
+        A dict containing the results of the build
+    """
+    import pymel.core as pm
+    import pulse
+
+    result = _createResult(blueprintFile)
+
+    pulse.loadBuiltinActions()
+    pm.openFile(blueprintFile, force=True)
+    blueprint = pulse.Blueprint.fromDefaultNode()
+    if not blueprint:
+        result['errors'].append('No Blueprint found in scene: {0}'.format(blueprintFile))
+        return result
+    result['rigName'] = blueprint.rigName
+
+    builder = pulse.BlueprintBuilder(
+        blueprint, blueprintFile=blueprintFile, logDir=logDir, disableUndo=disableUndo,
+        useCache=bool(cacheDir), cacheDir=cacheDir,
+        memoizeActions=bool(cacheDir), memoDir=os.path.join(cacheDir, 'actions') if cacheDir else None,
+        useCheckpoints=checkpoints,
+        trace=trace, countNodes=trace, countCommands=countCommands, trackMemory=trackMemory,
+        telemetry=telemetry, telemetryFile=telemetryFile)
+    builder.start()
+    result['errors'] = [str(e) for e in builder.errors]
+    result['buildTime'] = builder.elapsedTime
+    result['logFile'] = builder.logFile
+    result['traceFile'] = builder.traceFile
+    result['success'] = builder.isFinished and not builder.errors
+    result['cacheKey'] = builder.cacheKey
+    if builder.commandCounter:
+        result['commandStats'] = builder.commandCounter.getTopOffenders()
+    if builder.memoryMonitor:
+        result['memoryStats'] = builder.memoryMonitor.getSummary()
+
+    if save and result['success']:
+        sceneName = pm.sceneName()
+        if not sceneName or os.path.normcase(os.path.abspath(sceneName)) == \
+                os.path.normcase(os.path.abspath(blueprintFile)):
+            # the blueprint was not renamed by a SaveBuiltRig action
+            result['success'] = False
+            result['errors'].append('Cannot save built rig over the blueprint file: {0}'.format(blueprintFile))
+        else:
+            result['savedFile'] = str(pm.saveFile(force=True))
+
+    return result
+
+
+def _runWorker(**kwargs):
+    """
+    Entry point for a worker process. Reads blueprint file paths from
+    stdin, one per line, and builds each one, writing its results to stdout
+    as a single json line that starts with RESULT_PREFIX.
+    Exits when stdin is closed.
+
+    Args:
+        **kwargs: Keyword args for `buildBlueprintFile`
+    """
+    # maya standalone is already initialized by importing pymel
+    # as part of the pulse package
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        blueprintFile = line.strip()
+        if not blueprintFile:
+            continue
+        try:
+            result = buildBlueprintFile(blueprintFile, **kwargs)
+        except Exception:
+            result = _createResult(blueprintFile, errors=[traceback.format_exc()])
+        # start a new line in case maya's output didn't end with one
+        sys.stdout.write('\n{0}{1}\n'.format(RESULT_PREFIX, json.dumps(result)))
+        sys.stdout.flush()
+
+
+class BuildWorker(object):
+    """
+    A persistent mayapy process that builds blueprint files one at a time.
+    If the process dies or a build times out, a new one is started for the next file.
+    """
+
+    def __init__(self, mayapy, logDir=None, save=False, cacheDir=None, checkpoints=False, trace=False,
+                 countCommands=False, trackMemory=False, telemetry=True, telemetryFile=None, timeout=None):
+        """
+        Args:
+            mayapy: A string path to the mayapy executable
+            timeout: A float, the max number of seconds to wait for each build,
+                after which the process is killed. Builds never time out when not given
+            See `buildBlueprintFile` for the remaining args
+        """
+        args = [mayapy, '-m', 'pulse.build', '--worker']
+        if logDir:
+            args.extend(['--logDir', logDir])
+        if save:
+            args.append('--save')
+        if cacheDir:
+            args.extend(['--cacheDir', cacheDir])
+        if checkpoints:
+            args.append('--checkpoints')
+        if trace:
+            args.append('--trace')
+        if countCommands:
+            args.append('--countCommands')
+        if trackMemory:
+            args.append('--trackMemory')
+        if not telemetry:
+            args.append('--noTelemetry')
+        if telemetryFile:
+            args.extend(['--telemetryFile', telemetryFile])
+        self.args = args
+        self.timeout = timeout
+        self.proc = None
+        # the output lines of the process, followed by None when it exits
+        self.lines = None
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        # read the output on another thread, so that waiting for a build can time out
+        self.lines = Queue.Queue()
+        thread = threading.Thread(target=self._readLoop, args=(self.proc.stdout, self.lines))
+        thread.daemon = True
+        thread.start()
+
+    @staticmethod
+    def _readLoop(stream, lines):
+        for line in iter(stream.readline, ''):
+            lines.put(line)
+        lines.put(None)
+
+    def stop(self):
+        """
+        Close the worker process, and return its exit code
+        """
+        if not self.proc:
+            return None
+        # closing stdin tells the worker to exit
+        try:
+            self.proc.stdin.close()
+        except IOError:
+            pass
+        returnCode = self.proc.wait()
+        self.proc = None
+        return returnCode
+
+    def kill(self):
+        """
+        Kill the worker process, e.g. when a build has timed out, and return its exit code
+        """
+        if not self.proc:
+            return None
+        try:
+            self.proc.kill()
+        except OSError:
+            # the process has already exited
+            pass
+        return self.stop()
+
+    def build(self, blueprintFile):
+        """
+        Build a blueprint file in the worker process and return the results.
+        """
+        if not self.proc:
+            self.start()
+
+        startTime = time.time()
+        result = None
+        output = []
+        isTimedOut = False
+        try:
+            self.proc.stdin.write(blueprintFile + '\n')
+            self.proc.stdin.flush()
+        except IOError:
+            # the worker has exited, reading its output below reaches the end
+            pass
+        while True:
+            timeout = None
+            if self.timeout is not None:
+                timeout = max(self.timeout - (time.time() - startTime), 0)
+            try:
+                line = self.lines.get(timeout=timeout)
+            except Queue.Empty:
+                isTimedOut = True
+                break
+            if line is None:
+                break
+            if line.startswith(RESULT_PREFIX):
+                try:
+                    result = json.loads(line[len(RESULT_PREFIX):])
+                except ValueError:
+                    pass
+                break
+            output.append(line)
+        wallTime = time.time() - startTime
+
+        if result is None:
+            if isTimedOut:
+                returnCode = self.kill()
+                error = 'Build timed out after {0} seconds:\n{1}'.format(self.timeout, ''.join(output))
+            else:
+                # the worker failed before it could report anything
+                returnCode = self.stop()
+                error = 'Worker process failed:\n{0}'.format(''.join(output))
+            result = _createResult(blueprintFile, errors=[error], returnCode=returnCode, isTimedOut=isTimedOut)
+        result['wallTime'] = wallTime
+        LOG.info('{0} {1} ({2:.3f} seconds)'.format(
+            'Built' if result['success'] else 'Failed to build', blueprintFile, wallTime))
+        return result
+
+
+def buildBlueprintFiles(blueprintFiles, workers=None, mayapy=None, logDir=None, save=False, cacheDir=None,
+                        checkpoints=False, trace=False, countCommands=False, trackMemory=False, telemetry=True, telemetryFile=None,
+                        timeout=None):
+    """
+    Build multiple blueprint files in parallel using a pool of
+    persistent mayapy worker processes, see `BuildWorker`.
+
+    Args:
+        blueprintFiles: A list of string paths to maya files containing blueprints
+        workers: An int, the max number of worker processes to run at once.
+            Defaults to the number of cpus
+        mayapy: A string path to the mayapy executable. Defaults to
+            the current python executable
+        logDir: A string path to the directory for build log files
+        save: A bool, whether to save each built rig scene after building
+        cacheDir: A string path to a build cache directory. When given, unchanged
+            blueprints are restored from the cache instead of being built
+        checkpoints: A bool, whether to resume each build from its last valid checkpoint
+        trace: A bool, whether to save a trace of the timing of every action
+        countCommands: A bool, whether to count the maya commands run by each action
+        trackMemory: A bool, whether to measure the memory and scene growth of each action
+        telemetry: A bool, whether to save the timings of every build to the telemetry database
+        telemetryFile: A string path to the telemetry database. Defaults to the per-user database
+        timeout: A float, the max number of seconds each build can take before its
+            worker process is killed and the build fails. Builds never time out when not given
+
+    Returns:
+        A dict summary of the results of all builds
+    """
+    if not workers:
+        workers = cpu_count()
+    if not mayapy:
+        mayapy = sys.executable
+    blueprintFiles = [os.path.abspath(f) for f in blueprintFiles]
+
+    queue = Queue.Queue()
+    for index, blueprintFile in enumerate(blueprintFiles):
+        queue.put((index, blueprintFile))
+    results = [None] * len(blueprintFiles)
+
+    def runWorker():
+        worker = BuildWorker(mayapy, logDir=logDir, save=save, cacheDir=cacheDir,
+                             checkpoints=checkpoints, trace=trace,
+                             countCommands=countCommands, trackMemory=trackMemory,
+                             telemetry=telemetry, telemetryFile=telemetryFile, timeout=timeout)
+        try:
+            while True:
+                try:
+                    index, blueprintFile = queue.get_nowait()
+                except Queue.Empty:
+                    break
+                results[index] = worker.build(blueprintFile)
+        finally:
+            worker.stop()
+
+    startTime = time.time()
+    threads = [threading.Thread(target=runWorker) for _ in range(min(workers, len(blueprintFiles)) or 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totalTime = time.time() - startTime
+
+    return dict(
+        host=socket.gethostname(),
+        workers=workers,
+        totalTime=totalTime,
+        succeeded=len([r for r in results if r['success']]),
+        failed=len([r for r in results if not r['success']]),
+        results=results,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pulse.build', description='Build one or more Pulse Blueprint scene files')
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help='Maya scene files containing blueprints')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Number of worker processes, defaults to the number of cpus')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Path of the json summary file, prints to stdout if not given')
+    parser.add_argument('--save', action='store_true',
+                        help='Save each built rig scene, requires a SaveBuiltRig action')
+    parser.add_argument('--logDir', default=None,
+                        help='Directory for build log files, defaults to the temp dir')
+    parser.add_argument('--cacheDir', default=None,
+                        help='Directory of the build cache, unchanged blueprints are restored from it')
+    parser.add_argument('--checkpoints', action='store_true',
+                        help='Save a checkpoint after each top-level group, and resume from the last valid one')
+    parser.add_argument('--trace', action='store_true',
+                        help='Save a Chrome trace of the timing of every action next to each log file')
+    parser.add_argument('--countCommands', action='store_true',
+                        help='Count the maya commands run by each action, and report the most expensive')
+    parser.add_argument('--trackMemory', action='store_true',
+                        help='Measure the memory and scene growth of each action, and report the largest')
+    parser.add_argument('--noTelemetry', action='store_true',
+                        help='Do not save the timings of builds to the telemetry database')
+    parser.add_argument('--telemetryFile', default=None,
+                        help='Path of the telemetry database, defaults to ~/.pulse/telemetry.db')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Max number of seconds for each build, after which its worker is killed')
+    parser.add_argument('--mayapy', default=None,
+                        help='Path to the mayapy executable used for workers')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    telemetry = not args.noTelemetry and _telemetry.isTelemetryEnabled()
+
+    if args.worker:
+        _runWorker(logDir=args.logDir, save=args.save, cacheDir=args.cacheDir,
+                   checkpoints=args.checkpoints, trace=args.trace,
+                   countCommands=args.countCommands, trackMemory=args.trackMemory,
+                   telemetry=telemetry, telemetryFile=args.telemetryFile)
+        return 0
+
+    if not args.files:
+        parser.error('at least one FILE is required')
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    summary = buildBlueprintFiles(
+        args.files, workers=args.workers, mayapy=args.mayapy, logDir=args.logDir, save=args.save,
+        cacheDir=args.cacheDir, checkpoints=args.checkpoints, trace=args.trace, countCommands=args.countCommands,
+        trackMemory=args.trackMemory, telemetry=telemetry, telemetryFile=args.telemetryFile,
+        timeout=args.timeout)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(summary, fp, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+
+    return 0 if not summary['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
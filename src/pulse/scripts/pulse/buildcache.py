@@ -0,0 +1,405 @@
+
+
+import os
+import sys
+import json
+import time
+import errno
+import hashlib
+import logging
+import tempfile
+import contextlib
+import pymel.core as pm
+
+from . import hashing
+from . import version
+
+
+__all__ = [
+    'BuildCache',
+    'FileCache',
+    'getBuildKey',
+]
+
+LOG = logging.getLogger(__name__)
+
+# {path: (mtime, size, hash)} of all source files that have been hashed
+_FILE_HASHES = {}
+
+# the number of seconds after which a manifest lock is considered abandoned,
+# since the lock is only held while reading and writing the manifest
+LOCK_TIMEOUT = 60
+# the number of seconds after which a cache file that has no entry
+# is removed, since another process may still be writing it
+ORPHAN_TIMEOUT = 3600
+
+
+def getFileHash(path):
+    """
+    Return a sha1 hex digest of the contents of a file, or None
+    if the file does not exist. Results are cached until the
+    modification time or size of the file changes.
+
+    Args:
+        path: A string path to a file
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _FILE_HASHES.get(path)
+    if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+    with open(path, 'rb') as fp:
+        result = hashlib.sha1(fp.read()).hexdigest()
+    _FILE_HASHES[path] = (stat.st_mtime, stat.st_size, result)
+    return result
+
+def getFileStamp(path):
+    """
+    Return a string representing the modification time and size of
+    a file, which changes whenever the file is saved.
+
+    Args:
+        path: A string path to a file
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'
+    return '{0}:{1}'.format(stat.st_mtime, stat.st_size)
+
+def _replaceFile(src, dst):
+    """
+    Move a file, replacing any existing file
+    """
+    if sys.platform == 'win32' and os.path.isfile(dst):
+        # renaming does not replace existing files on windows
+        os.remove(dst)
+    os.rename(src, dst)
+
+def getActionSourceFiles(actionClass):
+    """
+    Return the python and config files that define a BuildAction class
+
+    Args:
+        actionClass: A BuildAction class
+    """
+    result = []
+    module = sys.modules.get(actionClass.__module__)
+    moduleFile = getattr(module, '__file__', None)
+    if moduleFile:
+        # prefer the source file over compiled files
+        result.append(os.path.splitext(moduleFile)[0] + '.py')
+    if actionClass.configFile:
+        result.append(actionClass.configFile)
+    return result
+
+def getBuildKey(blueprint, blueprintFile, actionClasses):
+    """
+    Return a key that identifies the result of building a Blueprint in
+    the current scene, made from the Blueprint's content hash, the Pulse
+    version, the source of all BuildActions, and the modification time
+    and size of the blueprint file and all of the files it references.
+
+    Args:
+        blueprint: The Blueprint being built
+        blueprintFile: A string path to the maya file containing the blueprint
+        actionClasses: A list of all registered BuildAction classes
+    """
+    actionHashes = []
+    for actionClass in sorted(actionClasses, key=lambda c: c.getTypeName()):
+        actionHashes.append(actionClass.getTypeName())
+        actionHashes.extend([str(getFileHash(f)) for f in getActionSourceFiles(actionClass)])
+    inputFiles = pm.cmds.file(query=True, reference=True) or []
+    if blueprintFile:
+        inputFiles.append(blueprintFile)
+    inputStamps = ['{0}={1}'.format(f, getFileStamp(f)) for f in sorted(inputFiles)]
+    return hashing.hashStrings([
+        blueprint.getHash(),
+        version.__version__,
+        hashing.hashStrings(actionHashes),
+        hashing.hashStrings(inputStamps),
+    ])
+
+
+class FileCache(object):
+    """
+    A directory of cached files indexed by key in a json manifest.
+    When the total size of the files is greater than `maxSize`,
+    the least recently used files are removed.
+
+    A cache directory can be shared by multiple processes. The manifest
+    is re-read and merged while holding a lock file whenever it is changed,
+    and is replaced by renaming a temporary file, so that readers never see
+    a partially written manifest.
+    """
+
+    # the name of the manifest file in the cache directory
+    manifestFilename = 'cache.json'
+    # the prefix of the names of all cached files
+    filePrefix = 'file_'
+
+    def __init__(self, cacheDir, maxSize):
+        """
+        Args:
+            cacheDir: A string path to the cache directory
+            maxSize: An int, the max total size in bytes of all cached files
+        """
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        # {key: entry data} for all cached files, as of the last
+        # time the manifest was read
+        self.entries = self._loadManifest()
+
+    def getManifestPath(self):
+        return os.path.join(self.cacheDir, self.manifestFilename)
+
+    def _loadManifest(self):
+        path = self.getManifestPath()
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with open(path, 'r') as fp:
+                data = json.load(fp)
+        except (IOError, ValueError) as e:
+            LOG.warning('Could not read cache manifest: {0}\n{1}'.format(path, e))
+            return {}
+        return {e['key']: e for e in data.get('entries', [])}
+
+    def _saveManifest(self):
+        data = dict(
+            entries=sorted(self.entries.values(), key=lambda e: e['lastUsed']),
+        )
+        path = self.getManifestPath()
+        tempPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tempPath, 'w') as fp:
+            json.dump(data, fp, indent=2)
+        _replaceFile(tempPath, path)
+
+    @contextlib.contextmanager
+    def _lockManifest(self):
+        """
+        Hold the lock file of the manifest, waiting for other processes to
+        release it. Locks older than `LOCK_TIMEOUT` are assumed to have been
+        left by processes that were killed, and are removed.
+        """
+        self.makeCacheDir()
+        path = self.getManifestPath() + '.lock'
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_TIMEOUT:
+                    LOG.warning('Removing abandoned cache lock: {0}'.format(path))
+                    os.remove(path)
+                    continue
+            except OSError:
+                # the lock was just released
+                continue
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.remove(path)
+
+    @contextlib.contextmanager
+    def _editManifest(self):
+        """
+        Re-read the manifest to get the changes of other processes,
+        then save it once the entries have been changed, all while
+        holding the manifest lock
+        """
+        with self._lockManifest():
+            self.entries = self._loadManifest()
+            yield
+            self._saveManifest()
+
+    def getFilePath(self, key):
+        """
+        Return the full path to the cached file for a key
+        """
+        return os.path.join(self.cacheDir, self.entries[key]['file'])
+
+    def getTempPath(self, filename):
+        """
+        Return a path in the cache directory, unique to this process, to write
+        a file to before it is added using `addEntry`, so that other processes
+        never read a partially written file.
+
+        Args:
+            filename: A string name of the file in the cache directory
+        """
+        base, ext = os.path.splitext(filename)
+        return os.path.join(self.cacheDir, '{0}.{1}.tmp{2}'.format(base, os.getpid(), ext))
+
+    def has(self, key):
+        """
+        Return True if a cached file exists for a key
+        """
+        return key in self.entries and os.path.isfile(self.getFilePath(key))
+
+    def getEntry(self, key):
+        """
+        Return the entry data for a key, marking it as recently used
+
+        Raises:
+            KeyError: If the entry has been removed, e.g. by another process
+        """
+        with self._editManifest():
+            entry = self.entries[key]
+            entry['lastUsed'] = time.time()
+        return entry
+
+    def addEntry(self, key, filename, tempPath=None, **data):
+        """
+        Add an entry for a file that has been written to the cache directory,
+        then remove the least recently used files if the cache is too big.
+
+        Args:
+            key: A string key
+            filename: A string name of the file in the cache directory
+            tempPath: A string path returned by `getTempPath` that the file was
+                written to, which is moved into place once the manifest is locked
+            **data: Any additional json serializable data to store in the entry
+        """
+        with self._editManifest():
+            path = os.path.join(self.cacheDir, filename)
+            if tempPath:
+                _replaceFile(tempPath, path)
+            entry = dict(
+                key=key,
+                file=filename,
+                size=os.path.getsize(path),
+                lastUsed=time.time(),
+            )
+            entry.update(data)
+            self.entries[key] = entry
+            self.removeOrphanedFiles()
+            self.evict()
+
+    def updateEntry(self, key, **data):
+        """
+        Update the data stored in the entry for a key
+
+        Args:
+            key: A string key
+            **data: Any json serializable data to store in the entry
+        """
+        with self._editManifest():
+            if key in self.entries:
+                self.entries[key].update(data)
+
+    def makeCacheDir(self):
+        if not os.path.isdir(self.cacheDir):
+            try:
+                os.makedirs(self.cacheDir)
+            except OSError as e:
+                # another process may have just created it
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def removeOrphanedFiles(self):
+        """
+        Remove cached files that have no entry, such as files left by
+        processes that were killed before adding them, once they are older
+        than `ORPHAN_TIMEOUT`. Only call while the manifest is locked.
+        """
+        filenames = set([e['file'] for e in self.entries.values()])
+        for filename in os.listdir(self.cacheDir):
+            if not filename.startswith(self.filePrefix) or filename in filenames:
+                continue
+            path = os.path.join(self.cacheDir, filename)
+            try:
+                if os.path.isfile(path) and time.time() - os.path.getmtime(path) > ORPHAN_TIMEOUT:
+                    os.remove(path)
+            except OSError as e:
+                LOG.warning('Could not remove orphaned cache file: {0}\n{1}'.format(path, e))
+
+    def evict(self):
+        """
+        Remove the least recently used files until the
+        total size of the cache is no more than `maxSize`
+        """
+        entries = sorted(self.entries.values(), key=lambda e: e['lastUsed'])
+        totalSize = sum([e['size'] for e in entries])
+        while entries and totalSize > self.maxSize:
+            entry = entries.pop(0)
+            totalSize -= entry['size']
+            del self.entries[entry['key']]
+            path = os.path.join(self.cacheDir, entry['file'])
+            try:
+                os.remove(path)
+            except OSError as e:
+                LOG.warning('Could not remove cached file: {0}\n{1}'.format(path, e))
+
+
+class BuildCache(FileCache):
+    """
+    A local cache of fully built rig scenes, so that building a
+    Blueprint that has not changed restores the previous result
+    instead of running every action again.
+
+    Each result is identified by a key returned by `getBuildKey`.
+    Changes to anything else that affects the build, such as
+    environment variables, are not detected.
+
+    Restoring a cached build only restores the built scene. Side effects
+    of the actions outside of the scene, such as files saved by the
+    SaveBuiltRig action, are not repeated.
+    """
+
+    filePrefix = 'build_'
+
+    def __init__(self, cacheDir=None, maxSize=2 * 1024 ** 3):
+        """
+        Args:
+            cacheDir: A string path to the directory where built scenes are
+                saved. Defaults to a directory in the temp dir
+            maxSize: An int, the max total size in bytes of all cached scenes
+        """
+        if not cacheDir:
+            cacheDir = os.path.join(tempfile.gettempdir(), 'pulse_build_cache')
+        super(BuildCache, self).__init__(cacheDir, maxSize)
+
+    def save(self, key, rigName=None):
+        """
+        Save a copy of the current scene as the result for a cache key
+
+        Args:
+            key: A string key returned by `getBuildKey`
+            rigName: A string name of the built rig, for reference
+        """
+        self.makeCacheDir()
+        filename = '{0}{1}.mb'.format(self.filePrefix, key)
+        tempPath = self.getTempPath(filename)
+        # export a copy of the scene, leaving the current scene name untouched
+        pm.cmds.file(tempPath, exportAll=True, type='mayaBinary', force=True, preserveReferences=True)
+        # the name of the built scene, which may have been renamed by the build
+        sceneName = pm.cmds.file(q=True, sceneName=True) or None
+        self.addEntry(key, filename, tempPath, rigName=rigName, sceneName=sceneName)
+
+    def restore(self, key):
+        """
+        Open the built scene for a cache key. The opened scene is renamed to
+        the name the scene had when the build was cached, e.g. the rig path
+        set by a SaveBuiltRig action, so that saving it does not overwrite
+        the cached file.
+
+        Args:
+            key: A string key returned by `getBuildKey`
+
+        Raises:
+            KeyError: If the entry has been removed, e.g. by another process
+            IOError: If the cached scene has been removed
+        """
+        entry = self.getEntry(key)
+        if not os.path.isfile(self.getFilePath(key)):
+            raise IOError('Cached scene was removed: {0}'.format(self.getFilePath(key)))
+        pm.cmds.file(self.getFilePath(key), open=True, force=True)
+        # the built scene may have been untitled
+        pm.cmds.file(rename=entry.get('sceneName') or 'untitled')
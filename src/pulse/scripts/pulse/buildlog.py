@@ -0,0 +1,174 @@
+
+
+import sys
+import copy
+import logging
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+__all__ = [
+    'BufferedEcho',
+    'BufferedEchoHandler',
+    'QueuedFileHandler',
+]
+
+
+class QueuedFileHandler(logging.Handler):
+    """
+    A logging handler that writes records to a file on a background
+    thread, so that file I/O stays off the thread doing the logging.
+
+    Records are snapshotted when they are emitted and then formatted
+    and written in batches by the writer thread. Call `flush` to block
+    until all queued records have been written.
+    """
+
+    def __init__(self, filename, mode='a', batchSize=200):
+        """
+        Args:
+            filename: A string path to the log file
+            mode: A string file mode used to open the log file
+            batchSize: An int, the max number of records written at once
+        """
+        logging.Handler.__init__(self)
+        self.filename = filename
+        self.batchSize = batchSize
+        self.stream = open(filename, mode)
+        self.queue = queue.Queue()
+        self._isClosed = False
+        self._thread = threading.Thread(target=self._writeLoop, name='pulseLogWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def prepare(self, record):
+        """
+        Return a copy of a record that can be handled on another thread,
+        with its message and exception text resolved, since they may reference
+        objects that change or are released after the record is emitted.
+        The record itself is shared with other handlers, and is not modified.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            formatter = self.formatter or logging._defaultFormatter
+            record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        if self._isClosed:
+            return
+        try:
+            self.queue.put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def _writeLoop(self):
+        while True:
+            records = [self.queue.get()]
+            # gather any other pending records into one batch
+            while len(records) < self.batchSize:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            isDone = None in records
+            try:
+                lines = []
+                for record in records:
+                    if record is not None:
+                        try:
+                            lines.append(self.format(record))
+                        except Exception:
+                            self.handleError(record)
+                if lines:
+                    try:
+                        self.stream.write('\n'.join(lines) + '\n')
+                        self.stream.flush()
+                    except Exception:
+                        # e.g. the disk is full, keep writing later records
+                        self.handleError([r for r in records if r is not None][0])
+            finally:
+                # never leave flush or close waiting on records that failed
+                for record in records:
+                    self.queue.task_done()
+            if isDone:
+                break
+
+    def flush(self):
+        """
+        Block until all queued records have been written
+        """
+        if not self._isClosed:
+            self.queue.join()
+
+    def close(self):
+        """
+        Write all queued records, then stop the writer thread and close the file
+        """
+        if not self._isClosed:
+            self._isClosed = True
+            self.queue.put(None)
+            self._thread.join()
+            self.stream.close()
+        logging.Handler.close(self)
+
+
+class BufferedEcho(object):
+    """
+    Collects text to be printed, such as stack traces, and writes it
+    to a stream in batches. Printing to the maya script editor is
+    slow when it is flooded, and is not safe from background threads,
+    so text is only written when the buffer fills up or `flush` is called.
+    """
+
+    def __init__(self, stream=None, maxCount=50):
+        """
+        Args:
+            stream: A file-like object to write to, defaults to sys.stdout
+            maxCount: An int, the number of entries to buffer before writing
+        """
+        self.stream = stream
+        self.maxCount = maxCount
+        self.buffer = []
+
+    def write(self, text):
+        self.buffer.append(text)
+        if len(self.buffer) >= self.maxCount:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            stream = self.stream or sys.stdout
+            stream.write(''.join(self.buffer))
+            self.buffer = []
+
+
+class BufferedEchoHandler(logging.Handler):
+    """
+    A logging handler that formats records and writes them to a
+    BufferedEcho, so that logging to the script editor is batched.
+    """
+
+    def __init__(self, echo):
+        """
+        Args:
+            echo: A BufferedEcho to write formatted records to
+        """
+        logging.Handler.__init__(self)
+        self.echo = echo
+
+    def emit(self, record):
+        try:
+            self.echo.write(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.echo.flush()
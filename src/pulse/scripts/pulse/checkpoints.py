@@ -0,0 +1,217 @@
+
+
+import os
+import json
+import logging
+import tempfile
+import pymel.core as pm
+
+from . import hashing
+from .buildcache import getFileStamp
+
+
+__all__ = [
+    'BuildCheckpoints',
+    'getSceneHash',
+]
+
+LOG = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'checkpoints.json'
+
+
+def getSceneHash(excludeNodes=None):
+    """
+    Return a hash of the contents of the current scene, made from the
+    long names and types of all nodes, the world matrices of all transforms,
+    the control points of all curves, all connections, and the modification
+    time and size of all referenced files. Other attribute values are
+    not included. Startup cameras are ignored, so that moving the
+    viewport camera does not change the hash.
+
+    Args:
+        excludeNodes: A list of string node names to ignore, such as
+            the node containing the blueprint
+    """
+    # ls lists every node when given an empty list
+    excluded = set(pm.cmds.ls(excludeNodes, long=True) or []) if excludeNodes else set()
+    for camera in pm.cmds.ls(cameras=True, long=True) or []:
+        if pm.cmds.camera(camera, query=True, startupCamera=True):
+            excluded.add(camera)
+            excluded.update(pm.cmds.listRelatives(camera, parent=True, fullPath=True) or [])
+    # connections are listed by unique short name
+    excludedNames = excluded.union(pm.cmds.ls(list(excluded)) or []) if excluded else excluded
+
+    # a flat list of node name, node type pairs
+    nodesAndTypes = pm.cmds.ls(long=True, showType=True) or []
+    nodes = [n for n in nodesAndTypes[::2] if n not in excluded]
+    strings = sorted(['{0} {1}'.format(n, t) for n, t
+                      in zip(nodesAndTypes[::2], nodesAndTypes[1::2]) if n not in excluded])
+    for transform in sorted(pm.cmds.ls(type='transform', long=True) or []):
+        if transform not in excluded:
+            matrix = pm.cmds.getAttr(transform + '.worldMatrix') or []
+            # rounded to ignore floating point differences
+            strings.append('{0} {1}'.format(transform, ' '.join(['{0:.6f}'.format(v) for v in matrix])))
+    for curve in sorted(pm.cmds.ls(type='nurbsCurve', long=True) or []):
+        if curve in excluded:
+            continue
+        points = pm.cmds.getAttr(curve + '.cv[*]') or []
+        strings.append('{0} {1}'.format(curve, ' '.join(['{0:.6f}'.format(v) for p in points for v in p])))
+    if nodes:
+        # returns a flat list of (destination, source) plug pairs
+        plugs = pm.cmds.listConnections(
+            nodes, connections=True, plugs=True, source=True, destination=False) or []
+        strings.extend(sorted(['{0}<{1}'.format(d, s) for d, s in zip(plugs[::2], plugs[1::2])
+                               if s.split('.')[0] not in excludedNames]))
+    for reference in sorted(pm.cmds.file(query=True, reference=True) or []):
+        path = pm.cmds.referenceQuery(reference, filename=True, withoutCopyNumber=True)
+        strings.append('{0}={1}'.format(path, getFileStamp(path)))
+    return hashing.hashStrings(strings)
+
+
+class BuildCheckpoints(object):
+    """
+    Manages scene snapshots that are saved after each top-level
+    BuildGroup of a Blueprint is built, so that a later build
+    can resume from the last checkpoint whose upstream build
+    items have not changed.
+
+    Each checkpoint is identified by a chained hash of the
+    serialized top-level build items leading up to and including
+    the group that produced it, so changing any item invalidates
+    the checkpoints of that item and everything after it.
+
+    The chain starts with a hash of the current scene, excluding the
+    blueprint node, so changes to the scene the rig is built from, such as
+    moved joints or edited control shapes, invalidate all checkpoints,
+    whether they are saved or not, while saving an edited blueprint does
+    not. See `getSceneHash` for the changes that are detected.
+    """
+
+    def __init__(self, blueprint, blueprintFile=None, checkpointDir=None, blueprintNode=None):
+        """
+        Args:
+            blueprint: The Blueprint being built
+            blueprintFile: A string path to the maya file containing the blueprint
+            checkpointDir: A string path to the directory where checkpoint scenes
+                are saved. Defaults to a per-rig directory in the temp dir
+            blueprintNode: A string name of the node containing the blueprint,
+                which is not included in the hash of the scene
+        """
+        self.blueprint = blueprint
+        self.blueprintFile = blueprintFile
+        self.blueprintNode = blueprintNode
+        if not checkpointDir:
+            checkpointDir = os.path.join(tempfile.gettempdir(), 'pulse_checkpoints', blueprint.rigName)
+        self.checkpointDir = checkpointDir
+        # the chained hash for each top-level build item
+        self.hashes = self._getChainedHashes()
+        # {index: checkpoint data} for all checkpoints on disk
+        self.checkpoints = self._loadManifest()
+
+    def _getChainedHashes(self):
+        """
+        Return a list of hashes, one for each top-level build item,
+        that represent the item and all items before it.
+        """
+        result = []
+        lastHash = hashing.hashData(dict(
+            rigName=self.blueprint.rigName,
+            version=self.blueprint.version,
+            blueprintFile=self.blueprintFile,
+            sceneHash=getSceneHash([self.blueprintNode] if self.blueprintNode else None),
+        ))
+        for item in self.blueprint.rootGroup.children:
+            lastHash = hashing.hashStrings([lastHash, item.getHash()])
+            result.append(lastHash)
+        return result
+
+    def getManifestPath(self):
+        return os.path.join(self.checkpointDir, MANIFEST_FILENAME)
+
+    def _loadManifest(self):
+        path = self.getManifestPath()
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with open(path, 'r') as fp:
+                data = json.load(fp)
+        except (IOError, ValueError) as e:
+            LOG.warning('Could not read checkpoint manifest: {0}\n{1}'.format(path, e))
+            return {}
+        return {c['index']: c for c in data.get('checkpoints', [])}
+
+    def _saveManifest(self):
+        data = dict(
+            rigName=self.blueprint.rigName,
+            checkpoints=[self.checkpoints[k] for k in sorted(self.checkpoints.keys())],
+        )
+        with open(self.getManifestPath(), 'w') as fp:
+            json.dump(data, fp, indent=2)
+
+    def isValid(self, index):
+        """
+        Return True if a checkpoint exists for the top-level build item
+        at an index, and neither it or any upstream items have changed.
+
+        Args:
+            index: An int index of a top-level build item
+        """
+        checkpoint = self.checkpoints.get(index)
+        if not checkpoint or index >= len(self.hashes):
+            return False
+        if checkpoint['hash'] != self.hashes[index]:
+            return False
+        return os.path.isfile(os.path.join(self.checkpointDir, checkpoint['file']))
+
+    def getResumeIndex(self):
+        """
+        Return the index of the last top-level build item that has a
+        valid checkpoint, or -1 if the build must start from scratch.
+        """
+        for index in reversed(range(len(self.hashes))):
+            if self.isValid(index):
+                return index
+        return -1
+
+    def save(self, index):
+        """
+        Save a snapshot of the current scene as the checkpoint for the
+        top-level build item at an index. All checkpoints after the
+        index are discarded since they are no longer valid.
+
+        Args:
+            index: An int index of a top-level build item
+        """
+        if not os.path.isdir(self.checkpointDir):
+            os.makedirs(self.checkpointDir)
+        filename = 'checkpoint_{0:03d}.mb'.format(index)
+        # export a copy of the scene, leaving the current scene name untouched
+        pm.cmds.file(os.path.join(self.checkpointDir, filename),
+                     exportAll=True, type='mayaBinary', force=True, preserveReferences=True)
+        item = self.blueprint.rootGroup.children[index]
+        self.checkpoints[index] = dict(
+            index=index,
+            hash=self.hashes[index],
+            displayName=item.getDisplayName(),
+            file=filename,
+        )
+        for k in [k for k in self.checkpoints if k > index]:
+            del self.checkpoints[k]
+        self._saveManifest()
+
+    def restore(self, index):
+        """
+        Open the checkpoint scene for the top-level build item at an index.
+        The opened scene is renamed to the original scene name so that
+        actions which depend on the scene path behave normally.
+        Any unsaved changes to the current scene are discarded.
+
+        Args:
+            index: An int index of a top-level build item
+        """
+        sceneName = pm.cmds.file(q=True, sceneName=True)
+        path = os.path.join(self.checkpointDir, self.checkpoints[index]['file'])
+        pm.cmds.file(path, open=True, force=True)
+        if sceneName:
+            pm.cmds.file(rename=sceneName)
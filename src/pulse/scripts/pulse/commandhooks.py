@@ -0,0 +1,105 @@
+
+
+import maya.cmds
+
+
+__all__ = [
+    'CommandHook',
+    'getCommandModules',
+]
+
+
+def getCommandModules():
+    """
+    Return the modules whose command functions are hooked. Pymel wraps
+    maya commands in its own module, which is hooked as well so
+    that commands run by pymel functions are included.
+    """
+    modules = [maya.cmds]
+    try:
+        import pymel.internal.pmcmds as pmcmds
+        modules.append(pmcmds)
+    except ImportError:
+        pass
+    return modules
+
+
+class CommandHook(object):
+    """
+    Base class for replacing every maya command function with a wrapper
+    while the hook is active. Only the outer-most command of nested
+    commands (e.g. a pymel command that runs a maya command) is passed
+    to `onCommand`.
+
+    Hooks can be nested, but must be stopped in the reverse
+    order that they were started.
+    """
+
+    def __init__(self):
+        self.isActive = False
+        # [(module, name, original function)] of all wrapped functions
+        self._originals = []
+        # the depth of nested command calls, only the outer-most is handled
+        self._depth = 0
+
+    def start(self):
+        """
+        Start hooking all commands
+        """
+        if self.isActive:
+            return
+        for module in getCommandModules():
+            for name in dir(module):
+                func = getattr(module, name)
+                if name.startswith('_') or not callable(func) or isinstance(func, type):
+                    continue
+                self._originals.append((module, name, func))
+                setattr(module, name, self._wrap(name, func))
+        self.isActive = True
+
+    def stop(self):
+        """
+        Restore all original command functions
+        """
+        for module, name, func in self._originals:
+            setattr(module, name, func)
+        self._originals = []
+        self.isActive = False
+
+    def pause(self):
+        """
+        Stop handling commands until `resume` is called
+        """
+        self._depth += 1
+
+    def resume(self):
+        self._depth -= 1
+
+    def _wrap(self, name, func):
+        hook = self
+
+        def wrapper(*args, **kwargs):
+            if hook._depth:
+                return func(*args, **kwargs)
+            hook._depth += 1
+            try:
+                return hook.onCommand(name, func, args, kwargs)
+            finally:
+                hook._depth -= 1
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def onCommand(self, name, func, args, kwargs):
+        """
+        Called for every outer-most command while active.
+        Must call `func` and return its result.
+
+        Args:
+            name: A string name of the command
+            func: The original command function
+            args: A tuple of the command's arguments
+            kwargs: A dict of the command's keyword arguments
+        """
+        return func(*args, **kwargs)
@@ -0,0 +1,98 @@
+
+
+import time
+import logging
+
+from .commandhooks import CommandHook
+
+
+__all__ = [
+    'CommandCounter',
+]
+
+LOG = logging.getLogger(__name__)
+
+
+class CommandCounter(CommandHook):
+    """
+    Counts the calls and cumulative time of every maya command
+    while active, grouped by the build step that ran them.
+    Use `setKey` to change the step that commands are counted for.
+    """
+
+    def __init__(self):
+        super(CommandCounter, self).__init__()
+        # the key of the step commands are currently counted for
+        self.key = None
+        # {step key: {command name: [call count, cumulative time]}}
+        self.stats = {}
+
+    def setKey(self, key):
+        """
+        Set the key, e.g. an action path, that following commands are counted for
+        """
+        self.key = key
+
+    def onCommand(self, name, func, args, kwargs):
+        startTime = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsedTime = time.time() - startTime
+            stats = self.stats.setdefault(self.key, {}).setdefault(name, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsedTime
+
+    def getCommandStats(self, key):
+        """
+        Return a list of (command name, call count, cumulative time)
+        for a step, sorted by cumulative time, most expensive first
+        """
+        stats = self.stats.get(key, {})
+        result = [(name, count, cumTime) for name, (count, cumTime) in stats.iteritems()]
+        return sorted(result, key=lambda s: (s[2], s[1]), reverse=True)
+
+    def getTotals(self, key):
+        """
+        Return the total (call count, cumulative time) of all commands of a step
+        """
+        stats = self.stats.get(key, {}).values()
+        return sum([s[0] for s in stats]), sum([s[1] for s in stats])
+
+    def getTopOffenders(self, actionCount=10, commandCount=5):
+        """
+        Return the steps that spent the most time in commands,
+        along with the most expensive commands of each step.
+
+        Args:
+            actionCount: An int, the max number of steps to return
+            commandCount: An int, the max number of commands to return for each step
+
+        Returns:
+            A list of dicts containing the key, total call count, total time,
+            and list of (command name, call count, cumulative time) of each step
+        """
+        result = []
+        for key in self.stats:
+            callCount, totalTime = self.getTotals(key)
+            result.append(dict(
+                key=key,
+                callCount=callCount,
+                time=totalTime,
+                commands=self.getCommandStats(key)[:commandCount],
+            ))
+        result.sort(key=lambda r: r['time'], reverse=True)
+        return result[:actionCount]
+
+    def formatTopOffenders(self, actionCount=10, commandCount=5):
+        """
+        Return a string report of the steps that spent the most time in commands
+        """
+        lines = []
+        for offender in self.getTopOffenders(actionCount, commandCount):
+            # commands run outside of any action have no key
+            lines.append('{0}: {1} command(s), {2:.3f}s'.format(
+                offender['key'] or '(outside actions)', offender['callCount'], offender['time']))
+            for name, count, cumTime in offender['commands']:
+                lines.append('  {0}: {1} call(s), {2:.3f}s'.format(name, count, cumTime))
+        return '\n'.join(lines)
@@ -1,16 +1,30 @@
 
 
 import os
+import copy
 import logging
 import time
 import tempfile
-import traceback
 from datetime import datetime
 import pulse.vendor.yaml as yaml
 import pymel.core as pm
 import pymetanode as meta
 
 from . import version
+from . import hashing
+from .checkpoints import BuildCheckpoints
+from .commandstats import CommandCounter
+from .buildcache import BuildCache, getBuildKey
+from .memoization import ActionMemoCache, getSceneUUIDs, getNodesCreatedSince
+from .memorystats import MemoryMonitor
+from .profiling import ActionProfiler
+from .recording import BuildRecordings, CommandRecorder, InvalidRecordingError, getSceneFingerprint
+from .tracing import BuildTrace, getCPUTime, getHeapMemory, getNodeCount
+from .telemetry import BuildTelemetry, TelemetryStore
+from .events import *
+from .rigindex import RigIndex
+from .buildlog import BufferedEcho, BufferedEchoHandler, QueuedFileHandler
+from .shards import readShards, writeShards
 
 
 __all__ = [
@@ -22,12 +36,15 @@ __all__ = [
     'BuildActionError',
     'BuildGroup',
     'BuildItem',
+    'BuildPlan',
     'getActionClass',
     'getAllRigs',
     'getAllRigsByName',
     'getBuildItemClass',
     'getRegisteredActions',
     'getRigFromNode',
+    'getRigIndex',
+    'getRigsFromNodes',
     'getSelectedRigs',
     'isRig',
     'registerActions',
@@ -44,6 +61,9 @@ BLUEPRINT_NODENAME = 'pulse_blueprint'
 
 RIG_METACLASS = 'pulse_rig'
 
+# the shared index of all rigs in the scene
+RIG_INDEX = RigIndex(RIG_METACLASS)
+
 BUILDITEM_TYPEMAP = {}
 
 
@@ -95,6 +115,7 @@ def registerActions(actionClasses):
             if BUILDITEM_TYPEMAP[typeName].config.get('isBuiltin', False):
                 LOG.error("A built-in BuildAction already exists with type name: {0}".format(typeName))
                 continue
+        c.compileSchema()
         BUILDITEM_TYPEMAP[typeName] = c
 
 
@@ -108,11 +129,20 @@ def isRig(node):
     """
     return meta.hasMetaClass(node, RIG_METACLASS)
 
+def getRigIndex():
+    """
+    Return the shared RigIndex of all rigs in the scene,
+    installing the callbacks that keep it valid if necessary
+    """
+    if not RIG_INDEX.hasCallbacks():
+        RIG_INDEX.addCallbacks()
+    return RIG_INDEX
+
 def getAllRigs():
     """
     Return a list of all rigs in the scene
     """
-    return meta.findMetaNodes(RIG_METACLASS)
+    return getRigIndex().getRigs()
 
 def getAllRigsByName(names):
     """
@@ -122,13 +152,7 @@ def getAllRigsByName(names):
     Args:
         names: A list of string rig names
     """
-    rigs = getAllRigs()
-    matches = []
-    for r in rigs:
-        data = meta.getMetaData(r, RIG_METACLASS)
-        if data.get('name') in names:
-            matches.append(r)
-    return matches
+    return getRigIndex().getRigsByName(names)
 
 def getRigFromNode(node):
     """
@@ -137,20 +161,30 @@ def getRigFromNode(node):
     Args:
         node: A PyNode rig or node that is part of a rig
     """
-    if isRig(node):
+    if isinstance(node, pm.nt.DagNode):
+        return getRigIndex().getRigFromPath(node.longName())
+    elif isRig(node):
         return node
-    else:
-        parent = node.getParent()
-        if parent:
-            return getRigFromNode(parent)
+
+def getRigsFromNodes(nodes):
+    """
+    Return the unique rigs that own any of the given nodes
+
+    Args:
+        nodes: A list of PyNodes or string long DAG paths
+    """
+    paths = [n.longName() if isinstance(n, pm.nt.DagNode) else str(n) for n in nodes]
+    rigs = []
+    for rig in getRigIndex().getRigsFromPaths(paths):
+        if rig is not None and rig not in rigs:
+            rigs.append(rig)
+    return rigs
 
 def getSelectedRigs():
     """
     Return the selected rigs
     """
-    rigs = list(set([getRigFromNode(s) for s in pm.selected()]))
-    rigs = [r for r in rigs if r is not None]
-    return rigs
+    return getRigsFromNodes(pm.cmds.ls(selection=True, long=True) or [])
 
 def createRigNode(name):
     """
@@ -167,16 +201,36 @@ def createRigNode(name):
         node.attr(a).setKeyable(False)
     # set initial meta data for the rig
     meta.setMetaData(node, RIG_METACLASS, {'name':name})
+    RIG_INDEX.invalidate()
     return node
 
 
 
-def copyData(data, refNode=None):
+# value types that are immutable and can be shared between copies of data
+_IMMUTABLE_TYPES = (basestring, int, long, float, bool, type(None), pm.PyNode)
+
+def copyData(data):
     """
-    Performs a deep copy of the given data using pymetanode to
-    encode and decode the values.
+    Performs a deep copy of the given data.
+
+    Containers are copied recursively, while immutable values are shared.
+    Node references are shared as well, since a PyNode is a handle to the node
+    that stays valid when the node is renamed, so nothing is re-resolved by name.
+
+    Args:
+        data: A dict, list, or other serialized data
     """
-    return meta.decodeMetaData(meta.encodeMetaData(data), refNode)
+    if isinstance(data, _IMMUTABLE_TYPES):
+        return data
+    elif isinstance(data, dict):
+        return {k: copyData(v) for k, v in data.iteritems()}
+    elif isinstance(data, list):
+        return [copyData(v) for v in data]
+    elif isinstance(data, tuple):
+        return tuple([copyData(v) for v in data])
+    elif isinstance(data, set):
+        return set([copyData(v) for v in data])
+    return copy.deepcopy(data)
 
 
 
@@ -214,11 +268,60 @@ class BuildItem(object):
         raise NotImplementedError
 
     def __init__(self):
-        pass
+        # the BuildGroup that contains this item
+        self._parent = None
+        # the cached content hash of this item
+        self._hash = None
+        # incremented whenever this item or any item below it changes,
+        # only maintained on the top-most item of a tree, see `BuildPlan`
+        self._revision = 0
 
     def __repr__(self):
         return "<{0} '{1}'>".format(self.__class__.__name__, self.getDisplayName())
 
+    def getParent(self):
+        """
+        Return the BuildGroup that contains this item, if any
+        """
+        return self._parent
+
+    def getHash(self):
+        """
+        Return a sha1 hex digest of the contents of this item.
+        The hash is cached until the item or any of its children
+        change, and node references are hashed by UUID.
+        """
+        if self._hash is None:
+            self._hash = self._calculateHash()
+        return self._hash
+
+    def _calculateHash(self):
+        """
+        Return a new content hash for this item
+        """
+        return hashing.hashData(self.serialize())
+
+    def invalidateHash(self):
+        """
+        Clear the cached hash of this item and all of its parents.
+        Must be called whenever the contents of the item are
+        modified directly, e.g. by editing variant values in place.
+        """
+        self._hash = None
+        item = self
+        while item._parent is not None:
+            item = item._parent
+            item._hash = None
+        item._revision += 1
+
+    def clearHashCache(self):
+        """
+        Clear the cached hashes of this item and all of its children, so
+        that they are calculated again from the current contents, in case
+        an item was modified without calling `invalidateHash`
+        """
+        self._hash = None
+
     @property
     def log(self):
         if not hasattr(self, 'log'):
@@ -282,9 +385,40 @@ class BuildGroup(BuildItem):
     def __init__(self, displayName='NewGroup'):
         super(BuildGroup, self).__init__()
         # the display name of this group
-        self.displayName = displayName
+        self._displayName = displayName
         # the list of build items to perform in order
-        self.children = []
+        self._children = []
+
+    @property
+    def displayName(self):
+        return self._displayName
+
+    @displayName.setter
+    def displayName(self, value):
+        self._displayName = value
+        self.invalidateHash()
+
+    @property
+    def children(self):
+        return self._children
+
+    @children.setter
+    def children(self, value):
+        for item in self._children:
+            item._parent = None
+        if None in value:
+            # items whose type is not registered could not be created
+            LOG.warning('Ignoring {0} missing child item(s) of {1}'.format(value.count(None), self))
+            value = [item for item in value if item is not None]
+        self._children = value
+        for item in self._children:
+            item._parent = self
+        self.invalidateHash()
+
+    def clearHashCache(self):
+        super(BuildGroup, self).clearHashCache()
+        for child in self.children:
+            child.clearHashCache()
 
     def getLoggerName(self):
         return 'pulse.buildgroup'
@@ -292,6 +426,13 @@ class BuildGroup(BuildItem):
     def getDisplayName(self):
         return self.displayName
 
+    def _calculateHash(self):
+        # combine the hashes of all children, so that
+        # only changed children need to be hashed again
+        strings = [self.getTypeName(), self.displayName]
+        strings.extend([c.getHash() for c in self.children])
+        return hashing.hashStrings(strings)
+
     def serialize(self):
         # TODO: make a recursion loop check
         data = super(BuildGroup, self).serialize()
@@ -302,7 +443,14 @@ class BuildGroup(BuildItem):
     def deserialize(self, data):
         super(BuildGroup, self).deserialize(data)
         self.displayName = data['displayName']
-        self.children = [BuildItem.create(c) for c in data['children']]
+        children = []
+        for childData in data['children']:
+            child = BuildItem.create(childData)
+            if child is None:
+                LOG.warning("Ignoring unknown BuildItem type '{0}' in {1}".format(childData.get('type'), self))
+                continue
+            children.append(child)
+        self.children = children
 
     def clearChildren(self):
         self.children = []
@@ -313,25 +461,44 @@ class BuildGroup(BuildItem):
         if not isinstance(item, BuildItem):
             raise ValueError('{0} is not a valid BuildItem type'.format(type(item).__name__))
         self.children.append(item)
+        item._parent = self
+        self.invalidateHash()
 
     def removeChild(self, item):
         if item in self.children:
             self.children.remove(item)
+            item._parent = None
+            self.invalidateHash()
 
     def removeChildAt(self, index):
         if index < 0 or index >= len(self.children):
             return
 
+        self.children[index]._parent = None
         del self.children[index]
+        self.invalidateHash()
 
     def insertChild(self, index, item):
+        if item is None:
+            LOG.warning('Ignoring missing child item of {0}'.format(self))
+            return
         if not isinstance(item, BuildItem):
             raise ValueError('{0} is not a valid BuildItem type'.format(type(item).__name__))
         self.children.insert(index, item)
+        item._parent = self
+        self.invalidateHash()
 
     def getChildCount(self):
         return len(self.children)
 
+    def getActionCount(self):
+        """
+        Return the total number of actions this BuildGroup will run,
+        including all child groups and batch action variants, without
+        creating any action instances
+        """
+        return sum([c.getActionCount() for c in self.children if isinstance(c, (BuildGroup, BuildAction, BatchBuildAction))])
+
     def getChildGroupByName(self, name):
         """
         Return a child BuildGroup by name
@@ -340,32 +507,6 @@ class BuildGroup(BuildItem):
             if isinstance(item, BuildGroup) and item.displayName == name:
                 return item
 
-    def actionIterator(self, parentPath=None):
-        """
-        Yields all BuildActions in this BuildGroup,
-        recursively handling child BuildGroups as well.
-
-        Args:
-            parentPath: A string path representing the parent BuildGroup
-
-        Returns:
-            Iterator of (BuildAction, string) representing all actions and
-            the build group path leading to them.
-        """
-        thisPath = '/'.join([parentPath, self.getDisplayName()]) if parentPath else self.getDisplayName()
-        for index, child in enumerate(self.children):
-            if thisPath:
-                pathAtIndex = '{0}[{1}]'.format(thisPath, index)
-            else:
-                pathAtIndex = None
-            if isinstance(child, (BuildGroup, BatchBuildAction)):
-                # iterate through child group or batch actions
-                for subItem, subPath in child.actionIterator(pathAtIndex):
-                    yield subItem, subPath
-            elif isinstance(child, BuildAction):
-                # return the action
-                yield child, pathAtIndex
-
 
 BUILDITEM_TYPEMAP['BuildGroup'] = BuildGroup
 
@@ -379,6 +520,105 @@ class BuildActionError(Exception):
     pass
 
 
+class BuildActionAttr(object):
+    """
+    A descriptor that stores the value of a BuildAction
+    attribute in the action's slots-based value store.
+    """
+
+    __slots__ = ('name', 'slot')
+
+    def __init__(self, name, slot):
+        self.name = name
+        # the member descriptor of the value store class
+        self.slot = slot
+
+    def __get__(self, obj, objType=None):
+        if obj is None:
+            return self
+        return self.slot.__get__(obj._attrValues, None)
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj._attrValues, value)
+        obj.invalidateHash()
+
+
+class BuildActionSchema(object):
+    """
+    The compiled attribute config of a BuildAction class.
+
+    Provides constant time lookup of attributes by name, precomputed
+    default values, and a slots-based class used to store the attribute
+    values of each action instance.
+    """
+
+    def __init__(self, actionClass):
+        """
+        Args:
+            actionClass: A BuildAction class with a loaded config
+        """
+        # the list of attribute config data, in order
+        self.attrs = list(actionClass.config['attrs'])
+        # the names of all attributes, in order
+        self.names = tuple([attr['name'] for attr in self.attrs])
+        # {name: index} for all attributes
+        self.indexes = {name: i for i, name in enumerate(self.names)}
+        # the names of attributes whose values are stored on each instance,
+        # excludes attributes that are overridden by members of the action class
+        self.storedNames = tuple([n for n in self.names if not _isClassMember(actionClass, n)])
+        # (name, default value, is mutable) for all stored attributes
+        self.defaults = []
+        for name in self.storedNames:
+            value = actionClass.getDefaultValue(self.attrs[self.indexes[name]])
+            self.defaults.append((name, value, not isinstance(value, _IMMUTABLE_TYPES)))
+        # the class used to store attribute values for each instance
+        self.valueClass = type(actionClass.__name__ + 'Values', (object,), {'__slots__': self.storedNames})
+
+    def getAttrConfig(self, attrName):
+        """
+        Return config data for an attribute by name
+        """
+        index = self.indexes.get(attrName)
+        if index is not None:
+            return self.attrs[index]
+
+    def getDefaultValue(self, attrName):
+        """
+        Return a new copy of the default value of an attribute by name
+        """
+        index = self.indexes.get(attrName)
+        if index is not None:
+            return copyData(BuildAction.getDefaultValue(self.attrs[index]))
+
+    def createValues(self, attrKwargs=None):
+        """
+        Return a new value store containing default values for all
+        attributes, or values from a dict if they are available.
+
+        Args:
+            attrKwargs: A dict of attribute values by name
+        """
+        values = self.valueClass()
+        for name, value, isMutable in self.defaults:
+            if attrKwargs and name in attrKwargs:
+                value = attrKwargs[name]
+            elif isMutable:
+                value = copyData(value)
+            setattr(values, name, value)
+        return values
+
+
+def _isClassMember(cls, name):
+    """
+    Return True if a class has a member with the given name
+    that is not a BuildActionAttr descriptor.
+    """
+    for c in cls.__mro__:
+        if name in c.__dict__:
+            return not isinstance(c.__dict__[name], BuildActionAttr)
+    return False
+
+
 class BuildAction(BuildItem):
     """
     A BuildItem that provides extended functionality.
@@ -389,6 +629,11 @@ class BuildAction(BuildItem):
     config = None
     configFile = None
 
+    # when True, the nodes created by this action can be cached and
+    # imported instead of running the action again when its attribute
+    # values and inputs are unchanged, see `getMemoInputs` and `runCached`
+    memoize = False
+
     @classmethod
     def getTypeName(cls):
         result = cls.__name__
@@ -396,13 +641,36 @@ class BuildAction(BuildItem):
             result = result[:-6]
         return result
 
+    @classmethod
+    def compileSchema(cls):
+        """
+        Compile the attribute config of this BuildAction class into
+        a BuildActionSchema, and install descriptors for accessing
+        each attribute. Called automatically when actions are registered.
+        """
+        schema = BuildActionSchema(cls)
+        for name in schema.storedNames:
+            setattr(cls, name, BuildActionAttr(name, schema.valueClass.__dict__[name]))
+        cls._schema = schema
+        return schema
+
+    @classmethod
+    def getSchema(cls):
+        """
+        Return the compiled BuildActionSchema for this class,
+        compiling it if necessary
+        """
+        schema = cls.__dict__.get('_schema')
+        if schema is None:
+            schema = cls.compileSchema()
+        return schema
+
     @classmethod
     def getAttrNames(cls):
         """
         Return a list of attribute names for this BuildAction class
         """
-        for attr in cls.config['attrs']:
-            yield attr['name']
+        return cls.getSchema().names
 
     @classmethod
     def getAttrConfig(cls, attrName):
@@ -412,9 +680,7 @@ class BuildAction(BuildItem):
         Args:
             attrName: A str name of the attribute
         """
-        for attr in cls.config['attrs']:
-            if attr['name'] == attrName:
-                return attr
+        return cls.getSchema().getAttrConfig(attrName)
 
     @classmethod
     def getDefaultValue(cls, attr):
@@ -448,13 +714,37 @@ class BuildAction(BuildItem):
             raise ValueError("BatchBuildAction must have a valid actionClass")
 
         # copy attribute values
-        data = batchAction.constantValues
+        data = dict(batchAction.constantValues)
         if batchAction.variantValues:
             data.update(batchAction.variantValues[0])
         data = copyData(data)
 
         return batchAction.actionClass(**data)
 
+    @classmethod
+    def runBatch(cls, actions):
+        """
+        Run multiple instances of this action at once. This is optional,
+        and can be implemented in subclasses so that all variants of a
+        BatchBuildAction are run together, e.g. to issue bulk commands
+        instead of one command per action.
+
+        Args:
+            actions: A list of BuildAction instances of this class
+
+        Returns:
+            A list containing an exception or None for each action,
+            so that errors can be attributed to the variant that caused them
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def hasRunBatch(cls):
+        """
+        Return True if this BuildAction class implements `runBatch`
+        """
+        return cls.runBatch.__func__ is not BuildAction.runBatch.__func__
+
     def __init__(self, **attrKwargs):
         """
         Args:
@@ -468,16 +758,18 @@ class BuildAction(BuildItem):
         # rig is only available during build
         self.rig = None
         # initialize attributes from config
-        for attr in self.config['attrs']:
-            if not hasattr(self, attr['name']):
-                if attr['name'] in attrKwargs:
-                    setattr(self, attr['name'], attrKwargs[attr['name']])
-                else:
-                    setattr(self, attr['name'], self.getDefaultValue(attr))
+        self._attrValues = self.getSchema().createValues(attrKwargs)
 
     def getLoggerName(self):
         return 'pulse.action.' + self.getTypeName().lower()
 
+    def getActionCount(self):
+        """
+        Return the number of actions this item represents, which
+        is always 1 for a BuildAction
+        """
+        return 1
+
     def getDisplayName(self):
         return self.config['displayName']
 
@@ -492,19 +784,19 @@ class BuildAction(BuildItem):
     def serialize(self):
         data = super(BuildAction, self).serialize()
         # serialize values for all attr values
-        for attr in self.config['attrs']:
-            data[attr['name']] = getattr(self, attr['name'])
+        for name in self.getSchema().names:
+            data[name] = getattr(self, name)
         return data
 
     def deserialize(self, data):
         super(BuildAction, self).deserialize(data)
         # load values for all action attrs
-        for attr in self.config['attrs']:
-            if attr['name'] in data:
-                setattr(self, attr['name'], data[attr['name']])
-            else:
-                self.log.warning('No serialized data for attribute: {0}'.format(attr['name']))
-                setattr(self, attr['name'], self.getDefaultValue(attr))
+        schema = self.getSchema()
+        for name in schema.storedNames:
+            if name not in data:
+                self.log.warning('No serialized data for attribute: {0}'.format(name))
+        self._attrValues = schema.createValues(data)
+        self.invalidateHash()
 
     def getRigMetaData(self):
         """
@@ -523,6 +815,16 @@ class BuildAction(BuildItem):
             self.log.error('Cannot update rig meta data, no rig is set')
             return
         meta.updateMetaData(self.rig, RIG_METACLASS, data)
+        if 'name' in data:
+            RIG_INDEX.invalidate()
+
+    def validate(self):
+        """
+        Check the configuration of this action without running it.
+        Should be implemented in subclasses to raise a BuildActionError
+        describing any problem that would cause the action to fail.
+        """
+        pass
 
     def run(self):
         """
@@ -532,6 +834,30 @@ class BuildAction(BuildItem):
         """
         raise NotImplementedError
 
+    def getMemoInputs(self):
+        """
+        Return serializable data representing the state of the scene
+        that the output of this action depends on, used to identify
+        cached results when `memoize` is enabled. By default this is
+        the world matrix of every transform referenced by an attribute.
+        """
+        result = []
+        for name in self.getAttrNames():
+            value = getattr(self, name)
+            for node in (value if isinstance(value, list) else [value]):
+                if isinstance(node, pm.nt.Transform):
+                    result.append(pm.cmds.xform(node.longName(), query=True, worldSpace=True, matrix=True))
+        return result
+
+    def runCached(self):
+        """
+        Called instead of `run` when the nodes created by a memoized action
+        were restored from the cache. Should be implemented in subclasses
+        to perform any part of `run` that does not create nodes, such as
+        updating rig meta data.
+        """
+        pass
+
 
 
 
@@ -543,8 +869,8 @@ class BatchBuildAction(BuildItem):
     BuildActions can be converted to and from BatchBuildAction
     (with data loss when converting from Batch) for convenience.
 
-    BatchBuildActions are not run, instead they provide an actionIterator
-    just like BuildGroups which generates BuildAction instances at build time.
+    BatchBuildActions are not run, instead `createAction` creates a BuildAction
+    instance for each variant at build time, see `BuildPlan`.
     """
 
     @classmethod
@@ -563,9 +889,9 @@ class BatchBuildAction(BuildItem):
         batch.setActionClass(action.__class__)
 
         # copy attribute values
-        attrNames = list(action.getAttrNames())
-        data = {k:v for k, v in action.__dict__.iteritems() if k in attrNames}
+        data = {name: getattr(action, name) for name in action.getAttrNames()}
         batch.constantValues = copyData(data)
+        batch.invalidateHash()
         return batch
 
     def __init__(self):
@@ -582,6 +908,16 @@ class BatchBuildAction(BuildItem):
         self.variantAttributes = []
         # all variant attribute values
         self.variantValues = []
+        # the constant kwargs of every created action, cached until the hash is invalidated
+        self._constantKwargs = None
+
+    def invalidateHash(self):
+        super(BatchBuildAction, self).invalidateHash()
+        self._constantKwargs = None
+
+    def clearHashCache(self):
+        super(BatchBuildAction, self).clearHashCache()
+        self._constantKwargs = None
 
     def getLoggerName(self):
         return 'pulse.batchaction'
@@ -623,6 +959,7 @@ class BatchBuildAction(BuildItem):
         self.constantValues = data['constantValues']
         self.variantAttributes = data['variantAttributes']
         self.variantValues = data['variantValues']
+        self.invalidateHash()
 
     def setActionClass(self, actionClass):
         """
@@ -643,6 +980,7 @@ class BatchBuildAction(BuildItem):
         if self.actionClass:
             # initialize attributes from config
             self._initActionAttrs()
+        self.invalidateHash()
 
     def _initActionAttrs(self):
         """
@@ -653,9 +991,10 @@ class BatchBuildAction(BuildItem):
             actionClass: A BuildAction class
         """
         if self.actionClass:
-            for attr in self.actionClass.config['attrs']:
-                if attr['name'] not in self.constantValues:
-                    self.constantValues[attr['name']] = self.actionClass.getDefaultValue(attr)
+            schema = self.actionClass.getSchema()
+            for name in schema.names:
+                if name not in self.constantValues:
+                    self.constantValues[name] = schema.getDefaultValue(name)
 
     def addVariantAttr(self, attrName):
         """
@@ -672,6 +1011,7 @@ class BatchBuildAction(BuildItem):
                 item[attrName] = self.constantValues[attrName]
         # remove attribute from constant values
         del self.constantValues[attrName]
+        self.invalidateHash()
 
 
     def removeVariantAttr(self, attrName):
@@ -687,30 +1027,29 @@ class BatchBuildAction(BuildItem):
         if len(self.variantValues):
             self.constantValues[attrName] = self.variantValues[0][attrName]
         else:
-            attr = self.actionClass.getAttrConfig(attrName)
-            self.constantValues[attrName] = self.actionClass.getDefaultValue(attr)
+            self.constantValues[attrName] = self.actionClass.getSchema().getDefaultValue(attrName)
         # remove all values from variant values
         for item in self.variantValues:
             del item[attrName]
+        self.invalidateHash()
 
     def _createNewVariant(self):
-        variant = {}
-        for attrName in self.variantAttributes:
-            attr = self.actionClass.getAttrConfig(attrName)
-            variant[attrName] = self.actionClass.getDefaultValue(attr)
-        return variant
+        schema = self.actionClass.getSchema()
+        return {name: schema.getDefaultValue(name) for name in self.variantAttributes}
     
     def addVariant(self):
         """
         Add a variant of attribute values.
         """
         self.variantValues.append(self._createNewVariant())
+        self.invalidateHash()
 
     def insertVariant(self, position):
         """
         Insert a variant of attribute values.
         """
         self.variantValues.insert(position, self._createNewVariant())
+        self.invalidateHash()
 
     def removeVariantAt(self, position):
         """
@@ -719,6 +1058,7 @@ class BatchBuildAction(BuildItem):
         count = len(self.variantValues)
         if position >= -count and position < count:
             del self.variantValues[position]
+            self.invalidateHash()
 
     def getActionCount(self):
         """
@@ -726,31 +1066,273 @@ class BatchBuildAction(BuildItem):
         """
         return len(self.variantValues)
 
-    def actionIterator(self, parentPath=None):
+    def getBatchPath(self, parentPath=None):
         """
-        Return an iterator for all action instances that this batch
-        action represents, with their appropriate attribuate variations.
+        Return the path of this batch action, which is the
+        parent path of all the actions that it represents
 
         Args:
             parentPath: A string path representing the parent BuildGroup
-
-        Returns:
-            Iterator of (BuildAction, string) representing all actions and
-            the build group path leading to them.
         """
         _parentPath = (parentPath + '/') if parentPath else ''
-        thisPath = _parentPath + 'Batch'
-        for index, variant in enumerate(self.variantValues):
-            pathAtIndex = '{0}[{1}]'.format(thisPath, index)
-            kwargs = {k:v for k, v in self.constantValues.iteritems() if k not in self.variantAttributes}
-            kwargs.update(variant)
-            yield self.actionClass(**kwargs), pathAtIndex
+        return _parentPath + 'Batch'
+
+    def createAction(self, index):
+        """
+        Return a new action instance for one of the variants of this batch
+
+        Args:
+            index: An int index of the variant
+        """
+        if self._constantKwargs is None:
+            self._constantKwargs = {k:v for k, v in self.constantValues.iteritems() if k not in self.variantAttributes}
+        kwargs = dict(self._constantKwargs)
+        kwargs.update(self.variantValues[index])
+        return self.actionClass(**kwargs)
 
 
 BUILDITEM_TYPEMAP['BatchBuildAction'] = BatchBuildAction
 
 
 
+class BuildPlan(object):
+    """
+    A flattened list of every action and build step in a tree of
+    BuildItems, which allows looking up actions and steps by index or
+    path in constant time, instead of iterating over the tree.
+
+    Actions are stored as references to the BuildActions in the tree,
+    or as a BatchBuildAction and variant index, so batch actions are
+    only created when requested. Paths are stored as the index of the
+    interned path of the group or batch containing each action, and the
+    index of the action within it, and are only formatted when requested.
+
+    A plan is no longer valid once its tree is modified, see `isValid`.
+    Use `Blueprint.getPlan` to get an up-to-date plan for a Blueprint.
+    """
+
+    def __init__(self, rootGroup):
+        """
+        Args:
+            rootGroup: The top-most BuildGroup of the tree
+        """
+        self.rootGroup = rootGroup
+        # the revision of the tree that this plan was compiled from
+        self.revision = rootGroup._revision
+
+        # for every action, the BuildAction or BatchBuildAction,
+        # and the variant index for batch actions, or -1
+        self._items = []
+        self._variants = []
+        # for every action, the index of the path containing it in
+        # `containerPaths`, or -1 if it has no path, and its index within it
+        self._containers = []
+        self._indexes = []
+        # the interned paths of all groups and batches that contain actions
+        self.containerPaths = []
+        # {container path: index in `containerPaths`}
+        self._containerIndexes = {}
+        # {(container index, index within container): action index}
+        self._actionIndexes = {}
+
+        # for every build step, (first action index, action count)
+        self._steps = []
+        # for every BatchBuildAction, (BatchBuildAction, first action index, action count)
+        self.batchRanges = []
+        # for every top-level item, (first step index, end step index, first action index, end action index)
+        self._rootItemRanges = []
+        # {group path: BuildGroup}, where paths contain only the display names of groups
+        self._groups = {}
+
+        for index, item in enumerate(rootGroup.children):
+            firstStep, firstAction = len(self._steps), len(self._items)
+            self._addChild(rootGroup, None, '', index, item)
+            self._rootItemRanges.append((firstStep, len(self._steps), firstAction, len(self._items)))
+        self._groups[''] = rootGroup
+
+    def _getContainerIndex(self, path):
+        if not path:
+            return -1
+        index = self._containerIndexes.get(path)
+        if index is None:
+            index = len(self.containerPaths)
+            self.containerPaths.append(intern(path))
+            self._containerIndexes[path] = index
+        return index
+
+    def _addAction(self, item, variant, containerIndex, index):
+        actionIndex = len(self._items)
+        self._items.append(item)
+        self._variants.append(variant)
+        self._containers.append(containerIndex)
+        self._indexes.append(index)
+        if containerIndex >= 0:
+            self._actionIndexes[(containerIndex, index)] = actionIndex
+        return actionIndex
+
+    def _addChild(self, group, groupPath, groupNamePath, index, item):
+        """
+        Add a child item of a group to the plan
+
+        Args:
+            group: The BuildGroup containing the item
+            groupPath: The string path of the group, as used in action paths
+            groupNamePath: The string path of the group made of display names,
+                or None if the group cannot be found by path
+            index: The int index of the item in the group
+            item: The BuildItem to add
+        """
+        pathAtIndex = '{0}[{1}]'.format(groupPath, index) if groupPath else None
+        if isinstance(item, BuildGroup):
+            name = item.getDisplayName()
+            childPath = '/'.join([pathAtIndex, name]) if pathAtIndex else name
+            childNamePath = None
+            if groupNamePath is not None:
+                childNamePath = '/'.join([groupNamePath, name]) if groupNamePath else name
+                # the first group with a name is found when looking up paths
+                if childNamePath in self._groups:
+                    childNamePath = None
+                else:
+                    self._groups[childNamePath] = item
+            for childIndex, child in enumerate(item.children):
+                self._addChild(item, childPath, childNamePath, childIndex, child)
+        elif isinstance(item, BatchBuildAction):
+            containerIndex = self._getContainerIndex(item.getBatchPath(pathAtIndex))
+            count = item.getActionCount()
+            firstAction = len(self._items)
+            for variant in range(count):
+                self._addAction(item, variant, containerIndex, variant)
+            self.batchRanges.append((item, firstAction, count))
+            if item.actionClass and item.actionClass.hasRunBatch():
+                if count:
+                    self._steps.append((firstAction, count))
+            else:
+                self._steps.extend([(firstAction + i, 1) for i in range(count)])
+        elif isinstance(item, BuildAction):
+            actionIndex = self._addAction(item, -1, self._getContainerIndex(groupPath), index)
+            self._steps.append((actionIndex, 1))
+
+    def isValid(self):
+        """
+        Return True if the tree has not been modified since this plan was compiled
+        """
+        return self.revision == self.rootGroup._revision
+
+    def getActionCount(self):
+        return len(self._items)
+
+    def getStepCount(self):
+        return len(self._steps)
+
+    def getRootItemCount(self):
+        return len(self._rootItemRanges)
+
+    def getAction(self, index):
+        """
+        Return a (BuildAction, string path) for an action by index.
+        Actions of batches are created each time they are requested.
+        """
+        variant = self._variants[index]
+        if variant < 0:
+            action = self._items[index]
+        else:
+            action = self._items[index].createAction(variant)
+        return action, self.getActionPath(index)
+
+    def getActionPath(self, index):
+        """
+        Return the path of an action by index, or None
+        if the action is a direct child of the root group
+        """
+        containerIndex = self._containers[index]
+        if containerIndex < 0:
+            return None
+        return '{0}[{1}]'.format(self.containerPaths[containerIndex], self._indexes[index])
+
+    def getActionIndex(self, path):
+        """
+        Return the index of an action by path, or None if it doesn't exist
+
+        Args:
+            path: A string path, e.g. 'Main[2]/MyGroup[0]'
+        """
+        if not path or not path.endswith(']'):
+            return
+        containerPath, _, index = path[:-1].rpartition('[')
+        containerIndex = self._containerIndexes.get(containerPath)
+        if containerIndex is None or not index.isdigit():
+            return
+        return self._actionIndexes.get((containerIndex, int(index)))
+
+    def getStep(self, index):
+        """
+        Return the (list of BuildAction, list of string path) of a build step by index
+        """
+        firstAction, count = self._steps[index]
+        actions, paths = [], []
+        for actionIndex in range(firstAction, firstAction + count):
+            action, path = self.getAction(actionIndex)
+            actions.append(action)
+            paths.append(path)
+        return actions, paths
+
+    def getStepActionCount(self, index):
+        return self._steps[index][1]
+
+    def getStepName(self, index):
+        """
+        Return the (string path, string display name) of a build step by
+        index, without creating any actions. The path is the path of the
+        first action, and steps of more than one action include the
+        action count in their name, e.g. 'Anim Control (x4)'.
+        """
+        firstAction, count = self._steps[index]
+        name = self._items[firstAction].getDisplayName()
+        if count > 1:
+            name = '{0} (x{1})'.format(name, count)
+        return self.getActionPath(firstAction), name
+
+    def getRootItemSteps(self, index):
+        """
+        Return the range of the indexes of all build steps of a top-level item
+        """
+        firstStep, endStep, firstAction, endAction = self._rootItemRanges[index]
+        return xrange(firstStep, endStep)
+
+    def getRootItemActionCount(self, index):
+        """
+        Return the number of actions in a top-level item
+        """
+        firstStep, endStep, firstAction, endAction = self._rootItemRanges[index]
+        return endAction - firstAction
+
+    def actionIterator(self):
+        """
+        Return an iterator of (BuildAction, string path) for all actions in the plan
+        """
+        for index in xrange(len(self._items)):
+            yield self.getAction(index)
+
+    def stepIterator(self):
+        """
+        Return an iterator of (list of BuildAction, list of string path)
+        for all build steps in the plan
+        """
+        for index in xrange(len(self._steps)):
+            yield self.getStep(index)
+
+    def getGroup(self, groupPath):
+        """
+        Return a BuildGroup by path, or None if it doesn't exist
+
+        Args:
+            groupPath: A string path made of the display names of groups,
+                e.g. 'Main/MyGroup/MySubGroup', or '' for the root group
+        """
+        return self._groups.get(groupPath)
+
+
+
 
 
 
@@ -825,6 +1407,8 @@ class Blueprint(object):
         self.version = BLUEPRINT_VERSION
         # the root BuildGroup of this blueprint
         self.rootGroup = BuildGroup(displayName='')
+        # the cached BuildPlan of the root group
+        self._plan = None
 
     def serialize(self):
         data = {}
@@ -840,18 +1424,34 @@ class Blueprint(object):
         # ignore whatever display name was serialized for root group
         self.rootGroup.displayName = ''
 
+    def getHash(self):
+        """
+        Return a sha1 hex digest of the contents of this Blueprint.
+        Only the BuildItems that changed since the last call are hashed again.
+        """
+        return hashing.hashStrings([self.rigName, str(self.version), self.rootGroup.getHash()])
+
     def saveToNode(self, node, create=False):
         """
         Save this Blueprint to a node, creating a new node if desired.
 
+        Each top-level BuildItem is stored in its own shard attribute
+        on the node, and only items that have changed since the last
+        save are written. The blueprint meta data contains the rig
+        settings and the ordered list of shards.
+
         Args:
             node: A PyNode or node name
             create: A bool, whether to create the node if it doesn't exist
         """
         if create and not pm.cmds.objExists(node):
             node = pm.cmds.createNode('network', n=node)
-        data = self.serialize()
-        meta.setMetaData(node, BLUEPRINT_METACLASS, data)
+        data = {}
+        data['rigName'] = self.rigName
+        data['version'] = self.version
+        data['shards'] = writeShards(node, self.rootGroup.children)
+        if not meta.hasMetaClass(node, BLUEPRINT_METACLASS) or meta.getMetaData(node, BLUEPRINT_METACLASS) != data:
+            meta.setMetaData(node, BLUEPRINT_METACLASS, data)
 
     def saveToDefaultNode(self):
         self.saveToNode(BLUEPRINT_NODENAME, create=True)
@@ -866,6 +1466,14 @@ class Blueprint(object):
         if not Blueprint.isBlueprintNode(node):
             raise ValueError("Node does not contain Blueprint data: {0}".format(node))
         data = meta.getMetaData(node, BLUEPRINT_METACLASS)
+        if 'shards' in data:
+            # assemble the root group from the top-level item shards
+            data = dict(data)
+            data['buildItems'] = dict(
+                type=BuildGroup.getTypeName(),
+                displayName='',
+                children=readShards(node, data['shards']),
+            )
         self.deserialize(data)
 
     def loadFromDefaultNode(self):
@@ -874,11 +1482,20 @@ class Blueprint(object):
             return True
         return False
 
+    def getPlan(self):
+        """
+        Return the BuildPlan of this Blueprint. The plan is cached
+        until the root group or any of its items are modified.
+        """
+        if not self._plan or self._plan.rootGroup is not self.rootGroup or not self._plan.isValid():
+            self._plan = BuildPlan(self.rootGroup)
+        return self._plan
+
     def actionIterator(self):
         """
-        Return the action iterator of the Blueprints root BuildGroup
+        Return an iterator of (BuildAction, string path) for all actions in this Blueprint
         """
-        return self.rootGroup.actionIterator()
+        return self.getPlan().actionIterator()
 
     def initializeDefaultActions(self):
         """
@@ -910,15 +1527,9 @@ class Blueprint(object):
             groupPath: A string path to a BuildGroup,
                 e.g. 'Main/MyGroup/MySubGroup'
         """
-        groupNames = []
-        if groupPath and groupPath != '/':
-            groupNames = groupPath.split('/')
-        currentGroup = self.rootGroup
-        for name in groupNames:
-            currentGroup = currentGroup.getChildGroupByName(name)
-            if not currentGroup:
-                return
-        return currentGroup
+        if groupPath == '/':
+            groupPath = ''
+        return self.getPlan().getGroup(groupPath or '')
 
 
 
@@ -930,7 +1541,13 @@ class BlueprintBuilder(object):
     the Blueprint itself.
     """
 
-    def __init__(self, blueprint, blueprintFile=None, debug=False, logDir=None):
+    def __init__(self, blueprint, blueprintFile=None, debug=False, logDir=None,
+                 useCheckpoints=False, checkpointDir=None, trace=False, countNodes=False,
+                 disableUndo=False, timeSlice=None, useCache=False, cacheDir=None,
+                 memoizeActions=False, memoDir=None, useRecording=False, recordingDir=None,
+                 isolateActions=False, pauseOnError=False, telemetry=False, telemetryFile=None,
+                 profile=False, profileDir=None, profileFilters=None, countCommands=False,
+                 trackMemory=False, memoryThresholds=None):
         """
         Initialize a BlueprintBuilder
 
@@ -938,6 +1555,69 @@ class BlueprintBuilder(object):
             blueprint: A Blueprint to be built
             blueprintFile: A string path to the maya file containing the blueprint
                 to be stored on the built rig for convenience
+            useCheckpoints: A bool, when True, a scene snapshot is saved after each
+                top-level BuildGroup, and the build resumes from the last snapshot
+                whose upstream build items and scene contents are unchanged.
+                Builds without a blueprintFile do not resume
+            checkpointDir: A string path to the directory where checkpoints are
+                saved, defaults to a per-rig directory in the temp dir
+            trace: A bool, when True, the timing of every action is recorded
+                and saved as a Chrome trace json file next to the log file
+            countNodes: A bool, when True, the change in the number of nodes in
+                the scene is measured for every action that is timed. Lists every
+                node in the scene twice per action, so is slow in large scenes
+            disableUndo: A bool, when True, undo is turned off while building so
+                that maya does not record every command in the undo queue.
+                This also flushes the undo queue.
+            timeSlice: A float number of seconds. When set, each call to `run`
+                returns once it has spent at least this long running build steps,
+                so that the build can be continued later, e.g. from a UI timer
+            useCache: A bool, when True, a copy of each successfully built scene is
+                cached, and building a blueprint whose contents, actions and input
+                files are unchanged restores the cached scene instead
+            cacheDir: A string path to the directory where built scenes are
+                cached, defaults to a directory in the temp dir
+            memoizeActions: A bool, when True, the nodes created by actions that
+                support memoization are cached, and imported instead of running
+                the action when its attribute values and inputs are unchanged.
+                Actions are not memoized while the build is being recorded
+            memoDir: A string path to the directory where the nodes created by
+                actions are cached, defaults to a directory in the temp dir
+            useRecording: A bool, when True, the maya commands run by a successful
+                build are recorded, and building a blueprint whose contents, actions
+                and input files are unchanged replays the commands instead of
+                running any actions
+            recordingDir: A string path to the directory where build recordings
+                are saved, defaults to a directory in the user's home dir
+            isolateActions: A bool, when True, each build step runs in its own undo
+                chunk, and the changes of a step that fails are undone so that later
+                steps do not run on a half-built scene. Requires undo, so if
+                disableUndo is also set, undo is left on and flushed after each step
+            pauseOnError: A bool, when True, the build pauses after a step fails,
+                so that it can be retried or skipped using `retryFailedStep` or
+                `skipFailedStep` before calling `run` again
+            telemetry: A bool, when True, the timings of the build are saved to the
+                telemetry database, and previous builds are used to estimate the
+                remaining time of the build. Every build step is then timed, so
+                it is off by default, see `telemetry.isTelemetryEnabled`
+            telemetryFile: A string path to the telemetry database, see
+                `telemetry.getDefaultDatabasePath`
+            profile: A bool, when True, build steps are run under cProfile, saving
+                a pstats file for each step and a collapsed stack file of all steps
+            profileDir: A string path to the directory where profiles are saved,
+                defaults to a directory next to the log file
+            profileFilters: A list of string patterns, if given, only steps whose
+                action type name or path matches a pattern are profiled, see
+                `ActionProfiler`
+            countCommands: A bool, when True, the calls and time of every maya
+                command are counted for each build step, and the steps that
+                spend the most time in commands are reported when the build finishes
+            trackMemory: A bool, when True, process memory, maya heap memory, python
+                allocations and the number of nodes and connections in the scene
+                are measured before and after every build step. Slows down builds
+                of large scenes, since every node is queried for connections
+            memoryThresholds: A dict of {measurement name: max change} for warning
+                about steps that use too much memory, see `MemoryMonitor`
 
         """
         if not isinstance(blueprint, Blueprint):
@@ -948,16 +1628,105 @@ class BlueprintBuilder(object):
         self.debug = debug
 
         self.log = logging.getLogger('pulse.build')
+        # build logs are not passed to the handlers of parent loggers,
+        # which may include the script editor, and are echoed below instead.
+        # The logger is restored when the logs are closed
+        self._logPropagate = self.log.propagate
+        self.log.propagate = False
+        # stop the writer threads of previous builds
+        for handler in self.log.handlers:
+            handler.close()
         # the output directory for log files
         dateStr = datetime.now().strftime('%Y-%m-%d_%H%M%S')
         if not logDir:
             logDir = tempfile.gettempdir()
-        logFile = os.path.join(logDir, 'pulse_build_{0}_{1}.log'.format(self.blueprint.rigName, dateStr))
-        self.fileHandler = logging.FileHandler(logFile)
-        self.fileHandler.setLevel(logging.DEBUG)
+        self.logFile = os.path.join(logDir, 'pulse_build_{0}_{1}.log'.format(self.blueprint.rigName, dateStr))
+        # log files are written on a background thread
+        self.logHandler = QueuedFileHandler(self.logFile)
+        self.logHandler.setLevel(logging.DEBUG)
         logFormatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
-        self.fileHandler.setFormatter(logFormatter)
-        self.log.handlers = [self.fileHandler]
+        self.logHandler.setFormatter(logFormatter)
+        # logs printed to the script editor are buffered
+        self.echo = BufferedEcho()
+        self.echoHandler = BufferedEchoHandler(self.echo)
+        self.echoHandler.setLevel(logging.INFO)
+        self.echoHandler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+        self.log.handlers = [self.logHandler, self.echoHandler]
+
+        # publishes build progress, errors and timings to any subscribers
+        self.events = BuildEventBus()
+        self.countNodes = countNodes
+
+        self.trace = None
+        self.traceFile = None
+        if trace:
+            self.trace = BuildTrace(self.blueprint.rigName)
+            self.trace.subscribe(self.events)
+            self.traceFile = os.path.splitext(self.logFile)[0] + '.trace.json'
+
+        self.profiler = None
+        if profile:
+            if not profileDir:
+                profileDir = os.path.splitext(self.logFile)[0] + '_profile'
+            self.profiler = ActionProfiler(profileDir, profileFilters)
+
+        self.commandCounter = None
+        if countCommands:
+            self.commandCounter = CommandCounter()
+
+        self.memoryMonitor = None
+        if trackMemory:
+            self.memoryMonitor = MemoryMonitor(memoryThresholds, self.log)
+            self.memoryMonitor.subscribe(self.events)
+
+        self.telemetry = None
+        if telemetry:
+            self.telemetry = BuildTelemetry(
+                TelemetryStore(telemetryFile), self.blueprint.rigName, self.blueprint.getHash())
+            self.telemetry.subscribe(self.events)
+
+        self.disableUndo = disableUndo
+        # the undo state to restore after building, or None if undo is not suspended
+        self._undoState = None
+        # the heap memory in megabytes when undo was suspended
+        self._undoStartMemory = None
+
+        self.cache = None
+        # the cache key of the build, if using the cache
+        self.cacheKey = None
+        if useCache:
+            self.cache = BuildCache(cacheDir)
+
+        self.memoCache = None
+        if memoizeActions:
+            self.memoCache = ActionMemoCache(memoDir)
+
+        self.recordings = None
+        # the recorder capturing the commands of the build, if recording
+        self.recorder = None
+        if useRecording:
+            self.recordings = BuildRecordings(recordingDir)
+
+        self.checkpoints = None
+        if useCheckpoints:
+            self.checkpoints = BuildCheckpoints(
+                self.blueprint, self.blueprintFile, checkpointDir, blueprintNode=BLUEPRINT_NODENAME)
+
+        self.isolateActions = isolateActions
+        # the time in seconds spent managing undo chunks and undoing failed steps
+        self.isolationTime = 0
+        self.pauseOnError = pauseOnError
+        # the step that failed while the build is paused, as a dict
+        # containing the step index, actions and paths
+        self.failedStep = None
+        self._retryFailedStep = False
+
+        self.timeSlice = timeSlice
+        # the time at which the current call to `run` started
+        self.runStartTime = None
+        # the progress of the build, as last reported by the build generator
+        self.currentStep = 0
+        self.totalSteps = 0
 
         self.errors = []
         self.generator = None
@@ -1015,29 +1784,52 @@ class BlueprintBuilder(object):
             self.log.warning("Cannot run/continue a finished or cancelled build")
             return
         self.isRunning = True
-
-        while True:
-            iterResult = self.generator.next()
-            # handle the result of the build iteration
-            if iterResult.get('finish'):
-                self.finish()
-            # report progress
-            self.onProgress(iterResult['current'], iterResult['total'])
-            # check for user cancel
-            if self.checkCancel():
-                self.cancel()
-            # check if we should stop running
-            if self.isFinished or self.isCancelled or self.checkPause():
-                break
-
-        self.isRunning = False
+        self.runStartTime = time.time()
+
+        try:
+            while True:
+                iterResult = self.generator.next()
+                # handle the result of the build iteration
+                if iterResult.get('finish'):
+                    self.finish()
+                # report progress
+                self.currentStep = iterResult['current']
+                self.totalSteps = iterResult['total']
+                self.onProgress(iterResult['current'], iterResult['total'])
+                # check for user cancel
+                if self.checkCancel():
+                    self.cancel()
+                # check if we should stop running
+                if self.isFinished or self.isCancelled or self.failedStep or self.checkPause():
+                    break
+        finally:
+            # show the logs of this run, even if the build raised
+            self.echo.flush()
+            self.isRunning = False
 
     def checkPause(self):
         """
-        Check for pause. Return True if the build should pause
+        Check for pause. Return True if the build should pause.
+        Pauses once the time slice of the current run has been used.
         """
+        if self.timeSlice is not None:
+            return time.time() - self.runStartTime >= self.timeSlice
         return False
 
+    def retryFailedStep(self):
+        """
+        Run the step that failed again when the paused build is continued
+        """
+        if self.failedStep:
+            self._retryFailedStep = True
+
+    def skipFailedStep(self):
+        """
+        Skip the step that failed when the paused build is continued.
+        This is the default if the build is continued without retrying.
+        """
+        self._retryFailedStep = False
+
     def checkCancel(self):
         """
         Check for cancellation. Return True if the build should be canceled
@@ -1079,7 +1871,18 @@ class BlueprintBuilder(object):
             current: An int representing the current build step
             total: An int representing the total number of build steps
         """
-        pass
+        remainingTime = self.getRemainingTime()
+        if remainingTime is not None:
+            self.log.debug('[{0}/{1}] {2:.1f} seconds remaining'.format(current + 1, total, remainingTime))
+
+    def getRemainingTime(self):
+        """
+        Return the estimated number of seconds until the build finishes,
+        based on the timings of previous builds of the rig. Returns None
+        if telemetry is disabled or nothing has been built yet.
+        """
+        if self.telemetry:
+            return self.telemetry.getRemainingTime(self.currentStep, self.totalSteps)
 
     def onFinish(self):
         """
@@ -1095,17 +1898,90 @@ class BlueprintBuilder(object):
             duration=self.elapsedTime,
             scenePath=self.blueprintFile,
         ))
-        self.fileHandler.close()
+        if self.trace:
+            for record in self.trace.getSlowestRecords(5):
+                self.log.debug('{0:.3f}s {1} ({2})'.format(record.wallTime, record.name, record.path))
+            self.trace.save(self.traceFile)
+            self.log.info('Saved build trace: {0}'.format(self.traceFile))
+        if self.profiler:
+            collapsedFile = self.profiler.saveCollapsedStacks()
+            if collapsedFile:
+                self.log.info('Saved {0} action profile(s): {1}'.format(len(self.profiler.files), collapsedFile))
+        if self.commandCounter:
+            self._stopCountingCommands()
+            self.log.info('Maya command usage by action:\n' + self.commandCounter.formatTopOffenders())
+        if self.memoryMonitor:
+            self.memoryMonitor.stop()
+            for name in ('rss', 'objects', 'nodes'):
+                records = self.memoryMonitor.getLargestRecords(name, 5)
+                self.log.info('Largest {0} increase by action:\n{1}'.format(
+                    name, '\n'.join([r.format() for r in records])))
+        if self.isolateActions:
+            # compare with the build time to decide whether isolation is worth it
+            self.log.info('Action isolation overhead: {0:.3f} seconds'.format(self.isolationTime))
+        self._restoreUndo()
+        if self.events.isListening(BuildFinished):
+            self.events.publish(BuildFinished(self, self.elapsedTime, len(self.errors)))
+        self.closeLogs()
 
     def onCancel(self):
         """
         Called if the build was cancelled
         """
-        pass
+        self.log.warning("Cancelled building rig: {0}".format(self.blueprint.rigName))
+        self._stopRecording()
+        self._stopCountingCommands()
+        if self.memoryMonitor:
+            self.memoryMonitor.stop()
+        self._restoreUndo()
+        if self.events.isListening(BuildCancelled):
+            self.events.publish(BuildCancelled(self))
+        self.closeLogs()
+
+    def closeLogs(self):
+        """
+        Write all pending log records and buffered output, close
+        the log file, and restore the build logger's previous state
+        """
+        self.echo.flush()
+        self.logHandler.close()
+        for handler in (self.logHandler, self.echoHandler):
+            self.log.removeHandler(handler)
+        self.log.propagate = self._logPropagate
+
+    def _suspendUndo(self):
+        """
+        Turn off undo for the duration of the build
+        """
+        if self._undoState is not None:
+            return
+        if self.isolateActions:
+            self.log.info('Undo is flushed after each step instead of disabled, to isolate actions')
+            return
+        self._undoState = pm.cmds.undoInfo(query=True, state=True)
+        self._undoStartMemory = getHeapMemory()
+        if self._undoState:
+            pm.cmds.undoInfo(state=False)
+        self.log.info('Undo is disabled while building')
+
+    def _restoreUndo(self):
+        """
+        Restore the undo state from before the build, and report the
+        heap memory growth of the build. Safe to call more than once.
+        """
+        if self._undoState is None:
+            return
+        if self._undoState:
+            pm.cmds.undoInfo(state=True)
+        self._undoState = None
+        memoryDelta = getHeapMemory() - self._undoStartMemory
+        self.log.info('Heap memory change during build (undo disabled): {0:+.1f} MB'.format(memoryDelta))
 
-    def _onError(self, action, error):
+    def _onError(self, action, error, step=None, path=None):
         self.errors.append(error)
         self.onError(action, error)
+        if self.events.isListening(ActionFailed):
+            self.events.publish(ActionFailed(self, step, path, action, error))
 
     def onError(self, action, error):
         """
@@ -1118,48 +1994,451 @@ class BlueprintBuilder(object):
         if self.debug:
             # when debugging, show stack trace
             self.log.error('{0}'.format(action.getDisplayName()), exc_info=True)
-            traceback.print_exc()
         else:
             self.log.error('{0} : {1}'.format(action.getDisplayName(), error))
 
 
+    def _createRig(self):
+        """
+        Create the rig node for the build and
+        add some additional meta data
+        """
+        self.rig = createRigNode(self.blueprint.rigName)
+        meta.updateMetaData(self.rig, RIG_METACLASS, dict(
+            version = BLUEPRINT_VERSION,
+            blueprintFile = self.blueprintFile,
+        ))
+
+    def _canResume(self):
+        """
+        Return True if the build can resume from a checkpoint. Checkpoints
+        are saved per blueprint file, so the file must be known. Unsaved changes
+        do not prevent resuming, since checkpoints are keyed by the scene contents.
+        """
+        if not self.blueprintFile:
+            self.log.info('Blueprint file is unknown, not resuming from a checkpoint')
+            return False
+        return True
+
+    def _restoreCheckpoint(self, index):
+        """
+        Open the checkpoint for a top-level build item and find the rig
+        being built. Returns True if the rig was successfully restored.
+        """
+        self.log.info('Resuming from checkpoint: {0}'.format(
+            self.blueprint.rootGroup.children[index].getDisplayName()))
+        self.checkpoints.restore(index)
+        rigs = getAllRigsByName([self.blueprint.rigName])
+        if not rigs:
+            self.log.warning('Checkpoint does not contain the rig, performing a full build')
+            return False
+        self.rig = rigs[0]
+        return True
+
+    def _restoreCachedBuild(self):
+        """
+        Compute the cache key for the build, and open the cached built
+        scene if one exists. Returns True if the build was restored.
+        """
+        if pm.cmds.file(query=True, modified=True):
+            # the scene may contain changes that are not part of the key
+            self.log.info('Scene has unsaved changes, not using the build cache')
+            return False
+        self.cacheKey = getBuildKey(self.blueprint, self.blueprintFile, getRegisteredActions().values())
+        if not self.cache.has(self.cacheKey):
+            return False
+        self.log.info('Restoring built rig from cache: {0}'.format(self.cacheKey))
+        try:
+            self.cache.restore(self.cacheKey)
+        except (IOError, KeyError) as e:
+            # the entry may have been evicted by another build process
+            self.log.warning('Cannot restore built rig from cache, building normally: {0}'.format(e))
+            return False
+        rigs = getAllRigsByName([self.blueprint.rigName])
+        if rigs:
+            self.rig = rigs[0]
+        return True
+
+    def _loadRecording(self, key):
+        """
+        Return the recorded build for a key, or None if there is none,
+        or it cannot be replayed in the current scene
+        """
+        if not self.recordings.has(key) or self.recordings.isRejected(key):
+            return
+        if pm.cmds.file(query=True, modified=True):
+            # the scene may contain changes that are not part of the key
+            self.log.info('Scene has unsaved changes, not replaying the recorded build')
+            return
+        if not pm.cmds.file(query=True, sceneName=True):
+            # the scene is reopened if the replayed build does not match
+            self.log.info('Scene has not been saved, not replaying the recorded build')
+            return
+        try:
+            return self.recordings.load(key)
+        except (IOError, KeyError, ValueError, InvalidRecordingError) as e:
+            self.log.warning('Cannot replay recorded build {0}, building normally: {1}'.format(key, e))
+
+    def _replayRecording(self, key, recording):
+        """
+        Replay the recorded commands of a previous build,
+        yielding progress after each recorded build step
+        """
+        self.log.info('Replaying recorded build: {0}'.format(key))
+        totalSteps = len(recording.sections)
+        for currentStep, name in enumerate(recording.replayIterator()):
+            self.log.debug('[{0}/{1}] {2}'.format(currentStep + 1, totalSteps, name))
+            yield dict(current=currentStep, total=totalSteps)
+
+    def _checkReplay(self, key, recording, sceneName):
+        """
+        Return True if a replayed build matches the recorded build. If it
+        doesn't, the recording is rejected, and the scene is reopened so
+        that it can be built normally.
+        """
+        if getSceneFingerprint() == recording.fingerprint:
+            rigs = getAllRigsByName([self.blueprint.rigName])
+            if rigs:
+                self.rig = rigs[0]
+            return True
+        # some changes were made without using commands, and were not recorded
+        self.log.warning('Replayed build does not match the recorded build, building normally: {0}'.format(key))
+        self._rejectReplay(key, sceneName)
+        return False
+
+    def _rejectReplay(self, key, sceneName):
+        """
+        Reject the recording of a build that did not replay correctly,
+        and reopen the scene so that it can be built normally
+        """
+        self.recordings.reject(key)
+        pm.cmds.file(sceneName, open=True, force=True)
+
+    def _saveCheckpoint(self, index):
+        """
+        Save the checkpoint for a top-level build item. Exporting the
+        checkpoint is not part of the build, so it is not recorded.
+        """
+        if self.recorder:
+            self.recorder.pause()
+        try:
+            self.checkpoints.save(index)
+        finally:
+            if self.recorder:
+                self.recorder.resume()
+
+    def _startRecording(self):
+        self.recorder = CommandRecorder()
+        self.recorder.beginSection('Create Rig')
+        self.recorder.start()
+
+    def _stopRecording(self):
+        """
+        Stop recording commands, if recording. Safe to call more than once.
+        """
+        if self.recorder:
+            self.recorder.stop()
+
+    def _stopCountingCommands(self):
+        """
+        Stop counting commands, if counting. Safe to call more than once.
+        """
+        if self.commandCounter:
+            self.commandCounter.stop()
+
+    def _runStep(self, currentStep, totalSteps, actions, paths):
+        """
+        Run the actions of a single build step. Steps with more than one
+        action are batches that are run together using `BuildAction.runBatch`.
+        Returns a list of the indexes of the actions that failed.
+        """
+        action, path = actions[0], paths[0]
+        _path = path + ' - ' if path else ''
+        name = action.getDisplayName()
+        if len(actions) > 1:
+            name = '{0} (x{1})'.format(name, len(actions))
+        self.log.info('[{0}/{1}] {path}{name}'.format(currentStep+1, totalSteps, path=_path, name=name))
+        for a in actions:
+            a.rig = self.rig
+
+        if self.recorder:
+            self.recorder.beginSection(path or name)
+
+        # the commands run by subscribers and measurements are not counted
+        if self.commandCounter:
+            self.commandCounter.pause()
+
+        if self.events.isListening(ActionStarted):
+            self.events.publish(ActionStarted(self, currentStep, totalSteps, path, actions))
+
+        # only measure the step if something is listening
+        isMeasured = self.events.isListening(ActionFinished)
+        if isMeasured:
+            nodeCount = getNodeCount() if self.countNodes else None
+            cpuTime = getCPUTime()
+            startTime = time.time()
+
+        if self.commandCounter:
+            self.commandCounter.setKey(path or name)
+            self.commandCounter.resume()
+        try:
+            if self.profiler and self.profiler.matches(actions, paths):
+                failedIndexes = self.profiler.runcall(
+                    currentStep, path or name, self._runActions, currentStep, actions, paths)
+            else:
+                failedIndexes = self._runActions(currentStep, actions, paths)
+        finally:
+            if self.commandCounter:
+                self.commandCounter.pause()
+                self.commandCounter.setKey(None)
+
+        if isMeasured:
+            wallTime = time.time() - startTime
+            cpuTime = getCPUTime() - cpuTime
+            nodeDelta = (getNodeCount() - nodeCount) if self.countNodes else None
+            self.events.publish(ActionFinished(
+                self, currentStep, totalSteps, path, actions,
+                startTime, wallTime, cpuTime, nodeDelta, bool(failedIndexes)))
+
+        if self.commandCounter:
+            self.commandCounter.resume()
+        return failedIndexes
+
+    def _runIsolatedStep(self, currentStep, totalSteps, actions, paths):
+        """
+        Run a build step inside an undo chunk, and undo all of its
+        changes if any of its actions fail. The other actions of a batch
+        are undone as well, so they are reported as failed too.
+        Returns a list of the indexes of the actions that failed.
+        """
+        startTime = time.time()
+        # a unique name identifies the chunk in the undo queue, since maya drops
+        # empty chunks, and undoing then would undo the previous step instead
+        chunkName = 'pulseBuildStep{0}'.format(currentStep)
+        pm.cmds.undoInfo(openChunk=True, chunkName=chunkName)
+        self.isolationTime += time.time() - startTime
+        try:
+            failedIndexes = self._runStep(currentStep, totalSteps, actions, paths)
+        finally:
+            startTime = time.time()
+            pm.cmds.undoInfo(closeChunk=True)
+            self.isolationTime += time.time() - startTime
+
+        startTime = time.time()
+        isUndone = False
+        if failedIndexes:
+            if pm.cmds.undoInfo(query=True, undoName=True) == chunkName:
+                pm.cmds.undo()
+                isUndone = True
+                self.log.warning('Undid the changes of failed step: {0}'.format(
+                    paths[0] or actions[0].getDisplayName()))
+            if self.recorder:
+                self.recorder.discardSection()
+        elif self.disableUndo:
+            # nothing before this step will need to be undone
+            pm.cmds.flushUndo()
+        self.isolationTime += time.time() - startTime
+
+        if isUndone and len(failedIndexes) < len(actions):
+            # the variants of a batch that succeeded were undone with the rest of the step
+            failedPaths = ', '.join([str(paths[i]) for i in failedIndexes])
+            for i, (a, p) in enumerate(zip(actions, paths)):
+                if i not in failedIndexes:
+                    error = BuildActionError(
+                        'Undone because other variants of the batch failed: {0}'.format(failedPaths))
+                    self._onError(a, error, currentStep + i, p)
+            failedIndexes = range(len(actions))
+        return failedIndexes
+
+    def _runActions(self, currentStep, actions, paths):
+        """
+        Run the actions of a build step and report any errors.
+        Returns a list of the indexes of the actions that failed.
+        """
+        failedIndexes = []
+        if len(actions) == 1:
+            try:
+                # restored nodes cannot be recorded, so recorded builds run every action
+                if self.memoCache and actions[0].memoize and not self.recorder:
+                    self._runMemoized(actions[0])
+                else:
+                    actions[0].run()
+            except Exception as error:
+                failedIndexes.append(0)
+                self._onError(actions[0], error, currentStep, paths[0])
+        else:
+            try:
+                errors = actions[0].runBatch(actions)
+                if len(errors) != len(actions):
+                    raise BuildActionError('{0}.runBatch returned {1} result(s) for {2} action(s)'.format(
+                        type(actions[0]).__name__, len(errors), len(actions)))
+            except Exception as error:
+                # the batch failed as a whole
+                errors = [error] * len(actions)
+            for i, (a, p, error) in enumerate(zip(actions, paths, errors)):
+                if error is not None:
+                    failedIndexes.append(i)
+                    self.log.error('Batch variant failed: {0}'.format(p))
+                    self._onError(a, error, currentStep + i, p)
+        return failedIndexes
+
+    def _runMemoized(self, action):
+        """
+        Run an action that supports memoization, importing its
+        cached nodes instead if its inputs have not changed
+        """
+        key = self.memoCache.getKey(action)
+        if self.memoCache.has(key):
+            self.log.debug('Restoring cached nodes for {0}'.format(action.getDisplayName()))
+            try:
+                self.memoCache.restore(key)
+            except (IOError, KeyError) as e:
+                # removed by another process since it was checked
+                self.log.warning('Could not restore cached nodes for {0}, running it: {1}'.format(
+                    action.getDisplayName(), e))
+            else:
+                action.runCached()
+                return
+        uuids = getSceneUUIDs()
+        action.run()
+        try:
+            self.memoCache.save(key, getNodesCreatedSince(uuids))
+        except Exception as e:
+            self.log.warning('Could not cache nodes for {0}: {1}'.format(action.getDisplayName(), e))
+
     def buildGenerator(self):
         """
         This is the main iterator for performing all build operations.
         It recursively traverses all BuildItems and runs them.
         """
+        if self.isolateActions and not pm.cmds.undoInfo(query=True, state=True):
+            self.log.warning('Undo is turned off, actions cannot be isolated')
+            self.isolateActions = False
+        if self.disableUndo:
+            self._suspendUndo()
+        if self.commandCounter:
+            self.commandCounter.start()
+        if self.memoryMonitor:
+            self.memoryMonitor.start()
+        try:
+            for result in self._buildSteps():
+                yield result
+        finally:
+            # make sure undo is restored if the build fails or is abandoned
+            self._stopRecording()
+            self._stopCountingCommands()
+            if self.memoryMonitor:
+                self.memoryMonitor.stop()
+            self._restoreUndo()
+
+    def _buildSteps(self):
+        """
+        Run all build operations, yielding the progress of the build
+        """
         currentStep = 0
         totalSteps = 0
 
         yield dict(current=currentStep, total=totalSteps)
 
-        # create a new rig
-        self.rig = createRigNode(self.blueprint.rigName)
-        # add some additional meta data
-        meta.updateMetaData(self.rig, RIG_METACLASS, dict(
-            version = BLUEPRINT_VERSION,
-            blueprintFile = self.blueprintFile,
-        ))
+        # restore the built scene from the cache if nothing has changed
+        if self.cache:
+            if self._restoreCachedBuild():
+                yield dict(current=currentStep, total=totalSteps, finish=True)
+                return
+
+        # replay the recorded commands of the build if nothing has changed
+        recordingKey = None
+        if self.recordings:
+            recordingKey = self.cacheKey or getBuildKey(
+                self.blueprint, self.blueprintFile, getRegisteredActions().values())
+            recording = self._loadRecording(recordingKey)
+            if recording:
+                sceneName = pm.cmds.file(query=True, sceneName=True)
+                try:
+                    for result in self._replayRecording(recordingKey, recording):
+                        yield result
+                    isReplayed = self._checkReplay(recordingKey, recording, sceneName)
+                except Exception as e:
+                    # e.g. a recorded name that is no longer unique in the scene
+                    self.log.warning('Replaying recorded build failed, building normally: {0}: {1}'.format(
+                        recordingKey, e))
+                    self._rejectReplay(recordingKey, sceneName)
+                    isReplayed = False
+                if isReplayed:
+                    replayedSteps = len(recording.sections)
+                    yield dict(current=replayedSteps, total=replayedSteps, finish=True)
+                    return
+
+        # resume from a checkpoint or create a new rig
+        rootItems = self.blueprint.rootGroup.children
+        resumeIndex = -1
+        if self.checkpoints and self._canResume():
+            resumeIndex = self.checkpoints.getResumeIndex()
+            if resumeIndex >= 0 and not self._restoreCheckpoint(resumeIndex):
+                resumeIndex = -1
+        if resumeIndex < 0:
+            # only complete builds can be recorded, and builds whose
+            # recording did not replay correctly are not recorded again
+            if self.recordings and not self.recordings.isRejected(recordingKey):
+                self._startRecording()
+            self._createRig()
 
         yield dict(current=currentStep, total=totalSteps)
 
-        # recursively iterate through all build items
-        allActions = list(self.blueprint.actionIterator())
-        totalSteps = len(allActions)
-        for currentStep, (action, path) in enumerate(allActions):
-            _path = path + ' - ' if path else ''
-            self.log.info('[{0}/{1}] {path}{name}'.format(currentStep+1, totalSteps, path=_path, name=action.getDisplayName()))
-            # run the action
-            action.rig = self.rig
-            try:
-                action.run()
-            except Exception as error:
-                self._onError(action, error)
-            # return progress
-            yield dict(current=currentStep, total=totalSteps)
+        # count the remaining steps without creating any actions
+        plan = self.blueprint.getPlan()
+        remainingIndexes = range(resumeIndex + 1, plan.getRootItemCount())
+        totalSteps = sum([plan.getRootItemActionCount(i) for i in remainingIndexes])
+        if self.events.isListening(BuildStarted):
+            self.events.publish(BuildStarted(self, totalSteps, plan, resumeIndex + 1))
+
+        # iterate through the steps of all build items that remain, creating
+        # each action only when it is needed so that large batch actions
+        # do not have to exist in memory all at once
+        for index in remainingIndexes:
+            for stepIndex in plan.getRootItemSteps(index):
+                actions, paths = plan.getStep(stepIndex)
+                while True:
+                    errorCount = len(self.errors)
+                    if self.isolateActions:
+                        failedIndexes = self._runIsolatedStep(currentStep, totalSteps, actions, paths)
+                    else:
+                        failedIndexes = self._runStep(currentStep, totalSteps, actions, paths)
+                    if not (failedIndexes and self.pauseOnError):
+                        break
+                    # pause until the failed step is retried or skipped
+                    self.failedStep = dict(step=currentStep, actions=actions, paths=paths)
+                    yield dict(current=currentStep, total=totalSteps)
+                    isRetrying = self._retryFailedStep
+                    self.failedStep = None
+                    self._retryFailedStep = False
+                    if not isRetrying:
+                        break
+                    # the errors of the failed attempt no longer apply
+                    del self.errors[errorCount:]
+                currentStep += len(actions)
+                # return progress
+                yield dict(current=currentStep - 1, total=totalSteps)
+            # save a checkpoint after each top-level group, as long
+            # as the build is still free of errors
+            if self.checkpoints and not self.errors and isinstance(rootItems[index], BuildGroup):
+                self._saveCheckpoint(index)
 
         # delete the default blueprint node if it exists
         if pm.cmds.objExists(BLUEPRINT_NODENAME):
             pm.cmds.delete(BLUEPRINT_NODENAME)
 
+        if self.recorder:
+            self._stopRecording()
+            if not self.recorder.isValid:
+                self.log.warning('Build used commands that could not be recorded, not saving recording')
+            elif not self.errors:
+                self.recordings.save(recordingKey, self.recorder, getSceneFingerprint(), self.blueprint.rigName)
+                self.log.info('Recorded build: {0} ({1} commands)'.format(
+                    recordingKey, self.recorder.getCallCount()))
+
+        if self.cacheKey and not self.errors:
+            self.cache.save(self.cacheKey, self.blueprint.rigName)
+            self.log.info('Cached built rig: {0}'.format(self.cacheKey))
+
         yield dict(current=currentStep, total=totalSteps, finish=True)
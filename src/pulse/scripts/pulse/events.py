@@ -0,0 +1,207 @@
+
+
+import logging
+
+
+__all__ = [
+    'ActionFailed',
+    'ActionFinished',
+    'ActionStarted',
+    'BuildCancelled',
+    'BuildEvent',
+    'BuildEventBus',
+    'BuildFinished',
+    'BuildStarted',
+]
+
+LOG = logging.getLogger(__name__)
+
+
+class BuildEvent(object):
+    """
+    Base class for all events published by a BlueprintBuilder.
+    Subscribing to BuildEvent receives every event.
+    """
+
+    __slots__ = ('builder',)
+
+    def __init__(self, builder):
+        # the BlueprintBuilder that published the event
+        self.builder = builder
+
+    def __repr__(self):
+        return '<{0}>'.format(self.__class__.__name__)
+
+
+class BuildStarted(BuildEvent):
+    """
+    Published once the rig has been created and
+    the number of build steps is known.
+    """
+
+    __slots__ = ('totalSteps', 'plan', 'firstRootIndex')
+
+    def __init__(self, builder, totalSteps, plan, firstRootIndex=0):
+        super(BuildStarted, self).__init__(builder)
+        # the number of build steps that will run
+        self.totalSteps = totalSteps
+        # the BuildPlan being built
+        self.plan = plan
+        # the index of the first top-level item that will run, which
+        # is greater than 0 when resuming from a checkpoint
+        self.firstRootIndex = firstRootIndex
+
+    @property
+    def isResumed(self):
+        return self.firstRootIndex > 0
+
+
+class ActionStarted(BuildEvent):
+    """
+    Published right before an action, or a batch
+    of actions run together, is run.
+    """
+
+    __slots__ = ('step', 'totalSteps', 'path', 'actions')
+
+    def __init__(self, builder, step, totalSteps, path, actions):
+        super(ActionStarted, self).__init__(builder)
+        # the index of the first build step being run
+        self.step = step
+        self.totalSteps = totalSteps
+        # the BuildGroup path of the first action
+        self.path = path
+        # the list of BuildActions being run
+        self.actions = actions
+
+    @property
+    def action(self):
+        return self.actions[0]
+
+    def __repr__(self):
+        return '<{0} {1} {2}>'.format(self.__class__.__name__, self.step, self.path)
+
+
+class ActionFinished(ActionStarted):
+    """
+    Published after an action, or a batch of actions
+    run together, has run, whether or not it failed.
+    """
+
+    __slots__ = ('startTime', 'wallTime', 'cpuTime', 'nodeDelta', 'hasError')
+
+    def __init__(self, builder, step, totalSteps, path, actions,
+                 startTime, wallTime, cpuTime, nodeDelta, hasError):
+        super(ActionFinished, self).__init__(builder, step, totalSteps, path, actions)
+        # the wall clock time at which the actions started
+        self.startTime = startTime
+        # the wall and cpu time in seconds spent running the actions
+        self.wallTime = wallTime
+        self.cpuTime = cpuTime
+        # the change in the number of nodes in the scene, or
+        # None if the builder is not counting nodes
+        self.nodeDelta = nodeDelta
+        self.hasError = hasError
+
+
+class ActionFailed(BuildEvent):
+    """
+    Published for every action that raises an error.
+    """
+
+    __slots__ = ('step', 'path', 'action', 'error')
+
+    def __init__(self, builder, step, path, action, error):
+        super(ActionFailed, self).__init__(builder)
+        self.step = step
+        self.path = path
+        self.action = action
+        self.error = error
+
+    def __repr__(self):
+        return '<{0} {1} {2}: {3}>'.format(self.__class__.__name__, self.step, self.path, self.error)
+
+
+class BuildFinished(BuildEvent):
+    """
+    Published when the build has completely finished.
+    """
+
+    __slots__ = ('elapsedTime', 'errorCount')
+
+    def __init__(self, builder, elapsedTime, errorCount):
+        super(BuildFinished, self).__init__(builder)
+        self.elapsedTime = elapsedTime
+        self.errorCount = errorCount
+
+
+class BuildCancelled(BuildEvent):
+    """
+    Published if the build was cancelled.
+    """
+
+    __slots__ = ()
+
+
+class BuildEventBus(object):
+    """
+    Publishes BuildEvents to subscribers by event type.
+
+    Publishers should check `isListening` before creating an event,
+    so that no work is done when there are no subscribers.
+    """
+
+    def __init__(self):
+        # {event class: [callbacks]}
+        self._subscribers = {}
+
+    def subscribe(self, eventType, callback):
+        """
+        Subscribe to an event type. Subscribing to
+        BuildEvent receives all events.
+
+        Args:
+            eventType: A BuildEvent class
+            callback: A callable that takes the event as its only argument
+        """
+        callbacks = self._subscribers.setdefault(eventType, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, eventType, callback):
+        """
+        Remove a subscription to an event type
+
+        Args:
+            eventType: A BuildEvent class
+            callback: A callable that was previously subscribed
+        """
+        callbacks = self._subscribers.get(eventType)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[eventType]
+
+    def isListening(self, eventType):
+        """
+        Return True if anything is subscribed to an event type
+
+        Args:
+            eventType: A BuildEvent class
+        """
+        return eventType in self._subscribers or BuildEvent in self._subscribers
+
+    def publish(self, event):
+        """
+        Send an event to all of its subscribers. Errors raised by
+        subscribers are logged and do not interrupt the build.
+
+        Args:
+            event: A BuildEvent instance
+        """
+        callbacks = self._subscribers.get(type(event), []) + self._subscribers.get(BuildEvent, [])
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception:
+                LOG.exception('Error in build event subscriber: {0}'.format(callback))
@@ -0,0 +1,69 @@
+
+
+import json
+import hashlib
+import pymel.core as pm
+
+
+__all__ = [
+    'getNodeUUID',
+    'hashData',
+    'hashStrings',
+]
+
+
+def getNodeUUID(node):
+    """
+    Return the UUID of a node as a string
+
+    Args:
+        node: A PyNode
+    """
+    name = node.longName() if isinstance(node, pm.nt.DagNode) else node.name()
+    result = pm.cmds.ls(name, uuid=True)
+    if result:
+        return result[0]
+
+def _getHashableData(data, nodesByName=False):
+    """
+    Return a copy of the given data that can be json encoded,
+    replacing all node references with their UUID or long name.
+    """
+    if isinstance(data, pm.PyNode):
+        if nodesByName:
+            return 'node:{0}'.format(data.longName() if isinstance(data, pm.nt.DagNode) else data.name())
+        return 'uuid:{0}'.format(getNodeUUID(data))
+    elif isinstance(data, dict):
+        return {str(k): _getHashableData(v, nodesByName) for k, v in data.iteritems()}
+    elif isinstance(data, (list, tuple)):
+        return [_getHashableData(v, nodesByName) for v in data]
+    return data
+
+def hashData(data, nodesByName=False):
+    """
+    Return a stable sha1 hex digest for serialized data.
+    Node references are hashed by UUID so that renaming or
+    reparenting a node does not change the result.
+
+    Args:
+        data: A dict, list, or other serialized data
+        nodesByName: A bool, when True, node references are hashed by
+            long name instead, e.g. for nodes that are recreated with
+            new UUIDs but the same names during every build
+    """
+    encoded = json.dumps(_getHashableData(data, nodesByName), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def hashStrings(strings):
+    """
+    Return a sha1 hex digest for an ordered list of strings,
+    such as other hashes.
+
+    Args:
+        strings: A list of str
+    """
+    sha = hashlib.sha1()
+    for s in strings:
+        sha.update(s.encode('utf-8'))
+        sha.update(b'\0')
+    return sha.hexdigest()
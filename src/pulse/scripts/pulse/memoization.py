@@ -0,0 +1,231 @@
+
+
+import os
+import logging
+import tempfile
+import pymel.core as pm
+
+from . import hashing
+from .buildcache import FileCache, getActionSourceFiles, getFileHash
+
+
+__all__ = [
+    'ActionMemoCache',
+]
+
+LOG = logging.getLogger(__name__)
+
+# the namespace that snippets are imported into
+SNIPPET_NAMESPACE = 'pulseMemo'
+# the name of the temporary group that holds exported dag nodes
+SNIPPET_GROUP = 'pulseMemoSnippet'
+
+
+class ActionMemoCacheError(Exception):
+    """
+    Raised when the output of an action cannot be cached
+    """
+    pass
+
+
+def getSceneUUIDs():
+    """
+    Return a set of the UUIDs of all nodes in the scene
+    """
+    return set(pm.cmds.ls(uuid=True))
+
+def getNodesCreatedSince(uuids):
+    """
+    Return the long names of all nodes that were created
+    since a set of scene UUIDs was retrieved
+
+    Args:
+        uuids: A set of UUIDs returned by `getSceneUUIDs`
+    """
+    newUUIDs = list(getSceneUUIDs().difference(uuids))
+    if not newUUIDs:
+        return []
+    return pm.cmds.ls(newUUIDs, long=True)
+
+def _getPlugNode(plug):
+    return plug.split('.', 1)[0]
+
+def _getPlugAttr(plug):
+    return plug.split('.', 1)[1]
+
+def _stripNamespace(name):
+    """
+    Remove the snippet namespace from every segment of a node name
+    """
+    prefix = SNIPPET_NAMESPACE + ':'
+    return '|'.join([s[len(prefix):] if s.startswith(prefix) else s for s in name.split('|')])
+
+
+class ActionMemoCache(FileCache):
+    """
+    Caches the nodes created by BuildActions that opt into memoization,
+    so that when an action is run again with the same attribute values
+    and input scene state, the cached nodes are imported instead.
+
+    The nodes an action creates are exported to a snippet file, along with
+    the parents and connections that link them to nodes that already existed,
+    which are restored when the snippet is imported. Actions whose output
+    includes changes to existing nodes (other than new connections and
+    children) cannot be memoized correctly, and should implement `runCached`
+    to repeat any work that does not create nodes.
+    """
+
+    manifestFilename = 'actions.json'
+    filePrefix = 'snippet_'
+
+    def __init__(self, cacheDir=None, maxSize=512 * 1024 ** 2):
+        """
+        Args:
+            cacheDir: A string path to the directory where snippets are saved.
+                Defaults to a directory in the temp dir
+            maxSize: An int, the max total size in bytes of all snippets
+        """
+        if not cacheDir:
+            cacheDir = os.path.join(tempfile.gettempdir(), 'pulse_action_cache')
+        super(ActionMemoCache, self).__init__(cacheDir, maxSize)
+
+    def getKey(self, action):
+        """
+        Return the memoization key for running an action in the current scene
+
+        Args:
+            action: A BuildAction
+        """
+        sourceHashes = [str(getFileHash(f)) for f in getActionSourceFiles(action.__class__)]
+        return hashing.hashStrings([
+            action.getTypeName(),
+            # nodes created earlier in the build get new UUIDs every build
+            hashing.hashData(action.serialize(), nodesByName=True),
+            hashing.hashStrings(sourceHashes),
+            hashing.hashData(action.getMemoInputs(), nodesByName=True),
+        ])
+
+    def save(self, key, nodes):
+        """
+        Export a list of nodes as the snippet for a key
+
+        Args:
+            key: A string key returned by `getKey`
+            nodes: A list of string long names of the nodes created by an action
+        """
+        if not nodes:
+            data = dict(nodes=[], parents=[], connections=[])
+            self.makeCacheDir()
+            filename = '{0}{1}.mb'.format(self.filePrefix, key)
+            tempPath = self.getTempPath(filename)
+            # an empty file still records that the action creates nothing
+            open(tempPath, 'wb').close()
+            self.addEntry(key, filename, tempPath, **data)
+            return
+
+        nodes = [pm.PyNode(n) for n in nodes]
+        created = set(nodes)
+
+        # find the top-most created dag nodes, and make sure
+        # their hierarchies contain only created nodes
+        topNodes = []
+        for node in nodes:
+            if not isinstance(node, pm.nt.DagNode):
+                continue
+            parent = node.getParent()
+            if parent not in created:
+                topNodes.append((node, parent))
+            for child in node.getChildren():
+                if child not in created:
+                    raise ActionMemoCacheError('Existing node was parented under a new node: {0}'.format(child))
+
+        # record connections between created and existing nodes
+        indexes = {node: i for i, node in enumerate(nodes)}
+        connections = []
+        for node in nodes:
+            pairs = pm.cmds.listConnections(node.longName(), connections=True, plugs=True,
+                                            source=False, destination=True) or []
+            for src, dst in zip(pairs[::2], pairs[1::2]):
+                other = pm.PyNode(_getPlugNode(dst))
+                if other not in created:
+                    connections.append(((indexes[node], _getPlugAttr(src)), (other.longName(), _getPlugAttr(dst))))
+            pairs = pm.cmds.listConnections(node.longName(), connections=True, plugs=True,
+                                            source=True, destination=False) or []
+            for dst, src in zip(pairs[::2], pairs[1::2]):
+                other = pm.PyNode(_getPlugNode(src))
+                if other not in created:
+                    connections.append(((other.longName(), _getPlugAttr(src)), (indexes[node], _getPlugAttr(dst))))
+
+        # temporarily move the top-most dag nodes into a group for export
+        group = pm.cmds.createNode('transform', name=SNIPPET_GROUP)
+        parents = []
+        for node, parent in topNodes:
+            isShape = isinstance(node, pm.nt.Shape)
+            parents.append((indexes[node], parent.longName() if parent else None, isShape))
+            pm.cmds.parent(node.longName(), group, relative=True, shape=isShape)
+        try:
+            self.makeCacheDir()
+            filename = '{0}{1}.mb'.format(self.filePrefix, key)
+            tempPath = self.getTempPath(filename)
+            exportNodes = [group] + [n.name() for n in nodes if not isinstance(n, pm.nt.DagNode)]
+            pm.cmds.select(exportNodes, replace=True, noExpand=True)
+            pm.cmds.file(tempPath, exportSelected=True, type='mayaBinary',
+                         force=True, constructionHistory=False, channels=False, constraints=False,
+                         expressions=False, shader=False, preserveReferences=False)
+            pm.cmds.select(clear=True)
+            # store the names of all nodes as they were exported
+            names = [n.longName() if isinstance(n, pm.nt.DagNode) else n.name() for n in nodes]
+        finally:
+            # move nodes back to their original parents
+            for node, parent in topNodes:
+                isShape = isinstance(node, pm.nt.Shape)
+                if parent:
+                    pm.cmds.parent(node.longName(), parent.longName(), relative=True, shape=isShape)
+                else:
+                    pm.cmds.parent(node.longName(), world=True, relative=True)
+            pm.cmds.delete(group)
+
+        self.addEntry(key, filename, tempPath, nodes=names, parents=parents, connections=connections)
+
+    def restore(self, key):
+        """
+        Import the snippet for a key, then restore the parents and
+        connections of the imported nodes
+
+        Args:
+            key: A string key returned by `getKey`
+
+        Raises:
+            KeyError: If the entry has been removed, e.g. by another process
+            IOError: If the snippet file has been removed
+        """
+        entry = self.getEntry(key)
+        if not entry['nodes']:
+            return
+        if not os.path.isfile(self.getFilePath(key)):
+            raise IOError('Cached snippet was removed: {0}'.format(self.getFilePath(key)))
+
+        newNodes = pm.cmds.file(self.getFilePath(key), i=True, type='mayaBinary',
+                                namespace=SNIPPET_NAMESPACE, returnNewNodes=True)
+        byName = {_stripNamespace(n): pm.PyNode(n) for n in pm.cmds.ls(newNodes, long=True)}
+        nodes = [byName[n] for n in entry['nodes']]
+        group = byName.get('|' + SNIPPET_GROUP)
+
+        for index, parent, isShape in entry['parents']:
+            node = nodes[index]
+            if parent:
+                pm.cmds.parent(node.longName(), parent, relative=True, shape=isShape)
+            else:
+                pm.cmds.parent(node.longName(), world=True, relative=True)
+        if group:
+            pm.cmds.delete(group.longName())
+
+        def getPlug(node, attr):
+            if isinstance(node, int):
+                node = nodes[node].longName()
+            return '{0}.{1}'.format(node, attr)
+
+        for (srcNode, srcAttr), (dstNode, dstAttr) in entry['connections']:
+            pm.cmds.connectAttr(getPlug(srcNode, srcAttr), getPlug(dstNode, dstAttr), force=True)
+
+        pm.cmds.namespace(removeNamespace=SNIPPET_NAMESPACE, mergeNamespaceWithRoot=True)
@@ -0,0 +1,298 @@
+
+
+import os
+import gc
+import sys
+import logging
+import collections
+import pymel.core as pm
+
+from . import events
+from .tracing import getHeapMemory, getNodeCount
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+__all__ = [
+    'ActionMemoryRecord',
+    'MemoryMonitor',
+    'getConnectionCount',
+    'getProcessMemory',
+    'getPythonObjectCounts',
+]
+
+LOG = logging.getLogger(__name__)
+
+# the default max increase of each measurement during a single build step
+# before a warning is logged, memory is in megabytes, objects is the number
+# of python objects tracked by the garbage collector
+DEFAULT_THRESHOLDS = dict(
+    rss=500,
+    heap=500,
+    python=100,
+    objects=100000,
+    nodes=10000,
+    connections=50000,
+)
+
+
+def getProcessMemory():
+    """
+    Return the resident memory of this process in megabytes,
+    or None if it cannot be determined on this platform
+    """
+    if psutil:
+        return psutil.Process(os.getpid()).memory_info().rss / 1024.0 ** 2
+    if sys.platform == 'win32':
+        return _getWindowsProcessMemory()
+    try:
+        with open('/proc/self/statm', 'r') as fp:
+            pages = int(fp.read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 ** 2
+
+
+def _getWindowsProcessMemory():
+    """
+    Return the working set of this process in megabytes using the
+    windows api, or None if it cannot be queried
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        getCurrentProcess = ctypes.windll.kernel32.GetCurrentProcess
+        getCurrentProcess.restype = wintypes.HANDLE
+        getProcessMemoryInfo = ctypes.windll.psapi.GetProcessMemoryInfo
+        getProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+        if not getProcessMemoryInfo(getCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.WorkingSetSize / 1024.0 ** 2
+
+
+def getPythonObjectCounts():
+    """
+    Return a Counter of {type name: count} of all python objects
+    tracked by the garbage collector. Visits every object, so is slow
+    when many objects are alive.
+    """
+    return collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def getConnectionCount():
+    """
+    Return the number of connections between dependency graph
+    nodes in the scene. Queries every node, so is slow in large scenes.
+    """
+    nodes = pm.cmds.ls()
+    if not nodes:
+        return 0
+    # returns a flat list of (destination, source) plug pairs
+    plugs = pm.cmds.listConnections(nodes, connections=True, plugs=True, source=True, destination=False)
+    return len(plugs or []) // 2
+
+
+class MemorySnapshot(object):
+    """
+    Measurements of memory use and scene size at a point in time
+    """
+
+    def __init__(self):
+        self.rss = getProcessMemory()
+        self.heap = getHeapMemory()
+        self.nodes = getNodeCount()
+        self.connections = getConnectionCount()
+        self.python = None
+        self.tracemallocSnapshot = None
+        # {type name: count} of python objects, only used without tracemalloc
+        self.objectCounts = None
+        if tracemalloc and tracemalloc.is_tracing():
+            self.python = tracemalloc.get_traced_memory()[0] / 1024.0 ** 2
+            self.tracemallocSnapshot = tracemalloc.take_snapshot()
+            self.objects = len(gc.get_objects())
+        else:
+            self.objectCounts = getPythonObjectCounts()
+            self.objects = sum(self.objectCounts.values())
+
+
+class ActionMemoryRecord(object):
+    """
+    The change in memory use and scene size during a single build step
+    """
+
+    def __init__(self, step, key, before, after, allocationCount=5):
+        """
+        Args:
+            step: An int index of the build step
+            key: A string identifying the step, such as the action path
+            before: A MemorySnapshot taken before the step ran
+            after: A MemorySnapshot taken after the step ran
+            allocationCount: An int, the number of top python allocations,
+                or object types with the largest growth, to keep
+        """
+        self.step = step
+        self.key = key
+        # {measurement name: change during the step}
+        self.deltas = {}
+        for name in DEFAULT_THRESHOLDS:
+            valueBefore = getattr(before, name)
+            valueAfter = getattr(after, name)
+            if valueBefore is not None and valueAfter is not None:
+                self.deltas[name] = valueAfter - valueBefore
+        # list of strings describing the lines that allocated the most python memory,
+        # or the types of python objects whose count grew the most if tracemalloc is unavailable
+        self.topAllocations = []
+        if before.tracemallocSnapshot and after.tracemallocSnapshot:
+            stats = after.tracemallocSnapshot.compare_to(before.tracemallocSnapshot, 'lineno')
+            self.topAllocations = [str(s) for s in stats[:allocationCount]]
+        elif before.objectCounts is not None and after.objectCounts is not None:
+            growth = after.objectCounts.copy()
+            growth.subtract(before.objectCounts)
+            self.topAllocations = ['{0}: {1:+d} objects'.format(name, count)
+                                   for name, count in growth.most_common(allocationCount) if count > 0]
+
+    def getExceededThresholds(self, thresholds):
+        """
+        Return a list of the measurement names whose change exceeded a threshold
+
+        Args:
+            thresholds: A dict of {measurement name: max change}
+        """
+        return [name for name, delta in sorted(self.deltas.items())
+                if name in thresholds and delta > thresholds[name]]
+
+    def format(self):
+        parts = []
+        for name in sorted(self.deltas):
+            if name in ('objects', 'nodes', 'connections'):
+                parts.append('{0} {1:+d}'.format(name, self.deltas[name]))
+            else:
+                parts.append('{0} {1:+.1f} MB'.format(name, self.deltas[name]))
+        return '{0}: {1}'.format(self.key, ', '.join(parts))
+
+
+class MemoryMonitor(object):
+    """
+    Measures the process memory, maya heap memory, python allocations
+    and the number of nodes and connections in the scene before and
+    after every build step, and logs a warning when the change during
+    a step exceeds a threshold.
+
+    Python allocations are only measured if tracemalloc is available.
+    Without it, such as in python 2, the number of python objects of each
+    type is counted instead to find the types that grew the most.
+    A monitor measures a build by subscribing to the events of a builder.
+    """
+
+    def __init__(self, thresholds=None, log=None):
+        """
+        Args:
+            thresholds: A dict of {measurement name: max change} overriding the
+                `DEFAULT_THRESHOLDS`. Measurements are 'rss', 'heap' and 'python'
+                in megabytes, and 'objects', 'nodes' and 'connections'
+            log: The logger to write warnings to
+        """
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.log = log or LOG
+        self.records = []
+        # the snapshot taken before the current step
+        self._snapshot = None
+        # whether tracemalloc was started by this monitor
+        self._isTracing = False
+
+    def subscribe(self, eventBus):
+        """
+        Subscribe to the events needed to measure a build
+
+        Args:
+            eventBus: A BuildEventBus
+        """
+        eventBus.subscribe(events.ActionStarted, self.onActionStarted)
+        eventBus.subscribe(events.ActionFinished, self.onActionFinished)
+
+    def start(self):
+        """
+        Start tracing python allocations, if possible
+        """
+        if tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._isTracing = True
+
+    def stop(self):
+        """
+        Stop tracing python allocations, if started by this monitor
+        """
+        if self._isTracing:
+            tracemalloc.stop()
+            self._isTracing = False
+
+    def onActionStarted(self, event):
+        self._snapshot = MemorySnapshot()
+
+    def onActionFinished(self, event):
+        if not self._snapshot:
+            return
+        key = event.path or event.action.getDisplayName()
+        record = ActionMemoryRecord(event.step, key, self._snapshot, MemorySnapshot())
+        self._snapshot = None
+        self.records.append(record)
+        exceeded = record.getExceededThresholds(self.thresholds)
+        if exceeded:
+            self.log.warning('Memory threshold exceeded ({0}) by {1}'.format(
+                ', '.join(exceeded), record.format()))
+            for allocation in record.topAllocations:
+                self.log.warning('  ' + allocation)
+
+    def getLargestRecords(self, name, count=10):
+        """
+        Return the records with the largest increase of a measurement
+
+        Args:
+            name: A string measurement name, e.g. 'rss' or 'nodes'
+            count: An int, the max number of records to return
+        """
+        records = [r for r in self.records if name in r.deltas]
+        return sorted(records, key=lambda r: r.deltas[name], reverse=True)[:count]
+
+    def getSummary(self, count=10):
+        """
+        Return a json serializable summary of the steps with the largest
+        increase of each measurement
+
+        Args:
+            count: An int, the max number of steps to include per measurement
+        """
+        result = {}
+        for name in sorted(self.thresholds):
+            result[name] = [dict(step=r.step, key=r.key, delta=r.deltas[name], topAllocations=r.topAllocations)
+                            for r in self.getLargestRecords(name, count)]
+        return result
@@ -0,0 +1,186 @@
+
+
+import os
+import re
+import pstats
+import cProfile
+import logging
+from fnmatch import fnmatchcase
+
+
+__all__ = [
+    'ActionProfiler',
+    'getCollapsedStacks',
+]
+
+LOG = logging.getLogger(__name__)
+
+
+def _getFuncLabel(func):
+    """
+    Return a readable label for a pstats function key
+
+    Args:
+        func: A tuple of (filename, line number, function name)
+    """
+    filename, line, name = func
+    if filename == '~':
+        # built-in functions
+        return name.strip('<>')
+    return '{0}:{1}:{2}'.format(os.path.basename(filename), line, name)
+
+def getCollapsedStacks(stats, rootName=None, maxDepth=64, minFraction=0.0001):
+    """
+    Return the call stacks of a profile in the collapsed stack format.
+
+    cProfile only records the callers of each function, not full stacks,
+    so the time of a function that is reached from more than one stack
+    is split between them in proportion to their time.
+
+    The number of stacks grows exponentially with depth when functions are
+    called from many places, so stacks are cut off at `maxDepth` and calls
+    that took less than `minFraction` of the total time are not followed,
+    their time is counted in the calling function instead.
+
+    Args:
+        stats: A pstats.Stats object
+        rootName: A string name to add as the root of every stack
+        maxDepth: An int, the max number of functions in a stack
+        minFraction: A float, the min fraction of the total time
+            of a call for it to be included in the stacks
+
+    Returns:
+        A dict of {string stack: int microseconds} where each stack
+        is a list of function labels separated by semicolons
+    """
+    # {caller: [(callee, total time, cumulative time)]}
+    children = {}
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.iteritems():
+        if not callers:
+            roots.append((func, tt, ct))
+        for caller, callerStats in callers.iteritems():
+            # call stats from each caller are (cc, nc, tt, ct)
+            children.setdefault(caller, []).append((func, callerStats[2], callerStats[3]))
+
+    result = {}
+    # the total time of the profile, in seconds
+    totalTime = sum([ct for func, tt, ct in roots]) or stats.total_tt
+    # calls that took less time than this are not followed, output
+    # times are in microseconds so smaller calls would be dropped anyway
+    minTime = max(totalTime * minFraction, 0.000001)
+
+    def walk(func, stack, tt, ct, scale):
+        label = _getFuncLabel(func)
+        stack = stack + [label]
+        key = ';'.join(stack)
+        result[key] = result.get(key, 0) + tt * scale
+        funcCumTime = stats.stats[func][3]
+        # the share of the function's calls that were made from this stack
+        childScale = scale * (ct / funcCumTime) if funcCumTime else 0
+        for child, childTT, childCT in children.get(func, []):
+            childTime = childScale * childCT
+            if childTime <= 0:
+                continue
+            if childTime < minTime or len(stack) >= maxDepth or _getFuncLabel(child) in stack:
+                # too small, too deep, or recursion, count the time at the current level
+                result[key] += childTime
+                continue
+            walk(child, stack, childTT, childCT, childScale)
+
+    baseStack = [rootName] if rootName else []
+    for func, tt, ct in roots:
+        walk(func, baseStack, tt, ct, 1.0)
+    return {k: int(v * 1000000) for k, v in result.iteritems() if v * 1000000 >= 1}
+
+
+class ActionProfiler(object):
+    """
+    Runs selected build steps under cProfile, saving a pstats file for
+    each step, and a collapsed stack file containing all profiled steps
+    that can be read by flame graph tools such as flamegraph.pl or speedscope.
+    """
+
+    # the name of the collapsed stack file in the output directory
+    collapsedFilename = 'actions.collapsed'
+
+    def __init__(self, outputDir, filters=None):
+        """
+        Args:
+            outputDir: A string path to the directory where profiles are saved
+            filters: A list of string patterns, if given, only steps whose action
+                type name or BuildGroup path matches a pattern are profiled.
+                Patterns can contain shell-style wildcards. Paths are also matched
+                without their item indexes, so 'Body/*' matches every action
+                in groups under the Body group, and 'Body/Spine' matches every
+                action directly in the Spine group
+        """
+        self.outputDir = outputDir
+        self.filters = filters
+        # {string stack: int microseconds} of all profiled steps
+        self.stacks = {}
+        # list of the pstats files that have been saved
+        self.files = []
+
+    def matches(self, actions, paths):
+        """
+        Return True if a build step should be profiled
+
+        Args:
+            actions: A list of BuildActions in the step
+            paths: A list of string paths of the actions
+        """
+        if not self.filters:
+            return True
+        names = [actions[0].getTypeName()]
+        for path in paths:
+            if path:
+                names.extend([path, re.sub(r'\[\d+\]', '', path)])
+        return any([fnmatchcase(n, f) for n in names for f in self.filters])
+
+    def runcall(self, step, name, func, *args, **kwargs):
+        """
+        Run a function under cProfile and save its profile
+
+        Args:
+            step: An int index of the build step being profiled
+            name: A string name of the build step, such as the action path
+            func: The function to run
+            *args: The arguments of the function
+            **kwargs: The keyword arguments of the function
+        """
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._saveProfile(profile, step, name)
+
+    def _saveProfile(self, profile, step, name):
+        if not os.path.isdir(self.outputDir):
+            os.makedirs(self.outputDir)
+        safeName = re.sub(r'[^\w\-]+', '_', name).strip('_')
+        filePath = os.path.join(self.outputDir, '{0:04d}_{1}.pstats'.format(step, safeName))
+        profile.dump_stats(filePath)
+        self.files.append(filePath)
+        stats = pstats.Stats(profile)
+        # collapsed stack frames are separated by semicolons
+        rootName = name.replace(';', '_')
+        for stack, value in getCollapsedStacks(stats, rootName).iteritems():
+            self.stacks[stack] = self.stacks.get(stack, 0) + value
+
+    def getCollapsedFilePath(self):
+        return os.path.join(self.outputDir, self.collapsedFilename)
+
+    def saveCollapsedStacks(self):
+        """
+        Save the merged stacks of all profiled steps, with times in
+        microseconds. Returns the path to the file, or None if nothing
+        was profiled.
+        """
+        if not self.stacks:
+            return
+        filePath = self.getCollapsedFilePath()
+        with open(filePath, 'w') as fp:
+            for stack in sorted(self.stacks):
+                fp.write('{0} {1}\n'.format(stack, self.stacks[stack]))
+        return filePath
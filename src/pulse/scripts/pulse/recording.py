@@ -0,0 +1,354 @@
+
+
+import os
+import re
+import json
+import logging
+import maya.cmds
+import pymel.core as pm
+
+from . import hashing
+from .buildcache import FileCache
+from .commandhooks import CommandHook
+
+
+__all__ = [
+    'BuildRecording',
+    'BuildRecordings',
+    'CommandRecorder',
+    'InvalidRecordingError',
+    'getSceneFingerprint',
+]
+
+LOG = logging.getLogger(__name__)
+
+# commands that do not modify the scene, or only manage undo, and are not recorded
+IGNORED_COMMANDS = frozenset([
+    'about',
+    'attributeQuery',
+    'connectionInfo',
+    'getAttr',
+    'isConnected',
+    'listAttr',
+    'listConnections',
+    'listHistory',
+    'listRelatives',
+    'ls',
+    'memory',
+    'nodeType',
+    'objExists',
+    'objectType',
+    'referenceQuery',
+    'flushUndo',
+    'redo',
+    'undo',
+    'undoInfo',
+])
+
+# flags that make a command query the scene instead of modifying it
+QUERY_FLAGS = ('q', 'query')
+
+# the valid names of replayed commands and flags
+NAME_PATTERN = re.compile(r'^[A-Za-z_]\w*\Z')
+
+
+class UnrecordableCommandError(Exception):
+    """
+    Raised when a command argument cannot be stored in a recording
+    """
+    pass
+
+
+class InvalidRecordingError(Exception):
+    """
+    Raised when a saved recording cannot be replayed
+    """
+    pass
+
+
+def _toRecordable(value):
+    """
+    Return a json serializable copy of a command argument,
+    replacing nodes and attributes with their names.
+    """
+    if isinstance(value, (pm.PyNode, pm.Attribute)):
+        return str(value)
+    elif isinstance(value, (list, tuple)):
+        return [_toRecordable(v) for v in value]
+    elif isinstance(value, (basestring, int, long, float, bool, type(None))):
+        return value
+    raise UnrecordableCommandError('Cannot record argument: {0!r}'.format(value))
+
+
+class CommandRecorder(CommandHook):
+    """
+    Records the maya commands that modify the scene while it is active,
+    grouped into named sections such as one per build step.
+
+    Changes made using the maya API are not recorded, so a recording
+    is only complete if everything it depends on uses commands.
+    """
+
+    def __init__(self):
+        super(CommandRecorder, self).__init__()
+        # list of {'name': str, 'calls': [[command, args, kwargs]]}
+        self.sections = []
+        # False if a command could not be recorded
+        self.isValid = True
+
+    @property
+    def isRecording(self):
+        return self.isActive
+
+    def beginSection(self, name):
+        """
+        Start a new section, all following commands are added to it
+        """
+        self.sections.append(dict(name=name, calls=[]))
+
+    def discardSection(self):
+        """
+        Remove all commands recorded in the current section,
+        e.g. after the changes they made have been undone
+        """
+        self.sections[-1]['calls'] = []
+
+    def start(self):
+        """
+        Start recording commands
+        """
+        super(CommandRecorder, self).start()
+        if not self.sections:
+            self.beginSection('')
+
+    def onCommand(self, name, func, args, kwargs):
+        result = func(*args, **kwargs)
+        # only successful commands are recorded
+        self._record(name, args, kwargs)
+        return result
+
+    def _record(self, name, args, kwargs):
+        if name in IGNORED_COMMANDS:
+            return
+        if any([kwargs.get(f) for f in QUERY_FLAGS]):
+            return
+        try:
+            call = [name, _toRecordable(args), {k: _toRecordable(v) for k, v in kwargs.iteritems()}]
+        except UnrecordableCommandError as e:
+            LOG.debug(e)
+            self.isValid = False
+            return
+        self.sections[-1]['calls'].append(call)
+
+    def getCallCount(self):
+        return sum([len(s['calls']) for s in self.sections])
+
+
+def _formatValue(value):
+    """
+    Return a string representing an attribute value, with
+    floats rounded to ignore floating point differences
+    """
+    if isinstance(value, float):
+        return '{0:.6f}'.format(value)
+    elif isinstance(value, (list, tuple)):
+        return '[{0}]'.format(' '.join([_formatValue(v) for v in value]))
+    return str(value)
+
+def getAttrStateStrings(node):
+    """
+    Return a list of strings representing the state of a node's attributes,
+    made from the names of all locked, keyable and channel box attributes,
+    and the values of all keyable, channel box and user defined attributes.
+
+    Args:
+        node: A string long name of a node
+    """
+    locked = maya.cmds.listAttr(node, locked=True) or []
+    keyable = maya.cmds.listAttr(node, keyable=True) or []
+    channelBox = maya.cmds.listAttr(node, channelBox=True) or []
+    userDefined = maya.cmds.listAttr(node, userDefined=True) or []
+    strings = [
+        '{0} locked {1}'.format(node, ' '.join(sorted(locked))),
+        '{0} keyable {1}'.format(node, ' '.join(sorted(keyable))),
+        '{0} channelBox {1}'.format(node, ' '.join(sorted(channelBox))),
+    ]
+    for attr in sorted(set(keyable + channelBox + userDefined)):
+        try:
+            value = maya.cmds.getAttr('{0}.{1}'.format(node, attr))
+        except (RuntimeError, ValueError):
+            # compound, message or multi attributes without a single value
+            continue
+        strings.append('{0}.{1}={2}'.format(node, attr, _formatValue(value)))
+    return strings
+
+def getDeformerWeightStrings(deformer):
+    """
+    Return a list of strings representing the weights of a deformer,
+    such as the influence weights of a skinCluster
+
+    Args:
+        deformer: A string long name of a deformer node
+    """
+    strings = []
+    for index in maya.cmds.getAttr(deformer + '.weightList', multiIndices=True) or []:
+        plug = '{0}.weightList[{1}].weights'.format(deformer, index)
+        indices = maya.cmds.getAttr(plug, multiIndices=True) or []
+        values = maya.cmds.getAttr(plug) if indices else []
+        strings.append('{0} {1} {2}'.format(plug, indices, _formatValue(values)))
+    return strings
+
+def getSceneFingerprint():
+    """
+    Return a hash of the current scene, made from the long names and types
+    of all nodes, the world matrices of all transforms, all connections,
+    the lock, keyable and channel box state and the values of the animatable
+    and user defined attributes of all nodes, and the weights of all deformers.
+    Used to check that a replayed build matches the recorded build, since
+    changes made using the maya API are not recorded. Queries every attribute
+    of every node, so is only calculated once per recorded or replayed build.
+    """
+    # a flat list of node name, node type pairs
+    nodesAndTypes = maya.cmds.ls(long=True, showType=True) or []
+    strings = sorted(['{0} {1}'.format(n, t) for n, t in zip(nodesAndTypes[::2], nodesAndTypes[1::2])])
+    for transform in sorted(maya.cmds.ls(type='transform', long=True) or []):
+        matrix = maya.cmds.getAttr(transform + '.worldMatrix') or []
+        # rounded to ignore floating point differences
+        strings.append('{0} {1}'.format(transform, ' '.join(['{0:.6f}'.format(v) for v in matrix])))
+    nodes = nodesAndTypes[::2]
+    if nodes:
+        # returns a flat list of (destination, source) plug pairs
+        plugs = maya.cmds.listConnections(
+            nodes, connections=True, plugs=True, source=True, destination=False) or []
+        strings.extend(sorted(['{0}<{1}'.format(d, s) for d, s in zip(plugs[::2], plugs[1::2])]))
+    for node in sorted(nodes):
+        strings.extend(getAttrStateStrings(node))
+    for deformer in sorted(maya.cmds.ls(type=['weightGeometryFilter', 'skinCluster'], long=True) or []):
+        strings.extend(getDeformerWeightStrings(deformer))
+    return hashing.hashStrings(strings)
+
+def compileSection(section):
+    """
+    Return a list of (function, args, kwargs) for all the commands of
+    a recorded section, with every command resolved to its maya function.
+
+    Args:
+        section: A dict containing the name and calls of a recorded section
+
+    Raises:
+        InvalidRecordingError: If a call is not a valid maya command
+    """
+    result = []
+    for command, args, kwargs in section['calls']:
+        # recordings are loaded from files, so only run known maya commands
+        if not (isinstance(command, basestring) and NAME_PATTERN.match(command)
+                and hasattr(maya.cmds, command)):
+            raise InvalidRecordingError('Not a maya command: {0!r}'.format(command))
+        if not isinstance(args, list) or not isinstance(kwargs, dict):
+            raise InvalidRecordingError('Invalid arguments for command: {0}'.format(command))
+        for key in kwargs:
+            if not NAME_PATTERN.match(key):
+                raise InvalidRecordingError('Invalid flag for command {0}: {1!r}'.format(command, key))
+        kwargs = {str(k): v for k, v in kwargs.iteritems()}
+        result.append((getattr(maya.cmds, command), args, kwargs))
+    return result
+
+
+class BuildRecording(object):
+    """
+    The compiled commands of a recorded build, which can be
+    replayed to rebuild the rig without running any actions.
+
+    Every command is resolved to its function in `maya.cmds` when the
+    recording is loaded, and is called directly when replayed, so that
+    a recording file can only run maya commands.
+    """
+
+    def __init__(self, data):
+        self.sections = data['sections']
+        # the fingerprint of the scene after the build was recorded
+        self.fingerprint = data.get('fingerprint')
+        if not self.fingerprint:
+            raise InvalidRecordingError('Recording has no scene fingerprint')
+        self.calls = [compileSection(s) for s in self.sections]
+
+    def replayIterator(self):
+        """
+        Run all recorded commands, yielding the name of each section after it runs
+        """
+        for section, calls in zip(self.sections, self.calls):
+            for func, args, kwargs in calls:
+                func(*args, **kwargs)
+            yield section['name']
+
+
+class BuildRecordings(FileCache):
+    """
+    A cache of recorded builds, identified by build keys.
+    See `CommandRecorder` and `BuildRecording`.
+    """
+
+    manifestFilename = 'recordings.json'
+    filePrefix = 'recording_'
+
+    def __init__(self, recordingDir=None, maxSize=256 * 1024 ** 2):
+        """
+        Args:
+            recordingDir: A string path to the directory where recordings are
+                saved. Defaults to a directory in the user's home dir, since
+                recordings are run as code, and must not be shared
+            maxSize: An int, the max total size in bytes of all recordings
+        """
+        if not recordingDir:
+            recordingDir = os.path.join(os.path.expanduser('~'), '.pulse', 'recordings')
+        super(BuildRecordings, self).__init__(recordingDir, maxSize)
+
+    def save(self, key, recorder, fingerprint, rigName=None):
+        """
+        Save the commands of a recorder as the recording for a key
+
+        Args:
+            key: A string key returned by `getBuildKey`
+            recorder: A CommandRecorder that has finished recording a build
+            fingerprint: A string returned by `getSceneFingerprint` after the build
+            rigName: A string name of the built rig, for reference
+        """
+        self.makeCacheDir()
+        filename = '{0}{1}.json'.format(self.filePrefix, key)
+        tempPath = self.getTempPath(filename)
+        with open(tempPath, 'w') as fp:
+            json.dump(dict(sections=recorder.sections, fingerprint=fingerprint), fp, separators=(',', ':'))
+        self.addEntry(key, filename, tempPath, rigName=rigName, callCount=recorder.getCallCount())
+
+    def load(self, key):
+        """
+        Return the BuildRecording for a key
+
+        Args:
+            key: A string key returned by `getBuildKey`
+
+        Raises:
+            InvalidRecordingError: If the recording cannot be replayed
+        """
+        if self.isRejected(key):
+            raise InvalidRecordingError('Replaying the recording did not reproduce the build')
+        self.getEntry(key)
+        with open(self.getFilePath(key), 'r') as fp:
+            return BuildRecording(json.load(fp))
+
+    def reject(self, key):
+        """
+        Mark the recording for a key as not replayable, because replaying it
+        did not reproduce the recorded build. The build is not recorded or
+        replayed again until its key changes.
+
+        Args:
+            key: A string key returned by `getBuildKey`
+        """
+        self.updateEntry(key, isRejected=True)
+
+    def isRejected(self, key):
+        """
+        Return True if the recording for a key has been rejected, see `reject`
+        """
+        return key in self.entries and self.entries[key].get('isRejected', False)
@@ -0,0 +1,238 @@
+
+
+import logging
+import __main__
+import maya.api.OpenMaya as om
+import pymetanode as meta
+
+from . import hashing
+
+
+__all__ = [
+    'RigIndex',
+]
+
+LOG = logging.getLogger(__name__)
+
+# the name of the attribute of __main__ that stores the callback ids of all
+# indexes by meta class, so that they outlive reloads of this module
+CALLBACK_IDS_ATTR = '_pulseRigIndexCallbackIds'
+
+
+def _getCallbackIdRegistry():
+    """
+    Return the {meta class: callback ids} of all installed rig index callbacks
+    """
+    if not hasattr(__main__, CALLBACK_IDS_ATTR):
+        setattr(__main__, CALLBACK_IDS_ATTR, {})
+    return getattr(__main__, CALLBACK_IDS_ATTR)
+
+
+class RigIndex(object):
+    """
+    A cache of all rigs in the scene, indexed by rig name and UUID.
+
+    The index is filled in a single pass the first time it is queried,
+    and is invalidated by maya callbacks whenever transforms are added,
+    removed, renamed or reparented, or the scene changes. Every invalidation
+    also increments `generation`, which other caches can use to tell when
+    the scene's hierarchy has changed.
+
+    Only one index per meta class can have callbacks. Installing them
+    removes the callbacks of any previous index, such as the index
+    from before pulse was reloaded.
+
+    The rig that owns a node is resolved from the node's long DAG path,
+    and the results for every ancestor path visited are memoized until
+    the index is next invalidated, so resolving many nodes that share
+    parent chains only walks each chain once.
+    """
+
+    # scene messages after which the index is invalidated
+    SCENE_MESSAGES = (
+        'kAfterNew',
+        'kAfterOpen',
+        'kAfterImport',
+        'kAfterCreateReference',
+        'kAfterLoadReference',
+        'kAfterUnloadReference',
+        'kAfterRemoveReference',
+    )
+
+    def __init__(self, metaClass):
+        """
+        Args:
+            metaClass: A string name of the meta class that identifies rig nodes
+        """
+        self.metaClass = metaClass
+        # incremented every time the index is invalidated
+        self.generation = 0
+        self._isValid = False
+        self._callbackIds = []
+        self._rigs = []
+        self._rigsByName = {}
+        self._rigsByUUID = {}
+        self._rigsByPath = {}
+        # {long path: rig or None} for all resolved paths
+        self._ownerCache = {}
+
+    def hasCallbacks(self):
+        """
+        Return True if the callbacks that keep this index valid are installed
+        """
+        return bool(self._callbackIds)
+
+    def addCallbacks(self):
+        """
+        Install the maya callbacks that keep this index valid.
+        Without callbacks, the index is rebuilt on every query.
+        """
+        if self._callbackIds:
+            return
+        registry = _getCallbackIdRegistry()
+        staleIds = registry.pop(self.metaClass, None)
+        if staleIds:
+            try:
+                om.MMessage.removeCallbacks(staleIds)
+            except RuntimeError as e:
+                LOG.debug('Failed to remove previous rig index callbacks: {0}'.format(e))
+        ids = []
+        try:
+            ids.append(om.MDGMessage.addNodeAddedCallback(self._onNodeChanged, 'transform'))
+            ids.append(om.MDGMessage.addNodeRemovedCallback(self._onNodeChanged, 'transform'))
+            ids.append(om.MNodeMessage.addNameChangedCallback(om.MObject(), self._onNodeRenamed))
+            ids.append(om.MDagMessage.addParentAddedCallback(self._onParentAdded))
+            for msg in self.SCENE_MESSAGES:
+                ids.append(om.MSceneMessage.addCallback(getattr(om.MSceneMessage, msg), self._onSceneChanged))
+        except RuntimeError as e:
+            LOG.warning('Failed to add rig index callbacks: {0}'.format(e))
+            om.MMessage.removeCallbacks(ids)
+            return
+        self._callbackIds = ids
+        registry[self.metaClass] = ids
+        self.invalidate()
+
+    def removeCallbacks(self):
+        """
+        Remove all callbacks installed by this index
+        """
+        if self._callbackIds:
+            om.MMessage.removeCallbacks(self._callbackIds)
+            registry = _getCallbackIdRegistry()
+            if registry.get(self.metaClass) is self._callbackIds:
+                del registry[self.metaClass]
+            self._callbackIds = []
+        self.invalidate()
+
+    def _onNodeChanged(self, node, clientData):
+        self.invalidate()
+
+    def _onNodeRenamed(self, node, prevName, clientData):
+        self.invalidate()
+
+    def _onParentAdded(self, child, parent, clientData):
+        self.invalidate()
+
+    def _onSceneChanged(self, clientData):
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Mark the index as invalid so that it
+        is rebuilt the next time it is queried
+        """
+        self._isValid = False
+        self.generation += 1
+        self._ownerCache = {}
+
+    def _update(self):
+        """
+        Rebuild the index if it is not valid
+        """
+        if self._isValid and self._callbackIds:
+            return
+        rigs = meta.findMetaNodes(self.metaClass)
+        rigsByName = {}
+        rigsByUUID = {}
+        rigsByPath = {}
+        for rig in rigs:
+            data = meta.getMetaData(rig, self.metaClass)
+            rigsByName.setdefault(data.get('name'), []).append(rig)
+            rigsByUUID[hashing.getNodeUUID(rig)] = rig
+            rigsByPath[rig.longName()] = rig
+        self._rigs = rigs
+        self._rigsByName = rigsByName
+        self._rigsByUUID = rigsByUUID
+        self._rigsByPath = rigsByPath
+        self._ownerCache = {}
+        self._isValid = True
+
+    def getRigs(self):
+        """
+        Return a list of all rigs in the scene
+        """
+        self._update()
+        return list(self._rigs)
+
+    def getRigsByName(self, names):
+        """
+        Return a list of all rigs that have any of the given rig names
+
+        Args:
+            names: A list of string rig names
+        """
+        self._update()
+        result = []
+        for name in names:
+            result.extend(self._rigsByName.get(name, []))
+        return result
+
+    def getRigByUUID(self, uuid):
+        """
+        Return the rig with a UUID, if it exists
+
+        Args:
+            uuid: A string UUID of a rig node
+        """
+        self._update()
+        return self._rigsByUUID.get(uuid)
+
+    def getRigFromPath(self, path):
+        """
+        Return the rig that owns a node, if any
+
+        Args:
+            path: A string long DAG path of a node, e.g. '|rig|ctls|ctl'
+        """
+        return self.getRigsFromPaths([path])[0]
+
+    def getRigsFromPaths(self, paths):
+        """
+        Return the rig that owns each node in a list, or None
+        for nodes that are not part of a rig.
+
+        Args:
+            paths: A list of string long DAG paths of nodes
+        """
+        self._update()
+        cache = self._ownerCache
+        rigsByPath = self._rigsByPath
+        result = []
+        for path in paths:
+            # ignore any component or attribute
+            path = path.split('.', 1)[0]
+            visited = []
+            rig = None
+            while path:
+                if path in cache:
+                    rig = cache[path]
+                    break
+                visited.append(path)
+                if path in rigsByPath:
+                    rig = rigsByPath[path]
+                    break
+                path = path[:max(path.rfind('|'), 0)]
+            for p in visited:
+                cache[p] = rig
+            result.append(rig)
+        return result
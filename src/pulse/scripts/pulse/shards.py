@@ -0,0 +1,85 @@
+
+
+import logging
+import pymel.core as pm
+import pymetanode as meta
+
+
+__all__ = [
+    'readShards',
+    'writeShards',
+]
+
+LOG = logging.getLogger(__name__)
+
+# the prefix of all attributes that store shards of serialized data
+SHARD_ATTR_PREFIX = 'pulseShard_'
+
+
+def getShardAttrName(key):
+    """
+    Return the name of the attribute that stores a shard
+
+    Args:
+        key: A string key identifying the shard, such as a content hash
+    """
+    return SHARD_ATTR_PREFIX + key
+
+def getShardKeys(node):
+    """
+    Return the keys of all shards stored on a node
+
+    Args:
+        node: A PyNode or string node name
+    """
+    attrs = pm.cmds.listAttr(str(node), userDefined=True) or []
+    return set([a[len(SHARD_ATTR_PREFIX):] for a in attrs if a.startswith(SHARD_ATTR_PREFIX)])
+
+def writeShards(node, items):
+    """
+    Store the serialized data of a list of items on a node, one
+    string attribute per item. Items are keyed by their content hash,
+    so only items that changed since the last write are serialized
+    and written. Shards that are no longer used are removed.
+
+    Args:
+        node: A PyNode or string node name
+        items: A list of objects that implement `getHash` and `serialize`,
+            such as BuildItems
+
+    Returns:
+        The list of shard keys for the items, in order
+    """
+    node = str(node)
+    existingKeys = getShardKeys(node)
+    keys = []
+    for item in items:
+        key = item.getHash()
+        keys.append(key)
+        if key in existingKeys:
+            continue
+        attrName = getShardAttrName(key)
+        pm.cmds.addAttr(node, longName=attrName, dataType='string')
+        pm.cmds.setAttr('{0}.{1}'.format(node, attrName), meta.encodeMetaData(item.serialize()), type='string')
+        existingKeys.add(key)
+    # remove unused shards
+    for key in existingKeys.difference(keys):
+        pm.cmds.deleteAttr(node, attribute=getShardAttrName(key))
+    return keys
+
+def readShards(node, keys):
+    """
+    Return a list of the serialized data stored in shards on a node
+
+    Args:
+        node: A PyNode or string node name
+        keys: A list of string shard keys, as returned by `writeShards`
+    """
+    node = pm.PyNode(node)
+    result = []
+    for key in keys:
+        plug = '{0}.{1}'.format(node, getShardAttrName(key))
+        if not pm.cmds.objExists(plug):
+            raise ValueError('Missing data shard: {0}'.format(plug))
+        result.append(meta.decodeMetaData(pm.cmds.getAttr(plug), node))
+    return result
@@ -0,0 +1,472 @@
+"""
+Persistent storage of build timings, used to detect performance
+regressions and estimate the remaining time of builds.
+
+Usage:
+    mayapy -m pulse.telemetry [-h] [--db DB] [-t THRESHOLD] [-n WINDOW]
+                              [--minTime MINTIME] [RIG [RIG ...]]
+
+Reports every action of the latest build of each rig whose wall time
+is more than THRESHOLD times the median of the previous WINDOW builds.
+"""
+
+import os
+import sys
+import errno
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+
+from . import events
+from .tracing import BuildTraceRecord
+
+
+__all__ = [
+    'ActionRegression',
+    'BuildTelemetry',
+    'TelemetryStore',
+]
+
+LOG = logging.getLogger(__name__)
+
+# the environment variable that overrides the default database path
+DATABASE_ENV_VAR = 'PULSE_TELEMETRY_DB'
+# the environment variable that turns off telemetry of builds from the UI and command line
+DISABLE_ENV_VAR = 'PULSE_DISABLE_TELEMETRY'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rigName TEXT,
+    blueprintHash TEXT,
+    host TEXT,
+    startTime REAL,
+    elapsedTime REAL,
+    errorCount INTEGER
+);
+CREATE TABLE IF NOT EXISTS actions (
+    buildId INTEGER REFERENCES builds(id),
+    step INTEGER,
+    key TEXT,
+    name TEXT,
+    typeName TEXT,
+    wallTime REAL,
+    cpuTime REAL,
+    nodeDelta INTEGER,
+    hasError INTEGER
+);
+CREATE INDEX IF NOT EXISTS builds_rigName ON builds(rigName);
+CREATE INDEX IF NOT EXISTS actions_buildId ON actions(buildId);
+"""
+
+
+def getDefaultDatabasePath():
+    """
+    Return the path to the telemetry database, which can be
+    set using the PULSE_TELEMETRY_DB environment variable
+    """
+    path = os.environ.get(DATABASE_ENV_VAR)
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.pulse', 'telemetry.db')
+
+def isTelemetryEnabled():
+    """
+    Return True unless the PULSE_DISABLE_TELEMETRY environment variable is set.
+    Builds started from the Pulse UI and command line save their timings
+    to the per-user database by default
+    """
+    return not os.environ.get(DISABLE_ENV_VAR)
+
+def getMedian(values):
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) * 0.5
+
+def getActionKey(path, name):
+    """
+    Return the key that identifies an action across builds.
+    Top-level actions have no path, and are identified by name.
+    """
+    return path or name
+
+def getStepKeys(plan):
+    """
+    Return a list of (action count, action key) for every build step of a plan.
+    Steps that would have the same key, such as top-level actions with the
+    same display name, are numbered in build order, e.g. 'Bind Skin #2'.
+
+    Args:
+        plan: A BuildPlan
+    """
+    result = []
+    keyCounts = {}
+    for index in range(plan.getStepCount()):
+        key = getActionKey(*plan.getStepName(index))
+        keyCounts[key] = keyCounts.get(key, 0) + 1
+        if keyCounts[key] > 1:
+            key = '{0} #{1}'.format(key, keyCounts[key])
+        result.append((plan.getStepActionCount(index), key))
+    return result
+
+
+class ActionRegression(object):
+    """
+    An action whose wall time in a build was much longer
+    than its median time in previous builds
+    """
+
+    def __init__(self, key, name, wallTime, medianTime):
+        self.key = key
+        self.name = name
+        self.wallTime = wallTime
+        self.medianTime = medianTime
+
+    @property
+    def ratio(self):
+        return self.wallTime / self.medianTime
+
+    def __str__(self):
+        return '{0}: {1:.3f}s, median {2:.3f}s ({3:.1f}x)'.format(
+            self.key, self.wallTime, self.medianTime, self.ratio)
+
+
+class TelemetryStore(object):
+    """
+    A SQLite database of the timings of every action in every build.
+    Multiple processes can write to the same database.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: A string path to the database file, see `getDefaultDatabasePath`
+        """
+        self.path = path or getDefaultDatabasePath()
+        self._connection = None
+
+    def getConnection(self):
+        if not self._connection:
+            dirName = os.path.dirname(self.path)
+            if dirName and not os.path.isdir(dirName):
+                try:
+                    os.makedirs(dirName)
+                except OSError as e:
+                    # another build process may have just created it
+                    if e.errno != errno.EEXIST:
+                        raise
+            # wait for other build processes that are writing
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def addBuild(self, rigName, blueprintHash, startTime, elapsedTime, errorCount, records, keys=None, host=None):
+        """
+        Add the results of a build, and return the id of the new build.
+
+        Args:
+            rigName: A string name of the built rig
+            blueprintHash: A string hash of the blueprint that was built
+            startTime: A float timestamp of when the build started
+            elapsedTime: A float, the total time of the build in seconds
+            errorCount: An int, the number of errors that occurred
+            records: A list of BuildTraceRecords for every build step
+            keys: A list of string action keys for every record, see `getStepKeys`.
+                Defaults to the path or name of each record
+            host: A string name of the machine that ran the build,
+                defaults to the current host name
+        """
+        if keys is None:
+            keys = [getActionKey(r.path, r.name) for r in records]
+        connection = self.getConnection()
+        with connection:
+            cursor = connection.execute(
+                'INSERT INTO builds (rigName, blueprintHash, host, startTime, elapsedTime, errorCount) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (rigName, blueprintHash, host or socket.gethostname(), startTime, elapsedTime, errorCount))
+            buildId = cursor.lastrowid
+            connection.executemany(
+                'INSERT INTO actions (buildId, step, key, name, typeName, wallTime, cpuTime, nodeDelta, hasError) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(buildId, r.step, key, r.name, r.typeName,
+                  r.wallTime, r.cpuTime, r.nodeDelta, r.hasError) for r, key in zip(records, keys)])
+        return buildId
+
+    def getBuilds(self, rigName=None, limit=None, beforeId=None):
+        """
+        Return a list of build rows, most recent first
+
+        Args:
+            rigName: A string rig name, if given only builds of this rig are returned
+            limit: An int, the max number of builds to return
+            beforeId: An int build id, if given only older builds are returned
+        """
+        query = 'SELECT * FROM builds'
+        conditions = []
+        params = []
+        if rigName is not None:
+            conditions.append('rigName = ?')
+            params.append(rigName)
+        if beforeId is not None:
+            conditions.append('id < ?')
+            params.append(beforeId)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return self.getConnection().execute(query, params).fetchall()
+
+    def getRigNames(self):
+        """
+        Return the names of all rigs that have been built
+        """
+        rows = self.getConnection().execute('SELECT DISTINCT rigName FROM builds ORDER BY rigName')
+        return [row['rigName'] for row in rows]
+
+    def getActions(self, buildId):
+        """
+        Return the action rows of a build, in build order
+        """
+        return self.getConnection().execute(
+            'SELECT * FROM actions WHERE buildId = ? ORDER BY step', (buildId,)).fetchall()
+
+    def getActionHistory(self, rigName, key, limit=None):
+        """
+        Return a list of (build id, wall time) for an action
+        in previous builds of a rig, most recent first
+
+        Args:
+            rigName: A string rig name
+            key: A string action key, the path or name of the action
+            limit: An int, the max number of builds to return
+        """
+        query = ('SELECT builds.id, actions.wallTime FROM actions JOIN builds ON actions.buildId = builds.id '
+                 'WHERE builds.rigName = ? AND actions.key = ? ORDER BY builds.id DESC')
+        params = [rigName, key]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [tuple(row) for row in self.getConnection().execute(query, params)]
+
+    def getMedianActionTimes(self, rigName, window=10, beforeId=None):
+        """
+        Return the median wall time of every action in recent successful builds of a rig
+
+        Args:
+            rigName: A string rig name
+            window: An int, the number of recent builds to include
+            beforeId: An int build id, if given only older builds are included
+
+        Returns:
+            A dict of {action key: median wall time in seconds}
+        """
+        buildIds = [b['id'] for b in self.getBuilds(rigName, beforeId=beforeId) if not b['errorCount']][:window]
+        if not buildIds:
+            return {}
+        rows = self.getConnection().execute(
+            'SELECT key, wallTime FROM actions WHERE buildId IN ({0})'.format(','.join('?' * len(buildIds))),
+            buildIds)
+        times = {}
+        for row in rows:
+            times.setdefault(row['key'], []).append(row['wallTime'])
+        return {key: getMedian(values) for key, values in times.iteritems()}
+
+    def findRegressions(self, rigName, buildId=None, threshold=1.5, window=10, minTime=0.01):
+        """
+        Return the actions of a build that took more than `threshold` times
+        their rolling median time in the previous builds of the rig.
+
+        Args:
+            rigName: A string rig name
+            buildId: An int build id, defaults to the latest build of the rig
+            threshold: A float, the min ratio of wall time to median time to report
+            window: An int, the number of previous builds to take the median of
+            minTime: A float number of seconds, actions faster than this are ignored,
+                since small timings vary too much to compare
+
+        Returns:
+            A list of ActionRegression, the largest regressions first
+        """
+        if buildId is None:
+            builds = self.getBuilds(rigName, limit=1)
+            if not builds:
+                return []
+            buildId = builds[0]['id']
+        medians = self.getMedianActionTimes(rigName, window, beforeId=buildId)
+        result = []
+        for row in self.getActions(buildId):
+            median = medians.get(row['key'])
+            if not median or row['wallTime'] < minTime:
+                continue
+            if row['wallTime'] > median * threshold:
+                result.append(ActionRegression(row['key'], row['name'], row['wallTime'], median))
+        return sorted(result, key=lambda r: r.ratio, reverse=True)
+
+
+class BuildTelemetry(object):
+    """
+    Records the timings of a build into a TelemetryStore when it finishes,
+    and estimates the remaining time of the build from previous builds.
+
+    Telemetry records builds by subscribing to the events of a builder.
+    Builds that resume from a checkpoint only run some of their actions,
+    so they are used for estimates, but are not recorded.
+    """
+
+    def __init__(self, store, rigName, blueprintHash, window=10):
+        """
+        Args:
+            store: A TelemetryStore
+            rigName: A string name of the rig being built
+            blueprintHash: A string hash of the blueprint being built
+            window: An int, the number of previous builds used for estimates
+        """
+        self.store = store
+        self.rigName = rigName
+        self.blueprintHash = blueprintHash
+        self.records = []
+        # the action key of every record
+        self.keys = []
+        self.startTime = time.time()
+        # whether the build resumed from a checkpoint
+        self.isResumed = False
+        # {build step: action key} for all steps that will run
+        self.stepKeys = {}
+        # {action key: median wall time} from previous builds
+        self.medianTimes = {}
+        # the expected total time of all actions that will run
+        self.expectedTime = 0
+        # the sum of the median times of the actions that have finished
+        self.expectedElapsedTime = 0
+        try:
+            self.medianTimes = store.getMedianActionTimes(rigName, window)
+        except (OSError, sqlite3.Error) as e:
+            LOG.warning('Could not read build telemetry: {0}'.format(e))
+
+    def subscribe(self, eventBus):
+        """
+        Subscribe to the events needed to record a build
+
+        Args:
+            eventBus: A BuildEventBus
+        """
+        eventBus.subscribe(events.BuildStarted, self.onBuildStarted)
+        eventBus.subscribe(events.ActionFinished, self.onActionFinished)
+        eventBus.subscribe(events.BuildFinished, self.onBuildFinished)
+
+    def onBuildStarted(self, event):
+        self.startTime = time.time()
+        self.isResumed = event.isResumed
+        # the steps of the top-level items that will run, numbered
+        # the same way as the steps of action events
+        firstStep = sum([len(event.plan.getRootItemSteps(i)) for i in range(event.firstRootIndex)])
+        step = 0
+        for count, key in getStepKeys(event.plan)[firstStep:]:
+            self.stepKeys[step] = key
+            step += count
+        self.expectedTime = sum([self.medianTimes.get(k, 0) for k in self.stepKeys.values()])
+
+    def onActionFinished(self, event):
+        name = event.action.getDisplayName()
+        if len(event.actions) > 1:
+            name = '{0} (x{1})'.format(name, len(event.actions))
+        key = self.stepKeys.get(event.step) or getActionKey(event.path, name)
+        record = BuildTraceRecord(event.step, event.path, name, event.action.getTypeName())
+        record.startTime = event.startTime - self.startTime
+        record.endTime = record.startTime + event.wallTime
+        record.cpuTime = event.cpuTime
+        record.nodeDelta = event.nodeDelta
+        record.hasError = event.hasError
+        self.records.append(record)
+        self.keys.append(key)
+        self.expectedElapsedTime += self.medianTimes.get(key, 0)
+
+    def onBuildFinished(self, event):
+        if not self.records or self.isResumed:
+            # builds restored from the cache, replayed from a recording or resumed
+            # from a checkpoint skip actions, and would skew the timings of full builds
+            self.store.close()
+            return
+        try:
+            self.store.addBuild(self.rigName, self.blueprintHash, self.startTime,
+                                event.elapsedTime, event.errorCount, self.records, self.keys)
+        except (OSError, sqlite3.Error) as e:
+            LOG.warning('Could not save build telemetry: {0}'.format(e))
+        finally:
+            self.store.close()
+
+    def getRemainingTime(self, current, total):
+        """
+        Return the estimated number of seconds until the build finishes,
+        or None if there is not enough information yet.
+
+        The remaining actions are expected to take as long as they did
+        in previous builds, scaled by how much faster or slower the finished
+        actions were this time. Without history, every remaining step
+        is expected to take the average time of the finished steps.
+
+        Args:
+            current: An int, the index of the current build step
+            total: An int, the total number of build steps
+        """
+        if not self.records:
+            return None
+        elapsedTime = sum([r.wallTime for r in self.records])
+        if self.expectedTime and self.expectedElapsedTime:
+            speed = elapsedTime / self.expectedElapsedTime
+            return max(self.expectedTime - self.expectedElapsedTime, 0) * speed
+        stepCount = current + 1
+        return elapsedTime / stepCount * max(total - stepCount, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pulse.telemetry', description='Report actions whose build time regressed')
+    parser.add_argument('rigs', nargs='*', metavar='RIG',
+                        help='Names of the rigs to report, defaults to all rigs')
+    parser.add_argument('--db', default=None,
+                        help='Path to the telemetry database, defaults to {0}'.format(getDefaultDatabasePath()))
+    parser.add_argument('-t', '--threshold', type=float, default=1.5,
+                        help='Report actions slower than this multiple of their median time')
+    parser.add_argument('-n', '--window', type=int, default=10,
+                        help='Number of previous builds to take the median of')
+    parser.add_argument('--minTime', type=float, default=0.01,
+                        help='Ignore actions faster than this many seconds')
+    args = parser.parse_args(argv)
+
+    store = TelemetryStore(args.db)
+    regressionCount = 0
+    for rigName in args.rigs or store.getRigNames():
+        builds = store.getBuilds(rigName, limit=1)
+        if not builds:
+            print('{0}: no builds recorded'.format(rigName))
+            continue
+        build = builds[0]
+        regressions = store.findRegressions(
+            rigName, build['id'], threshold=args.threshold, window=args.window, minTime=args.minTime)
+        regressionCount += len(regressions)
+        print('{0}: build {1} on {2}, {3:.3f}s, {4} regression(s)'.format(
+            rigName, build['id'], build['host'], build['elapsedTime'], len(regressions)))
+        for regression in regressions:
+            print('  ' + str(regression))
+    store.close()
+
+    return 1 if regressionCount else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+
+
+import os
+import re
+import json
+import time
+import pymel.core as pm
+
+from . import events
+
+
+__all__ = [
+    'BuildTrace',
+    'getCPUTime',
+    'getHeapMemory',
+    'getNodeCount',
+]
+
+
+def getCPUTime():
+    """
+    Return the total user and system cpu time of this process in seconds
+    """
+    return sum(os.times()[:2])
+
+def getNodeCount():
+    """
+    Return the number of dependency graph nodes in the scene
+    """
+    return len(pm.cmds.ls())
+
+def getHeapMemory():
+    """
+    Return the heap memory used by maya in megabytes
+    """
+    return pm.cmds.memory(heapMemory=True, megaByte=True)
+
+
+class BuildTraceRecord(object):
+    """
+    The timing results for a single action during a build
+    """
+
+    def __init__(self, step, path, name, typeName):
+        # the index of the build step
+        self.step = step
+        # the BuildGroup path of the action
+        self.path = path
+        # the display name and type of the action
+        self.name = name
+        self.typeName = typeName
+        # start and end wall time relative to the trace start
+        self.startTime = 0
+        self.endTime = 0
+        # cpu time spent running the action
+        self.cpuTime = 0
+        # change in the number of nodes in the scene, or None if nodes were not counted
+        self.nodeDelta = None
+        # whether an error occurred while running the action
+        self.hasError = False
+
+    @property
+    def wallTime(self):
+        return self.endTime - self.startTime
+
+
+class BuildTrace(object):
+    """
+    Records the wall time, cpu time and node count delta of every
+    action run by a BlueprintBuilder, and exports them in the
+    Chrome trace event format which can be viewed using
+    chrome://tracing or https://ui.perfetto.dev
+
+    Actions are nested under spans representing the BuildGroups
+    (and BatchBuildActions) that they belong to.
+
+    A trace records actions by subscribing to the
+    ActionFinished events of a builder.
+    """
+
+    def __init__(self, name=None):
+        """
+        Args:
+            name: A string name for the trace, such as the rig name
+        """
+        self.name = name
+        self.records = []
+        self.startTime = time.time()
+
+    def subscribe(self, eventBus):
+        """
+        Subscribe to the events needed to record a build
+
+        Args:
+            eventBus: A BuildEventBus
+        """
+        eventBus.subscribe(events.BuildStarted, self.onBuildStarted)
+        eventBus.subscribe(events.ActionFinished, self.onActionFinished)
+
+    def onBuildStarted(self, event):
+        self.startTime = time.time()
+
+    def onActionFinished(self, event):
+        name = event.action.getDisplayName()
+        if len(event.actions) > 1:
+            name = '{0} (x{1})'.format(name, len(event.actions))
+        record = BuildTraceRecord(event.step, event.path, name, event.action.getTypeName())
+        record.startTime = event.startTime - self.startTime
+        record.endTime = record.startTime + event.wallTime
+        record.cpuTime = event.cpuTime
+        record.nodeDelta = event.nodeDelta
+        record.hasError = event.hasError
+        self.records.append(record)
+
+    def getSlowestRecords(self, count=10):
+        """
+        Return the records that took the most wall time
+
+        Args:
+            count: An int, the max number of records to return
+        """
+        return sorted(self.records, key=lambda r: r.wallTime, reverse=True)[:count]
+
+    def _getGroupSpans(self):
+        """
+        Return a list of (name, key, startTime, endTime) for every
+        group or batch that contains a recorded action.
+
+        Groups are identified by path, but sibling groups can share the
+        same path, so a new span is also started whenever the index of
+        the item being run within a group goes backwards.
+        """
+        spans = []
+        # [span, index of the last item run within it] for each depth
+        openSpans = []
+        for record in self.records:
+            segments = record.path.split('/') if record.path else []
+            isNew = False
+            # each segment is the name of a group or batch followed
+            # by the index of the next item within it
+            for i, segment in enumerate(segments):
+                match = re.match(r'^(.*)\[(\d+)\]$', segment)
+                name, index = (match.group(1), int(match.group(2))) if match else (segment, 0)
+                key = '/'.join(segments[:i] + [name])
+                if not isNew and i < len(openSpans):
+                    span, lastIndex = openSpans[i]
+                    isNew = span[1] != key or index < lastIndex
+                else:
+                    isNew = True
+                if isNew:
+                    span = [name, key, record.startTime, record.endTime]
+                    spans.append(span)
+                    del openSpans[i:]
+                    openSpans.append([span, index])
+                else:
+                    span[2] = min(span[2], record.startTime)
+                    span[3] = max(span[3], record.endTime)
+                    openSpans[i][1] = index
+            del openSpans[len(segments):]
+        return spans
+
+    def getTraceEvents(self):
+        """
+        Return a list of Chrome trace event dicts for this trace
+        """
+        def toMicroseconds(seconds):
+            return int(seconds * 1000000)
+
+        events = []
+        for name, key, startTime, endTime in self._getGroupSpans():
+            events.append(dict(
+                name=name,
+                cat='group',
+                ph='X',
+                pid=1,
+                tid=1,
+                ts=toMicroseconds(startTime),
+                dur=toMicroseconds(endTime - startTime),
+                args=dict(path=key),
+            ))
+        for record in self.records:
+            args = dict(
+                step=record.step,
+                path=record.path,
+                type=record.typeName,
+                wallTime=record.wallTime,
+                cpuTime=record.cpuTime,
+            )
+            if record.nodeDelta is not None:
+                args['nodeDelta'] = record.nodeDelta
+            events.append(dict(
+                name=record.name,
+                cat='error' if record.hasError else 'action',
+                ph='X',
+                pid=1,
+                tid=1,
+                ts=toMicroseconds(record.startTime),
+                dur=toMicroseconds(record.wallTime),
+                args=args,
+            ))
+        # sort by start time, with longer (parent) events first
+        events.sort(key=lambda e: (e['ts'], -e['dur']))
+        return events
+
+    def save(self, filePath):
+        """
+        Save this trace as a Chrome trace json file
+
+        Args:
+            filePath: A string path to the json file
+        """
+        data = dict(
+            traceEvents=self.getTraceEvents(),
+            displayTimeUnit='ms',
+            otherData=dict(name=self.name),
+        )
+        with open(filePath, 'w') as fp:
+            json.dump(data, fp)
@@ -0,0 +1,213 @@
+
+
+import time
+import logging
+import pymel.core as pm
+
+
+__all__ = [
+    'BlueprintValidator',
+    'ValidationIssue',
+    'ValidationReport',
+]
+
+LOG = logging.getLogger(__name__)
+
+
+class ValidationIssue(object):
+    """
+    A single problem found with the configuration of a BuildAction
+    """
+
+    def __init__(self, path, action, message, attrName=None):
+        # the BuildGroup path of the action
+        self.path = path
+        self.action = action
+        # the name of the attribute with the problem, if any
+        self.attrName = attrName
+        self.message = message
+
+    def __str__(self):
+        name = self.action.getDisplayName() if self.action else ''
+        if self.attrName:
+            name = '{0}.{1}'.format(name, self.attrName)
+        if self.path:
+            name = '{0} ({1})'.format(name, self.path)
+        return '{0}: {1}'.format(name, self.message)
+
+
+class ValidationReport(object):
+    """
+    The results of validating all actions of a Blueprint
+    """
+
+    def __init__(self):
+        self.issues = []
+        # the number of actions that were checked
+        self.actionCount = 0
+        # the time in seconds it took to validate
+        self.elapsedTime = 0
+
+    def isValid(self):
+        return not self.issues
+
+    def getSummary(self):
+        return 'Checked {0} action(s) in {1:.3f} seconds, {2} issue(s)'.format(
+            self.actionCount, self.elapsedTime, len(self.issues))
+
+    def format(self):
+        """
+        Return a string listing all issues in the report
+        """
+        lines = [self.getSummary()]
+        lines.extend(['  ' + str(issue) for issue in self.issues])
+        return '\n'.join(lines)
+
+
+def _isInt(value):
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+def _isNumber(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+def getAttrValueErrors(attr, value):
+    """
+    Return a list of messages describing problems with an attribute value,
+    checked against the attribute's config. Does not access the scene.
+
+    Args:
+        attr: A dict of attribute config data
+        value: The value of the attribute
+    """
+    attrType = attr.get('type')
+    if attrType == 'bool':
+        if not isinstance(value, bool):
+            return ['expected a bool, got {0!r}'.format(value)]
+    elif attrType in ('int', 'float'):
+        isValid = _isInt(value) if attrType == 'int' else _isNumber(value)
+        if not isValid:
+            return ['expected {0}, got {1!r}'.format(attrType, value)]
+        if 'min' in attr and value < attr['min']:
+            return ['{0} is less than the minimum of {1}'.format(value, attr['min'])]
+        if 'max' in attr and value > attr['max']:
+            return ['{0} is greater than the maximum of {1}'.format(value, attr['max'])]
+    elif attrType == 'string':
+        if not isinstance(value, basestring):
+            return ['expected a string, got {0!r}'.format(value)]
+    elif attrType == 'stringlist':
+        if not isinstance(value, list) or not all([isinstance(v, basestring) for v in value]):
+            return ['expected a list of strings, got {0!r}'.format(value)]
+    elif attrType == 'option':
+        options = attr.get('options', [])
+        if not _isInt(value) or value < 0 or value >= len(options):
+            return ['invalid option {0!r}, expected an index from 0 to {1}'.format(value, len(options) - 1)]
+    elif attrType == 'node':
+        if value is not None and not isinstance(value, pm.PyNode):
+            return ['expected a node, got {0!r}'.format(value)]
+    elif attrType == 'nodelist':
+        if not isinstance(value, list):
+            return ['expected a list of nodes, got {0!r}'.format(value)]
+        if None in value:
+            return ['contains a reference to a node that no longer exists']
+        if not all([isinstance(v, pm.PyNode) for v in value]):
+            return ['expected a list of nodes, got {0!r}'.format(value)]
+    return []
+
+
+class BlueprintValidator(object):
+    """
+    Checks the configuration of every action in a Blueprint
+    without building it.
+
+    Attribute values are checked against the attribute configs of each
+    action without accessing the scene. All referenced nodes are then
+    checked for existence using a single scene query, and finally the
+    `validate` method of every action is called.
+
+    The checks run serially, since they are pure python and
+    would not run in parallel on threads.
+    """
+
+    def __init__(self, blueprint):
+        """
+        Args:
+            blueprint: The Blueprint to validate
+        """
+        self.blueprint = blueprint
+
+    def run(self):
+        """
+        Validate all actions and return a ValidationReport
+        """
+        startTime = time.time()
+        report = ValidationReport()
+
+        items = list(self.blueprint.getPlan().actionIterator())
+        report.actionCount = len(items)
+
+        issues, nodeRefs = self._checkAttrValues(items)
+        report.issues.extend(issues)
+        report.issues.extend(self._checkNodesExist(nodeRefs))
+
+        for action, path in items:
+            try:
+                action.validate()
+            except Exception as error:
+                report.issues.append(ValidationIssue(path, action, str(error)))
+
+        report.elapsedTime = time.time() - startTime
+        return report
+
+    def _checkAttrValues(self, items):
+        """
+        Check the attribute values of a list of actions.
+
+        Args:
+            items: A list of (BuildAction, string path)
+
+        Returns:
+            A tuple of (list of ValidationIssue, list of (path, action, attrName, PyNode))
+            containing the issues found and all node references to check
+        """
+        issues = []
+        nodeRefs = []
+        for action, path in items:
+            for attr in action.getSchema().attrs:
+                name = attr['name']
+                value = getattr(action, name)
+                for message in getAttrValueErrors(attr, value):
+                    issues.append(ValidationIssue(path, action, message, name))
+                if isinstance(value, pm.PyNode):
+                    nodeRefs.append((path, action, name, value))
+                elif isinstance(value, list):
+                    nodeRefs.extend([(path, action, name, v) for v in value if isinstance(v, pm.PyNode)])
+        return issues, nodeRefs
+
+    def _checkNodesExist(self, nodeRefs):
+        """
+        Return a ValidationIssue for every node reference that
+        no longer exists, using a single scene query
+
+        Args:
+            nodeRefs: A list of (path, action, attrName, PyNode)
+        """
+        issues = []
+        # {PyNode: name} of all unique nodes
+        names = {}
+        for path, action, attrName, node in nodeRefs:
+            if node in names:
+                continue
+            try:
+                names[node] = node.longName() if isinstance(node, pm.nt.DagNode) else node.name()
+            except Exception:
+                # the node has been deleted
+                names[node] = None
+        queryNames = [n for n in names.values() if n]
+        existing = set(pm.cmds.ls(queryNames, long=True)) if queryNames else set()
+        for path, action, attrName, node in nodeRefs:
+            name = names[node]
+            if name is None:
+                issues.append(ValidationIssue(path, action, 'node no longer exists', attrName))
+            elif name not in existing:
+                issues.append(ValidationIssue(path, action, 'node no longer exists: {0}'.format(name), attrName))
+        return issues
@@ -528,6 +528,7 @@ class NodeBatchAttrForm(BatchAttrForm):
 
         for i, node in enumerate(sel):
             self.batchAction.variantValues[i][self.attr['name']] = sel[i]
+        self.batchAction.invalidateHash()
         self.valuesChanged.emit()
         if didCountChange:
             self.variantCountChanged.emit()
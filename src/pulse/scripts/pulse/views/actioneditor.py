@@ -347,6 +347,7 @@ class BatchActionForm(BuildItemForm):
         # prevent adding new keys to the context dict
         if attrName in context:
             context[attrName] = attrValue
+            self.buildItem.invalidateHash()
             self.buildItemChanged.emit()
 
     def batchEditorValuesChanged(self):
@@ -370,11 +371,17 @@ class ActionEditorWidget(QtWidgets.QWidget):
         self.setupUi(self)
 
         self.model = ActionTreeItemModel.getSharedModel()
+        self.model.isLockedChanged.connect(self.onIsLockedChanged)
+        # save any pending edits when the editor is closed
+        self.destroyed.connect(self.model.flushBlueprint)
         self.selectionModel = ActionTreeSelectionModel.getSharedModel()
         self.selectionModel.selectionChanged.connect(self.selectionChanged)
 
         self.setupItemsUiForSelection()
 
+    def onIsLockedChanged(self, isLocked):
+        self.setEnabled(not isLocked)
+
     def setupUi(self, parent):
         outerLayout = QtWidgets.QVBoxLayout(parent)
 
@@ -432,7 +439,7 @@ class ActionEditorWidget(QtWidgets.QWidget):
         self.setupItemsUi(self.selectionModel.selectedIndexes(), self.scrollWidget)
 
     def buildItemChanged(self, itemWidget):
-        self.model.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
 
     def convertActionToBatch(self, itemModelIndex):
         # create new BatchBuildAction
@@ -443,7 +450,7 @@ class ActionEditorWidget(QtWidgets.QWidget):
         row = itemModelIndex.row()
         self.model.removeRows(row, 1, parentIndex)
         self.model.insertBuildItems(row, [newAction], parentIndex)
-        self.model.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
         # select new item
         self.selectionModel.select(self.model.index(row, 0, parentIndex), QtCore.QItemSelectionModel.Select)
 
@@ -456,7 +463,7 @@ class ActionEditorWidget(QtWidgets.QWidget):
         row = itemModelIndex.row()
         self.model.removeRows(row, 1, parentIndex)
         self.model.insertBuildItems(row, [newAction], parentIndex)
-        self.model.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
         # select new item
         self.selectionModel.select(self.model.index(row, 0, parentIndex), QtCore.QItemSelectionModel.Select)
 
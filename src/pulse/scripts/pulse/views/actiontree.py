@@ -1,5 +1,7 @@
 
 from pulse.vendor.Qt import QtCore, QtWidgets, QtGui
+import __main__
+import maya.api.OpenMaya as om
 import pymetanode as meta
 
 import pulse
@@ -15,6 +17,10 @@ __all__ = [
     'ActionTreeWindow',
 ]
 
+# the name of the attribute of __main__ that stores the id of the scene
+# save callback, so that it can be replaced when this module is reloaded
+SAVE_CALLBACK_ATTR = '_pulseActionTreeSaveCallbackId'
+
 
 class ActionTreeItem(object):
     """
@@ -129,6 +135,12 @@ class ActionTreeItemModel(QtCore.QAbstractItemModel):
 
     INSTANCE = None
 
+    # the idle time in milliseconds after an edit before the blueprint is saved
+    SAVE_DELAY = 250
+
+    # emitted when the blueprint is locked or unlocked for editing
+    isLockedChanged = QtCore.Signal(bool)
+
     @classmethod
     def getSharedModel(cls):
         if not cls.INSTANCE:
@@ -137,11 +149,87 @@ class ActionTreeItemModel(QtCore.QAbstractItemModel):
 
     def __init__(self, parent=None):
         super(ActionTreeItemModel, self).__init__(parent=parent)
+        # coalesces rapid edits into a single save
+        self.saveTimer = QtCore.QTimer(self)
+        self.saveTimer.setSingleShot(True)
+        self.saveTimer.setInterval(self.SAVE_DELAY)
+        self.saveTimer.timeout.connect(self.flushBlueprint)
+        self.isSavePending = False
+        # while locked, e.g. during a build, the blueprint is not edited, saved or reloaded
+        self.isLocked = False
+        self.addSceneCallbacks()
         # load the blueprint from the scene
         self.blueprint = pulse.Blueprint()
         self.reloadBlueprint()
 
+    def addSceneCallbacks(self):
+        """
+        Install the callback that saves pending edits before the scene is saved,
+        replacing the callback of any previous model
+        """
+        staleId = getattr(__main__, SAVE_CALLBACK_ATTR, None)
+        if staleId is not None:
+            try:
+                om.MMessage.removeCallback(staleId)
+            except RuntimeError:
+                pass
+        callbackId = om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeSave, self._onBeforeSceneSave)
+        setattr(__main__, SAVE_CALLBACK_ATTR, callbackId)
+
+    def _onBeforeSceneSave(self, clientData):
+        self.flushBlueprint()
+
+    def saveBlueprint(self, immediate=False):
+        """
+        Save the blueprint to the default node in the scene. By default
+        the save is deferred until no edits have been made for a short
+        time, so that many edits are written at once.
+
+        Args:
+            immediate: A bool, when True, save the blueprint right away
+        """
+        self.isSavePending = True
+        if immediate:
+            self.flushBlueprint()
+        elif not self.isLocked:
+            # restart the timer on every edit
+            self.saveTimer.start()
+
+    def flushBlueprint(self):
+        """
+        Save the blueprint now if there is a pending save
+        """
+        self.saveTimer.stop()
+        if self.isSavePending and not self.isLocked:
+            self.isSavePending = False
+            self.blueprint.saveToDefaultNode()
+
+    def cancelSave(self):
+        """
+        Discard any pending save, e.g. before the scene is changed
+        """
+        self.saveTimer.stop()
+        self.isSavePending = False
+
+    def setIsLocked(self, isLocked):
+        """
+        Lock or unlock the blueprint. Editors are disabled while the blueprint
+        is locked, and pending saves are held back until it is unlocked, so
+        that a build in progress does not see edits and no blueprint node is
+        written into the scene being built.
+        """
+        if isLocked == self.isLocked:
+            return
+        self.isLocked = isLocked
+        if isLocked:
+            self.saveTimer.stop()
+        self.isLockedChanged.emit(isLocked)
+
     def reloadBlueprint(self):
+        if self.isLocked:
+            return
+        # make sure no edits are lost
+        self.flushBlueprint()
         if not self.blueprint.loadFromDefaultNode():
             # no blueprint, reset to new instance
             self.blueprint = pulse.Blueprint()
@@ -260,6 +348,10 @@ class ActionTreeItemModel(QtCore.QAbstractItemModel):
             return False
         else:
             newBuildItems = [pulse.BuildItem.create(itemData) for itemData in itemDataList]
+            # items whose type is not registered could not be created
+            newBuildItems = [item for item in newBuildItems if item is not None]
+            if not newBuildItems:
+                return False
             return self.insertBuildItems(row, newBuildItems, parent)
 
 
@@ -309,10 +401,16 @@ class ActionTreeWidget(QtWidgets.QWidget):
         self.setupUi(self)
         # connect signals
         self.model.modelReset.connect(self.onBlueprintLoaded)
+        self.model.isLockedChanged.connect(self.onIsLockedChanged)
+        # save any pending edits when the view is closed
+        self.destroyed.connect(self.model.flushBlueprint)
 
     def onBlueprintLoaded(self):
         self.treeView.expandAll()
 
+    def onIsLockedChanged(self, isLocked):
+        self.setEnabled(not isLocked)
+
     def eventFilter(self, widget, event):
         if widget is self.treeView:
             if event.type() == QtCore.QEvent.KeyPress:
@@ -348,7 +446,7 @@ class ActionTreeWidget(QtWidgets.QWidget):
                 break
             wasChanged = True
         if wasChanged:
-            self.model.blueprint.saveToDefaultNode()
+            self.model.saveBlueprint()
 
 
 
@@ -359,8 +457,12 @@ class ActionButtonsWidget(QtWidgets.QWidget):
         super(ActionButtonsWidget, self).__init__(parent=parent)
 
         self.model = ActionTreeItemModel.getSharedModel()
+        self.model.isLockedChanged.connect(self.onIsLockedChanged)
         self.selectionModel = ActionTreeSelectionModel.getSharedModel()
         self.setupUi(self)
+
+    def onIsLockedChanged(self, isLocked):
+        self.setEnabled(not isLocked)
     
     def setupUi(self, parent):
         layout = QtWidgets.QVBoxLayout(parent)
@@ -445,7 +547,7 @@ class ActionButtonsWidget(QtWidgets.QWidget):
         for grpIndex in grpIndexes:
             grp = gc()
             self.model.insertBuildItems(0, [grp], grpIndex)
-        self.model.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
 
     def createBuildAction(self, typeName):
         if not self.model.blueprint:
@@ -462,7 +564,7 @@ class ActionButtonsWidget(QtWidgets.QWidget):
         self.selectionModel.clearSelection()
         for index in newIndexes:
             self.selectionModel.select(index, QtCore.QItemSelectionModel.Select)
-        self.model.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
 
 
 
@@ -21,6 +21,9 @@ class BlueprintEditorWidget(QtWidgets.QWidget):
 
         self.model = ActionTreeItemModel.getSharedModel()
         self.model.modelReset.connect(self.onBlueprintLoaded)
+        self.model.isLockedChanged.connect(self.onIsLockedChanged)
+        # save any pending edits when the editor is closed
+        self.destroyed.connect(self.model.flushBlueprint)
 
         layout = QtWidgets.QVBoxLayout(self)
 
@@ -59,21 +62,27 @@ class BlueprintEditorWidget(QtWidgets.QWidget):
     def onBlueprintLoaded(self):
         self.rigNameText.setText(self.blueprint.rigName)
 
+    def onIsLockedChanged(self, isLocked):
+        self.setEnabled(not isLocked)
+
     def rigNameTextChanged(self):
         self.blueprint.rigName = self.rigNameText.text()
-        self.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint()
 
     def createDefaultBlueprint(self):
+        # the current blueprint is being replaced
+        self.model.cancelSave()
         blueprint = pulse.Blueprint()
         blueprint.initializeDefaultActions()
         blueprint.saveToDefaultNode()
         self.model.reloadBlueprint()
 
     def debugSaveBlueprint(self):
-        self.blueprint.saveToDefaultNode()
+        self.model.saveBlueprint(immediate=True)
 
     def debugPrintSerialized(self):
         import pprint
+        self.model.flushBlueprint()
         blueprint = pulse.Blueprint.fromDefaultNode()
         if blueprint:
             pprint.pprint(blueprint.serialize())
@@ -91,6 +100,7 @@ class BlueprintEditorWidget(QtWidgets.QWidget):
             return
 
         print('Opening blueprint: ' + blueprintFile)
+        self.model.flushBlueprint()
         pm.openFile(blueprintFile, f=True)
         self.model.reloadBlueprint()
 
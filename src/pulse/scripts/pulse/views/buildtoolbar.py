@@ -16,12 +16,22 @@ __all__ = [
 
 class BuildToolbarWidget(QtWidgets.QWidget):
 
+    # the time in seconds to run build steps before returning to the event loop
+    BUILD_TIME_SLICE = 0.05
+
     def __init__(self, parent=None):
         super(BuildToolbarWidget, self).__init__(parent=parent)
 
         self.model = ActionTreeItemModel.getSharedModel()
         self.model.modelReset.connect(self.onBlueprintLoaded)
 
+        # the builder of the build in progress, if any
+        self.builder = None
+        # continues the build in progress each time the event loop is idle
+        self.buildTimer = QtCore.QTimer(self)
+        self.buildTimer.setInterval(0)
+        self.buildTimer.timeout.connect(self.continueBuild)
+
         self.setupUi(self)
 
     def setupUi(self, parent):
@@ -37,11 +47,43 @@ class BuildToolbarWidget(QtWidgets.QWidget):
         checkBtn.clicked.connect(self.runCheck)
         layout.addWidget(checkBtn)
 
-        buildBtn = QtWidgets.QPushButton(parent)
-        buildBtn.setText("Build")
-        buildBtn.setMaximumWidth(80)
-        buildBtn.clicked.connect(self.runBuild)
-        layout.addWidget(buildBtn)
+        self.resumeCheck = QtWidgets.QCheckBox(parent)
+        self.resumeCheck.setText("Resume")
+        self.resumeCheck.setToolTip(
+            "Save a checkpoint after each top-level group, and resume\n"
+            "from the last checkpoint whose groups and scene are unchanged")
+        layout.addWidget(self.resumeCheck)
+
+        self.buildBtn = QtWidgets.QPushButton(parent)
+        self.buildBtn.setText("Build")
+        self.buildBtn.setMaximumWidth(80)
+        self.buildBtn.clicked.connect(self.runBuild)
+        layout.addWidget(self.buildBtn)
+
+        self.progressBar = QtWidgets.QProgressBar(parent)
+        self.progressBar.setVisible(False)
+        layout.addWidget(self.progressBar)
+
+        self.retryBtn = QtWidgets.QPushButton(parent)
+        self.retryBtn.setText("Retry")
+        self.retryBtn.setMaximumWidth(80)
+        self.retryBtn.setVisible(False)
+        self.retryBtn.clicked.connect(self.retryFailedStep)
+        layout.addWidget(self.retryBtn)
+
+        self.skipBtn = QtWidgets.QPushButton(parent)
+        self.skipBtn.setText("Skip")
+        self.skipBtn.setMaximumWidth(80)
+        self.skipBtn.setVisible(False)
+        self.skipBtn.clicked.connect(self.skipFailedStep)
+        layout.addWidget(self.skipBtn)
+
+        self.cancelBtn = QtWidgets.QPushButton(parent)
+        self.cancelBtn.setText("Cancel")
+        self.cancelBtn.setMaximumWidth(80)
+        self.cancelBtn.setVisible(False)
+        self.cancelBtn.clicked.connect(self.cancelBuild)
+        layout.addWidget(self.cancelBtn)
 
     @property
     def blueprint(self):
@@ -51,15 +93,93 @@ class BuildToolbarWidget(QtWidgets.QWidget):
         self.rigNameLabel.setText(self.blueprint.rigName)
 
     def runCheck(self):
-        pass
+        self.model.flushBlueprint()
+        report = pulse.BlueprintValidator(self.blueprint).run()
+        if report.isValid():
+            pm.displayInfo(report.getSummary())
+        else:
+            print(report.format())
+            pm.warning(report.getSummary())
 
     def runBuild(self):
+        if self.builder:
+            return
         self.model.reloadBlueprint()
+        # the event loop runs between time slices, so lock the blueprint and build
+        # from a copy of it, in case it is changed before the build finishes
+        self.model.setIsLocked(True)
+        blueprint = pulse.Blueprint.fromData(self.blueprint.serialize())
         blueprintFile = str(pm.sceneName())
-        builder = pulse.BlueprintBuilder(self.blueprint, blueprintFile=blueprintFile, debug=True)
-        builder.start()
+        self.builder = pulse.BlueprintBuilder(
+            blueprint, blueprintFile=blueprintFile, debug=True, timeSlice=self.BUILD_TIME_SLICE,
+            isolateActions=True, pauseOnError=True, useCheckpoints=self.resumeCheck.isChecked(),
+            telemetry=pulse.telemetry.isTelemetryEnabled())
+        self.builder.start(run=False)
+        self.setIsBuilding(True)
+        self.buildTimer.start()
+
+    def continueBuild(self):
+        """
+        Run the build in progress for one time slice
+        """
+        builder = self.builder
+        try:
+            builder.run()
+        except Exception:
+            self.endBuild()
+            raise
+        self.progressBar.setMaximum(max(builder.totalSteps, 1))
+        self.progressBar.setValue(builder.currentStep)
+        remainingTime = builder.getRemainingTime()
+        if remainingTime is not None:
+            self.progressBar.setFormat('%p% ({0:.0f}s remaining)'.format(remainingTime))
+        if builder.isFinished or builder.isCancelled:
+            self.endBuild()
+        elif builder.failedStep:
+            # wait for the failed step to be retried or skipped,
+            # the scene can be fixed up in the meantime
+            self.buildTimer.stop()
+            self.setIsPaused(True)
+
+    def retryFailedStep(self):
+        if self.builder:
+            self.builder.retryFailedStep()
+            self.resumeBuild()
+
+    def skipFailedStep(self):
+        if self.builder:
+            self.builder.skipFailedStep()
+            self.resumeBuild()
+
+    def resumeBuild(self):
+        self.setIsPaused(False)
+        self.buildTimer.start()
+
+    def cancelBuild(self):
+        if self.builder and not self.builder.isFinished:
+            self.builder.cancel()
+            self.endBuild()
+
+    def endBuild(self):
+        self.buildTimer.stop()
+        self.builder = None
+        self.setIsBuilding(False)
+        self.model.setIsLocked(False)
         self.model.reloadBlueprint()
 
+    def setIsBuilding(self, isBuilding):
+        self.buildBtn.setEnabled(not isBuilding)
+        self.resumeCheck.setEnabled(not isBuilding)
+        self.progressBar.setVisible(isBuilding)
+        self.progressBar.setValue(0)
+        self.progressBar.setFormat('%p%')
+        self.cancelBtn.setVisible(isBuilding)
+        self.setIsPaused(False)
+
+    def setIsPaused(self, isPaused):
+        self.retryBtn.setVisible(isPaused)
+        self.skipBtn.setVisible(isPaused)
+
 
 class BuildToolbarWindow(PulseWindow):
 
@@ -1,5 +1,1418 @@
 
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import tempfile
 import unittest
+import maya.api.OpenMaya as om
 import pymel.core as pm
+import pymetanode as meta
 
+import pulse
+import pulse.build
+from pulse.events import ActionFailed, ActionFinished, ActionStarted, BuildEvent, BuildEventBus, \
+    BuildFinished, BuildStarted
 
+
+class CreateNodeTestAction(pulse.BuildAction):
+    """
+    Creates a transform using commands, and counts how many times it has run
+    """
+
+    config = {'displayName': 'Create Node', 'attrs': [{'name': 'nodeName', 'type': 'string'}]}
+    runCount = 0
+
+    def run(self):
+        CreateNodeTestAction.runCount += 1
+        node = pm.cmds.createNode('transform', name=self.nodeName)
+        pm.cmds.setAttr(node + '.translateX', 2)
+
+
+class CreateApiNodeTestAction(pulse.BuildAction):
+    """
+    Creates a transform using the maya api, which is not recorded
+    """
+
+    config = {'displayName': 'Create Api Node', 'attrs': []}
+
+    def run(self):
+        om.MFnDagNode().create('transform', 'apiNode')
+
+
+class LockApiTestAction(pulse.BuildAction):
+    """
+    Locks and changes an attribute of an existing node using the maya api, which is not recorded
+    """
+
+    config = {'displayName': 'Lock Api', 'attrs': [{'name': 'nodeName', 'type': 'string'}]}
+
+    def run(self):
+        selection = om.MSelectionList()
+        selection.add(self.nodeName + '.translateY')
+        plug = selection.getPlug(0)
+        plug.setDouble(3)
+        plug.isLocked = True
+
+
+class FailingTestAction(pulse.BuildAction):
+    """
+    Optionally creates a transform, then fails
+    """
+
+    config = {'displayName': 'Failing', 'attrs': [{'name': 'nodeName', 'type': 'string'}]}
+
+    def run(self):
+        if self.nodeName:
+            pm.cmds.createNode('transform', name=self.nodeName)
+        raise pulse.BuildActionError('failed on purpose')
+
+
+class InterruptTestAction(pulse.BuildAction):
+    """
+    Interrupts the build, like a user pressing ctrl+c
+    """
+
+    config = {'displayName': 'Interrupt', 'attrs': []}
+
+    def run(self):
+        raise KeyboardInterrupt()
+
+
+class SchemaTestAction(pulse.BuildAction):
+    """
+    Has attributes of several types, one of which is overridden by a property
+    """
+
+    config = {'displayName': 'Schema', 'attrs': [
+        {'name': 'label', 'type': 'string', 'value': 'default'},
+        {'name': 'count', 'type': 'int'},
+        {'name': 'names', 'type': 'stringlist'},
+        {'name': 'computed', 'type': 'bool'},
+    ]}
+
+    @property
+    def computed(self):
+        return True
+
+
+class TestCopyData(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        self.nodes = [pm.group(em=True, n='node{0}'.format(i)) for i in range(5)]
+        self.data = {
+            'name': 'test',
+            'count': 3,
+            'nodes': self.nodes,
+            'nested': {'values': [1, 2.0, [3, 4]], 'node': self.nodes[0]},
+        }
+
+    def test_copyIsDeep(self):
+        result = pulse.core.copyData(self.data)
+        self.assertEqual(result, self.data)
+        self.assertIsNot(result, self.data)
+        self.assertIsNot(result['nodes'], self.data['nodes'])
+        self.assertIsNot(result['nested']['values'][2], self.data['nested']['values'][2])
+
+    def test_nodesAreShared(self):
+        result = pulse.core.copyData(self.data)
+        self.assertIs(result['nested']['node'], self.nodes[0])
+        self.nodes[0].rename('renamedNode')
+        self.assertEqual(result['nested']['node'].nodeName(), 'renamedNode')
+
+
+class TestBuildActionSchema(unittest.TestCase):
+
+    def setUp(self):
+        pulse.registerActions([SchemaTestAction])
+        self.schema = SchemaTestAction.getSchema()
+
+    def test_defaults(self):
+        action = SchemaTestAction()
+        self.assertEqual(action.label, 'default')
+        self.assertEqual(action.count, 0)
+        self.assertEqual(action.names, [])
+        # mutable defaults are copied for each action
+        self.assertIsNot(action.names, SchemaTestAction().names)
+        self.assertEqual(self.schema.getDefaultValue('label'), 'default')
+        self.assertIsNone(self.schema.getDefaultValue('missing'))
+
+    def test_classMembersAreNotStored(self):
+        self.assertEqual(self.schema.names, ('label', 'count', 'names', 'computed'))
+        self.assertEqual(self.schema.storedNames, ('label', 'count', 'names'))
+        self.assertTrue(SchemaTestAction().computed)
+        self.assertTrue(SchemaTestAction(computed=False).computed)
+
+    def test_unknownKeysAreIgnored(self):
+        values = self.schema.createValues({'count': 3, 'unknown': 'value'})
+        self.assertEqual(values.count, 3)
+        self.assertEqual(values.label, 'default')
+        self.assertFalse(hasattr(values, 'unknown'))
+        action = SchemaTestAction(unknown='value')
+        self.assertFalse(hasattr(action, 'unknown'))
+        self.assertNotIn('unknown', action.serialize())
+
+    def test_setInvalidatesHash(self):
+        group = pulse.BuildGroup()
+        action = SchemaTestAction()
+        group.addChild(action)
+        actionHash = action.getHash()
+        groupHash = group.getHash()
+        action.count = 2
+        self.assertEqual(action.count, 2)
+        self.assertNotEqual(action.getHash(), actionHash)
+        self.assertNotEqual(group.getHash(), groupHash)
+        # values are stored per instance
+        self.assertEqual(SchemaTestAction().count, 0)
+
+
+class TestRigIndex(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        self.rig = pulse.core.createRigNode('testRig')
+        self.ctls = pm.group(em=True, n='ctls', parent=self.rig)
+        self.ctl = pm.group(em=True, n='ctl', parent=self.ctls)
+        self.other = pm.group(em=True, n='other')
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def test_usesCallbacks(self):
+        self.assertTrue(pulse.getRigIndex().hasCallbacks())
+
+    def test_resolvesOwners(self):
+        self.assertEqual(pulse.getRigFromNode(self.ctl), self.rig)
+        self.assertEqual(pulse.getRigFromNode(self.rig), self.rig)
+        self.assertIsNone(pulse.getRigFromNode(self.other))
+        pm.select([self.ctl, self.ctls, self.other])
+        self.assertEqual(pulse.getSelectedRigs(), [self.rig])
+        self.assertEqual(pulse.getAllRigsByName(['testRig']), [self.rig])
+
+    def test_createdRigs(self):
+        self.assertEqual(pulse.getAllRigs(), [self.rig])
+        rig = pulse.core.createRigNode('secondRig')
+        self.other.setParent(rig)
+        self.assertEqual(set(pulse.getAllRigs()), set([self.rig, rig]))
+        self.assertEqual(pulse.getRigFromNode(self.other), rig)
+
+    def test_renamed(self):
+        self.assertEqual(pulse.getRigFromNode(self.ctl), self.rig)
+        self.rig.rename('renamedRig')
+        self.ctls.rename('renamedCtls')
+        self.assertEqual(pulse.getRigFromNode(self.ctl), self.rig)
+        # a new node at the previous path of the rig is not part of it
+        node = pm.group(em=True, n='testRig')
+        child = pm.group(em=True, n='ctls', parent=node)
+        self.assertIsNone(pulse.getRigFromNode(child))
+        pm.select(child)
+        self.assertEqual(pulse.getSelectedRigs(), [])
+
+    def test_reparented(self):
+        child = pm.group(em=True, n='child', parent=self.other)
+        self.assertIsNone(pulse.getRigFromNode(child))
+        self.other.setParent(self.ctls)
+        self.assertEqual(pulse.getRigFromNode(child), self.rig)
+        self.ctls.setParent(world=True)
+        self.assertIsNone(pulse.getRigFromNode(self.ctl))
+        self.assertIsNone(pulse.getRigFromNode(child))
+        pm.select(child)
+        self.assertEqual(pulse.getSelectedRigs(), [])
+
+    def test_deleted(self):
+        self.assertEqual(pulse.getRigFromNode(self.ctl), self.rig)
+        pm.delete(self.rig)
+        self.assertEqual(pulse.getAllRigs(), [])
+        node = pm.group(em=True, n='testRig')
+        child = pm.group(em=True, n='ctls', parent=node)
+        self.assertIsNone(pulse.getRigFromNode(child))
+
+    def test_newScene(self):
+        self.assertEqual(pulse.getAllRigs(), [self.rig])
+        pm.newFile(force=True)
+        self.assertEqual(pulse.getAllRigs(), [])
+        self.assertEqual(pulse.getSelectedRigs(), [])
+        rig = pulse.core.createRigNode('testRig')
+        ctl = pm.group(em=True, n='ctl', parent=rig)
+        self.assertEqual(pulse.getRigFromNode(ctl), rig)
+
+
+class TestBuildEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = BuildEventBus()
+        self.received = []
+
+    def getCallback(self, name):
+        def callback(event):
+            self.received.append((name, type(event)))
+        return callback
+
+    def test_dispatchOrder(self):
+        self.bus.subscribe(BuildEvent, self.getCallback('all'))
+        self.bus.subscribe(BuildStarted, self.getCallback('first'))
+        self.bus.subscribe(BuildStarted, self.getCallback('second'))
+        self.bus.publish(BuildStarted(None, 1, None))
+        self.bus.publish(BuildFinished(None, 0, 0))
+        self.assertEqual(self.received, [
+            ('first', BuildStarted),
+            ('second', BuildStarted),
+            ('all', BuildStarted),
+            ('all', BuildFinished),
+        ])
+
+    def test_exactTypeOnly(self):
+        self.bus.subscribe(ActionStarted, self.getCallback('started'))
+        self.assertFalse(self.bus.isListening(ActionFinished))
+        self.bus.publish(ActionFinished(None, 0, 1, None, [], 0, 0, 0, None, False))
+        self.assertEqual(self.received, [])
+
+    def test_subscribeOnce(self):
+        callback = self.getCallback('once')
+        self.bus.subscribe(BuildStarted, callback)
+        self.bus.subscribe(BuildStarted, callback)
+        self.bus.publish(BuildStarted(None, 1, None))
+        self.assertEqual(len(self.received), 1)
+
+    def test_unsubscribe(self):
+        first = self.getCallback('first')
+        second = self.getCallback('second')
+        self.bus.subscribe(BuildStarted, first)
+        self.bus.subscribe(BuildStarted, second)
+        self.bus.unsubscribe(BuildStarted, first)
+        self.bus.publish(BuildStarted(None, 1, None))
+        self.assertEqual(self.received, [('second', BuildStarted)])
+        self.assertTrue(self.bus.isListening(BuildStarted))
+        self.bus.unsubscribe(BuildStarted, second)
+        self.assertFalse(self.bus.isListening(BuildStarted))
+        # unsubscribing again is ignored
+        self.bus.unsubscribe(BuildStarted, second)
+        self.bus.publish(BuildStarted(None, 1, None))
+        self.assertEqual(len(self.received), 1)
+
+    def test_listenToAll(self):
+        callback = self.getCallback('all')
+        self.bus.subscribe(BuildEvent, callback)
+        self.assertTrue(self.bus.isListening(BuildStarted))
+        self.assertTrue(self.bus.isListening(ActionFailed))
+        self.bus.unsubscribe(BuildEvent, callback)
+        self.assertFalse(self.bus.isListening(BuildStarted))
+
+    def test_subscriberErrorsAreIsolated(self):
+        def failingCallback(event):
+            raise ValueError('failed on purpose')
+        self.bus.subscribe(BuildStarted, failingCallback)
+        self.bus.subscribe(BuildStarted, self.getCallback('after'))
+        self.bus.publish(BuildStarted(None, 1, None))
+        self.assertEqual(self.received, [('after', BuildStarted)])
+
+
+class TestBuildItemHashes(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        self.node = pm.group(em=True, n='ctl')
+        self.blueprint = pulse.Blueprint()
+        self.group = pulse.BuildGroup(displayName='Main')
+        self.blueprint.rootGroup.addChild(self.group)
+        self.action = pulse.getActionClass('AnimControl')(controlNode=self.node)
+        self.group.addChild(self.action)
+
+    def test_hashIsStable(self):
+        data = self.blueprint.serialize()
+        self.assertEqual(pulse.Blueprint.fromData(data).getHash(), self.blueprint.getHash())
+
+    def test_attrSetInvalidatesParents(self):
+        rootHash = self.blueprint.rootGroup.getHash()
+        groupHash = self.group.getHash()
+        self.action.controlNode = None
+        self.assertNotEqual(self.group.getHash(), groupHash)
+        self.assertNotEqual(self.blueprint.rootGroup.getHash(), rootHash)
+
+    def test_childChangesInvalidateParents(self):
+        rootHash = self.blueprint.rootGroup.getHash()
+        self.group.addChild(pulse.BuildGroup())
+        addedHash = self.blueprint.rootGroup.getHash()
+        self.assertNotEqual(addedHash, rootHash)
+        self.group.removeChildAt(1)
+        self.assertEqual(self.blueprint.rootGroup.getHash(), rootHash)
+
+    def test_unknownTypesAreIgnored(self):
+        data = self.blueprint.serialize()
+        data['buildItems']['children'][0]['children'].append(dict(type='NotARegisteredAction'))
+        blueprint = pulse.Blueprint.fromData(data)
+        self.assertEqual(blueprint.getHash(), self.blueprint.getHash())
+
+    def test_clearHashCache(self):
+        rootHash = self.blueprint.rootGroup.getHash()
+        # editing a list in place does not invalidate the hash
+        self.action.keyableAttrs.append('tx')
+        self.assertEqual(self.blueprint.rootGroup.getHash(), rootHash)
+        self.blueprint.rootGroup.clearHashCache()
+        self.assertNotEqual(self.blueprint.rootGroup.getHash(), rootHash)
+
+    def test_inPlaceEditsAreSaved(self):
+        self.blueprint.saveToDefaultNode()
+        self.action.keyableAttrs.append('tx')
+        # in place edits must be followed by invalidating the hash
+        self.action.invalidateHash()
+        self.blueprint.saveToDefaultNode()
+        blueprint = pulse.Blueprint()
+        blueprint.loadFromDefaultNode()
+        self.assertEqual(blueprint.getHash(), self.blueprint.getHash())
+
+    def test_batchConstantsAreInvalidated(self):
+        batch = pulse.BatchBuildAction.fromAction(self.action)
+        batch.addVariantAttr('controlNode')
+        batch.addVariant()
+        batch.addVariant()
+        self.assertEqual(batch.createAction(1).createOffset, batch.constantValues['createOffset'])
+        batch.constantValues['createOffset'] = not batch.constantValues['createOffset']
+        batch.invalidateHash()
+        self.assertEqual(batch.createAction(0).createOffset, batch.constantValues['createOffset'])
+        batch.removeVariantAttr('controlNode')
+        self.assertEqual(batch.createAction(0).controlNode, batch.constantValues['controlNode'])
+
+    def test_nodesHashByUUID(self):
+        actionHash = self.action.getHash()
+        self.node.rename('renamedCtl')
+        self.action.invalidateHash()
+        self.assertEqual(self.action.getHash(), actionHash)
+
+
+class ShardTestItem(object):
+    """
+    A minimal item that can be stored in shards, and counts how often it is serialized
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.serializeCount = 0
+
+    def getHash(self):
+        return 'item{0}'.format(self.value)
+
+    def serialize(self):
+        self.serializeCount += 1
+        return {'value': self.value}
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        self.node = pm.cmds.createNode('network', name='shardNode')
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def test_roundTrip(self):
+        items = [ShardTestItem(i) for i in range(3)]
+        keys = pulse.shards.writeShards(self.node, items)
+        self.assertEqual(keys, ['item0', 'item1', 'item2'])
+        self.assertEqual(pulse.shards.readShards(self.node, keys), [{'value': i} for i in range(3)])
+
+    def test_onlyChangedShardsAreWritten(self):
+        items = [ShardTestItem(i) for i in range(3)]
+        pulse.shards.writeShards(self.node, items)
+        items[1] = ShardTestItem(5)
+        keys = pulse.shards.writeShards(self.node, items)
+        self.assertEqual([item.serializeCount for item in items], [1, 1, 1])
+        self.assertEqual(keys, ['item0', 'item5', 'item2'])
+        self.assertEqual(pulse.shards.readShards(self.node, keys), [{'value': v} for v in (0, 5, 2)])
+
+    def test_staleShardsAreRemoved(self):
+        pulse.shards.writeShards(self.node, [ShardTestItem(i) for i in range(3)])
+        pulse.shards.writeShards(self.node, [ShardTestItem(0), ShardTestItem(5)])
+        self.assertEqual(pulse.shards.getShardKeys(self.node), set(['item0', 'item5']))
+        with self.assertRaises(ValueError):
+            pulse.shards.readShards(self.node, ['item1'])
+
+    def test_blueprintRoundTrip(self):
+        blueprint = pulse.Blueprint()
+        blueprint.rigName = 'shardRig'
+        blueprint.initializeDefaultActions()
+        blueprint.getBuildGroup('Main').addChild(pulse.getActionClass('AnimControl')())
+        blueprint.saveToNode(self.node)
+        loaded = pulse.Blueprint.fromNode(self.node)
+        self.assertEqual(loaded.serialize(), blueprint.serialize())
+        self.assertEqual(loaded.getHash(), blueprint.getHash())
+        keys = pulse.shards.getShardKeys(self.node)
+        self.assertEqual(keys, set([item.getHash() for item in blueprint.rootGroup.children]))
+
+    def test_blueprintEditRewritesOneShard(self):
+        blueprint = pulse.Blueprint()
+        blueprint.initializeDefaultActions()
+        blueprint.saveToNode(self.node)
+        keys = pulse.shards.getShardKeys(self.node)
+        mainGroup = blueprint.getBuildGroup('Main')
+        mainHash = mainGroup.getHash()
+        mainGroup.addChild(pulse.getActionClass('AnimControl')())
+        blueprint.saveToNode(self.node)
+        newKeys = pulse.shards.getShardKeys(self.node)
+        self.assertEqual(keys - newKeys, set([mainHash]))
+        self.assertEqual(newKeys - keys, set([mainGroup.getHash()]))
+        self.assertEqual(pulse.Blueprint.fromNode(self.node).getHash(), blueprint.getHash())
+
+    def test_editorEditsRewriteShards(self):
+        # the same edits the action editor and tree make, without clearing hash caches
+        blueprint = pulse.Blueprint()
+        blueprint.initializeDefaultActions()
+        mainGroup = blueprint.getBuildGroup('Main')
+        action = pulse.getActionClass('AnimControl')()
+        mainGroup.addChild(action)
+        batch = pulse.BatchBuildAction.fromAction(pulse.getActionClass('AnimControl')())
+        batch.addVariantAttr('controlNode')
+        batch.addVariant()
+        mainGroup.addChild(batch)
+        blueprint.saveToNode(self.node)
+
+        action.createOffset = not action.createOffset
+        batch.variantValues[0]['controlNode'] = pm.group(empty=True)
+        batch.invalidateHash()
+        mainGroup.displayName = 'Renamed'
+        blueprint.saveToNode(self.node)
+        self.assertEqual(pulse.Blueprint.fromNode(self.node).serialize(), blueprint.serialize())
+
+
+class TestBuildPlan(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        self.blueprint = pulse.Blueprint()
+        self.blueprint.initializeDefaultActions()
+        mainGroup = self.blueprint.getBuildGroup('Main')
+        self.subGroup = pulse.BuildGroup(displayName='Sub')
+        mainGroup.addChild(self.subGroup)
+        self.subGroup.addChild(pulse.getActionClass('AnimControl')())
+        batch = pulse.BatchBuildAction.fromAction(pulse.getActionClass('AnimControl')())
+        batch.addVariant()
+        batch.addVariant()
+        self.subGroup.addChild(batch)
+
+    def test_actionPaths(self):
+        plan = self.blueprint.getPlan()
+        expected = [None, None, 'Main[0]/Sub[0]', 'Main[0]/Sub[1]/Batch[0]', 'Main[0]/Sub[1]/Batch[1]', None, None]
+        self.assertEqual([plan.getActionPath(i) for i in range(plan.getActionCount())], expected)
+        self.assertEqual(plan.getActionCount(), self.blueprint.rootGroup.getActionCount())
+        # the variants of a batch that implements runBatch are one step
+        self.assertEqual(plan.getStepCount(), 6)
+        self.assertEqual(plan.getStep(3)[1], expected[3:5])
+
+    def test_lookupByPath(self):
+        plan = self.blueprint.getPlan()
+        for index in range(plan.getActionCount()):
+            path = plan.getActionPath(index)
+            if path:
+                self.assertEqual(plan.getActionIndex(path), index)
+        self.assertIsNone(plan.getActionIndex('Missing[0]'))
+        self.assertIs(self.blueprint.getBuildGroup('Main/Sub'), self.subGroup)
+        self.assertIs(self.blueprint.getBuildGroup(), self.blueprint.rootGroup)
+        self.assertIsNone(self.blueprint.getBuildGroup('Main/Missing'))
+
+    def test_cachedUntilModified(self):
+        plan = self.blueprint.getPlan()
+        self.assertIs(self.blueprint.getPlan(), plan)
+        self.subGroup.addChild(pulse.getActionClass('AnimControl')())
+        newPlan = self.blueprint.getPlan()
+        self.assertIsNot(newPlan, plan)
+        self.assertEqual(newPlan.getActionCount(), plan.getActionCount() + 1)
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        self.blueprint = pulse.Blueprint()
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def addBatch(self, typeName, variantAttr, values):
+        batch = pulse.BatchBuildAction.fromAction(pulse.getActionClass(typeName)())
+        batch.addVariantAttr(variantAttr)
+        for value in values:
+            batch.addVariant()
+            batch.variantValues[-1][variantAttr] = value
+        batch.invalidateHash()
+        self.blueprint.rootGroup.addChild(batch)
+        return batch
+
+    def build(self):
+        failures = []
+        builder = pulse.BlueprintBuilder(self.blueprint)
+        builder.events.subscribe(ActionFailed, failures.append)
+        builder.start()
+        return builder, failures
+
+    def test_animControlBatch(self):
+        nodes = [pm.group(em=True, n='ctl{0}'.format(i)) for i in range(3)]
+        self.addBatch('AnimControl', 'controlNode', [nodes[0], None, nodes[2]])
+        plan = self.blueprint.getPlan()
+        self.assertEqual(plan.getStepCount(), 1)
+        self.assertEqual(plan.getStepActionCount(0), 3)
+        builder, failures = self.build()
+        self.assertEqual(len(builder.errors), 1)
+        self.assertEqual([(f.step, f.path) for f in failures], [(1, plan.getActionPath(1))])
+        for node in (nodes[0], nodes[2]):
+            self.assertEqual(node.getParent().nodeName(), node.nodeName() + '_offset')
+            self.assertTrue(node.tx.isKeyable())
+            self.assertTrue(node.v.isLocked())
+            self.assertFalse(node.v.isInChannelBox())
+
+    def test_simpleConstrainBatch(self):
+        leader = pm.group(em=True, n='leader')
+        followers = [pm.group(em=True, n='follower{0}'.format(i)) for i in range(2)]
+        batch = self.addBatch('SimpleConstrain', 'follower', followers)
+        batch.variantValues[1]['follower'] = None
+        batch.constantValues['leader'] = leader
+        batch.invalidateHash()
+        plan = self.blueprint.getPlan()
+        self.assertEqual(plan.getStepCount(), 1)
+        builder, failures = self.build()
+        self.assertEqual([f.path for f in failures], [plan.getActionPath(1)])
+        offset = followers[0].getParent()
+        self.assertEqual(offset.nodeName(), 'follower0_offset')
+        self.assertTrue(pm.listRelatives(offset, type='parentConstraint'))
+        self.assertTrue(pm.listRelatives(offset, type='scaleConstraint'))
+
+
+class TestBuildCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        self.checkpointDir = tempfile.mkdtemp()
+        self.node = pm.group(em=True, n='ctl')
+        self.blueprint = pulse.Blueprint()
+        self.actions = []
+        for i in range(3):
+            group = pulse.BuildGroup(displayName='Group{0}'.format(i))
+            action = pulse.getActionClass('AnimControl')()
+            group.addChild(action)
+            self.blueprint.rootGroup.addChild(group)
+            self.actions.append(action)
+        checkpoints = self.getCheckpoints()
+        for index in range(3):
+            checkpoints.save(index)
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpointDir, ignore_errors=True)
+
+    def getCheckpoints(self):
+        return pulse.checkpoints.BuildCheckpoints(self.blueprint, checkpointDir=self.checkpointDir)
+
+    def test_unchangedIsValid(self):
+        checkpoints = self.getCheckpoints()
+        self.assertEqual([checkpoints.isValid(i) for i in range(3)], [True, True, True])
+        self.assertEqual(checkpoints.getResumeIndex(), 2)
+
+    def test_editInvalidatesDownstream(self):
+        self.actions[1].controlNode = self.node
+        checkpoints = self.getCheckpoints()
+        self.assertEqual([checkpoints.isValid(i) for i in range(3)], [True, False, False])
+        self.assertEqual(checkpoints.getResumeIndex(), 0)
+
+    def test_editFirstInvalidatesAll(self):
+        self.actions[0].controlNode = self.node
+        checkpoints = self.getCheckpoints()
+        self.assertEqual([checkpoints.isValid(i) for i in range(3)], [False, False, False])
+        self.assertEqual(checkpoints.getResumeIndex(), -1)
+
+    def test_saveDiscardsDownstream(self):
+        checkpoints = self.getCheckpoints()
+        checkpoints.save(0)
+        self.assertEqual(checkpoints.getResumeIndex(), 0)
+        self.assertEqual(self.getCheckpoints().getResumeIndex(), 0)
+
+
+class SavedSceneTestCase(unittest.TestCase):
+    """
+    Runs each test in a new scene that is saved to a temp dir,
+    since cached, recorded and resumed builds depend on the saved file
+    """
+
+    # the BuildAction classes registered for each test
+    actionClasses = [CreateNodeTestAction]
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.loadBuiltinActions()
+        pulse.registerActions(self.actionClasses)
+        CreateNodeTestAction.runCount = 0
+        self.tempDir = tempfile.mkdtemp()
+        self.sceneFile = os.path.join(self.tempDir, 'blueprint.ma')
+        self.setUpScene()
+        pm.renameFile(self.sceneFile)
+        pm.saveFile(type='mayaAscii')
+        self.blueprint = pulse.Blueprint()
+
+    def setUpScene(self):
+        """
+        Create any nodes that should be saved in the scene
+        """
+        pass
+
+    def tearDown(self):
+        pm.newFile(force=True)
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def addNodeGroups(self, names):
+        """
+        Add a group with an action that creates a node for each name
+        to the blueprint, and return the actions
+        """
+        actions = []
+        for name in names:
+            group = pulse.BuildGroup(displayName=name)
+            action = CreateNodeTestAction(nodeName=name)
+            group.addChild(action)
+            self.blueprint.rootGroup.addChild(group)
+            actions.append(action)
+        return actions
+
+
+class TestCheckpointResume(SavedSceneTestCase):
+
+    def setUp(self):
+        super(TestCheckpointResume, self).setUp()
+        self.actions = self.addNodeGroups(['nodeA', 'nodeB'])
+
+    def build(self, reopen=True):
+        if reopen:
+            pm.openFile(self.sceneFile, force=True)
+        builder = pulse.BlueprintBuilder(
+            self.blueprint, blueprintFile=self.sceneFile, useCheckpoints=True,
+            checkpointDir=os.path.join(self.tempDir, 'checkpoints'))
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        return builder
+
+    def test_resumesFromLastCheckpoint(self):
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        builder = self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertIsNotNone(builder.rig)
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertTrue(pm.objExists('nodeB'))
+        self.assertEqual(pm.sceneName(), self.sceneFile)
+
+    def test_resumesBeforeEditedItem(self):
+        self.build()
+        self.actions[1].nodeName = 'nodeC'
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 3)
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertTrue(pm.objExists('nodeC'))
+        self.assertFalse(pm.objExists('nodeB'))
+
+    def test_resumesAfterSavingEditedBlueprint(self):
+        # the blueprint is saved in the scene it is built from
+        pm.openFile(self.sceneFile, force=True)
+        self.blueprint.saveToDefaultNode()
+        pm.saveFile()
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        self.actions[1].nodeName = 'nodeC'
+        self.blueprint.saveToDefaultNode()
+        pm.saveFile()
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 3)
+        self.assertTrue(pm.objExists('nodeC'))
+        self.assertFalse(pm.objExists('nodeB'))
+
+    def test_unsavedBlueprintEditsResume(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        self.actions[1].nodeName = 'nodeC'
+        self.blueprint.saveToDefaultNode()
+        self.build(reopen=False)
+        self.assertEqual(CreateNodeTestAction.runCount, 3)
+        self.assertTrue(pm.objExists('nodeC'))
+
+    def test_savedSceneChangesInvalidate(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        pm.group(em=True, n='savedNode')
+        pm.saveFile()
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 4)
+
+    def test_unsavedChangesDoNotResume(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        pm.group(em=True, n='unsavedNode')
+        self.build(reopen=False)
+        self.assertEqual(CreateNodeTestAction.runCount, 4)
+        self.assertTrue(pm.objExists('unsavedNode'))
+
+
+class TestBuildCache(SavedSceneTestCase):
+
+    actionClasses = [CreateNodeTestAction, CreateApiNodeTestAction]
+
+    def setUp(self):
+        super(TestBuildCache, self).setUp()
+        self.action = CreateNodeTestAction(nodeName='cachedNode')
+        self.blueprint.rootGroup.addChild(self.action)
+
+    def getKey(self, actionClasses=None):
+        if actionClasses is None:
+            actionClasses = [CreateNodeTestAction]
+        return pulse.buildcache.getBuildKey(self.blueprint, self.sceneFile, actionClasses)
+
+    def build(self):
+        pm.openFile(self.sceneFile, force=True)
+        builder = pulse.BlueprintBuilder(
+            self.blueprint, blueprintFile=self.sceneFile, useCache=True,
+            cacheDir=os.path.join(self.tempDir, 'cache'))
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        return builder
+
+    def test_keyIsStable(self):
+        self.assertEqual(self.getKey(), self.getKey())
+
+    def test_attrChangesInvalidate(self):
+        key = self.getKey()
+        self.action.nodeName = 'otherNode'
+        self.assertNotEqual(self.getKey(), key)
+
+    def test_actionChangesInvalidate(self):
+        key = self.getKey()
+        self.assertNotEqual(self.getKey([CreateNodeTestAction, CreateApiNodeTestAction]), key)
+
+    def test_savedFileChangesInvalidate(self):
+        key = self.getKey()
+        pm.group(em=True, n='savedNode')
+        pm.saveFile()
+        self.assertNotEqual(self.getKey(), key)
+
+    def test_restoresUnchangedBuild(self):
+        firstKey = self.build().cacheKey
+        builder = self.build()
+        self.assertEqual(builder.cacheKey, firstKey)
+        self.assertEqual(CreateNodeTestAction.runCount, 1)
+        self.assertIsNotNone(builder.rig)
+        self.assertTrue(pm.objExists('cachedNode'))
+        self.assertEqual(pm.sceneName(), self.sceneFile)
+
+    def test_editedBlueprintIsRebuilt(self):
+        firstKey = self.build().cacheKey
+        self.action.nodeName = 'otherNode'
+        builder = self.build()
+        self.assertNotEqual(builder.cacheKey, firstKey)
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertTrue(pm.objExists('otherNode'))
+        self.assertFalse(pm.objExists('cachedNode'))
+
+    def test_evictedBuildIsRebuilt(self):
+        key = self.build().cacheKey
+        pm.openFile(self.sceneFile, force=True)
+        builder = pulse.BlueprintBuilder(
+            self.blueprint, blueprintFile=self.sceneFile, useCache=True,
+            cacheDir=os.path.join(self.tempDir, 'cache'))
+        # another build process removes the cached scene after it was found
+        os.remove(builder.cache.getFilePath(key))
+        builder.cache.has = lambda key: True
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertTrue(pm.objExists('cachedNode'))
+
+
+class TestActionMemoization(SavedSceneTestCase):
+
+    def setUp(self):
+        super(TestActionMemoization, self).setUp()
+        self.memoDir = os.path.join(self.tempDir, 'actions')
+        self.action = pulse.getActionClass('CreateControl')(controlName='memoCtl', shape='Cube')
+        self.blueprint.rootGroup.addChild(self.action)
+
+    def setUpScene(self):
+        target = pm.group(em=True, n='target')
+        target.translate.set((1, 2, 3))
+        target.rotate.set((0, 45, 0))
+        target.rotateOrder.set(2)
+        parent = pm.group(em=True, n='parent')
+        parent.translate.set((0, 1, 0))
+
+    def build(self):
+        """
+        Build the blueprint in the saved scene, and return
+        the number of controls that were created by running the action
+        """
+        pm.openFile(self.sceneFile, force=True)
+        self.action.targetNode = pm.PyNode('target')
+        self.action.parent = pm.PyNode('parent')
+        createControl = pulse.controlshapes.createControl
+        calls = []
+
+        def countingCreateControl(*args, **kwargs):
+            calls.append(args)
+            return createControl(*args, **kwargs)
+
+        pulse.controlshapes.createControl = countingCreateControl
+        try:
+            builder = pulse.BlueprintBuilder(self.blueprint, memoizeActions=True, memoDir=self.memoDir)
+            builder.start()
+        finally:
+            pulse.controlshapes.createControl = createControl
+        self.assertEqual(builder.errors, [])
+        return len(calls)
+
+    def getControlState(self):
+        ctl = pm.PyNode('memoCtl')
+        shapes = []
+        for shape in ctl.getShapes():
+            points = pm.cmds.getAttr(shape.longName() + '.cv[*]')
+            shapes.append((shape.nodeType(), [round(v, 4) for p in points for v in p]))
+        return dict(
+            parent=ctl.getParent().nodeName(),
+            matrix=[round(v, 4) for v in pm.cmds.xform(ctl.longName(), q=True, worldSpace=True, matrix=True)],
+            rotateOrder=ctl.rotateOrder.get(),
+            shapes=shapes,
+            isControl=meta.hasMetaClass(ctl, pulse.controlshapes.CONTROLSHAPE_METACLASS),
+        )
+
+    def test_restoresCreatedNodes(self):
+        self.assertEqual(self.build(), 1)
+        built = self.getControlState()
+        self.assertEqual(built['parent'], 'parent')
+        self.assertTrue(built['shapes'])
+        self.assertEqual(self.build(), 0)
+        self.assertEqual(self.getControlState(), built)
+        self.assertFalse(pm.cmds.namespace(exists=pulse.memoization.SNIPPET_NAMESPACE))
+
+    def test_inputChangesInvalidate(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        pm.PyNode('target').tx.set(5)
+        pm.saveFile()
+        self.assertEqual(self.build(), 1)
+        self.assertAlmostEqual(pm.PyNode('memoCtl').getTranslation(space='world')[0], 5)
+        self.action.shape = 'Circle'
+        self.assertEqual(self.build(), 1)
+
+    def test_evictsToMaxSize(self):
+        self.build()
+        cache = pulse.memoization.ActionMemoCache(self.memoDir, maxSize=0)
+        self.assertEqual(len(cache.entries), 1)
+        path = cache.getFilePath(cache.entries.keys()[0])
+        self.assertTrue(os.path.isfile(path))
+        with cache._editManifest():
+            cache.evict()
+        self.assertEqual(cache.entries, {})
+        self.assertFalse(os.path.isfile(path))
+        self.assertEqual(self.build(), 1)
+
+
+class TestBuildRecording(SavedSceneTestCase):
+
+    actionClasses = [CreateNodeTestAction, CreateApiNodeTestAction, LockApiTestAction]
+
+    def setUp(self):
+        super(TestBuildRecording, self).setUp()
+        self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName='recordedNode'))
+
+    def build(self, reopen=True):
+        if reopen:
+            pm.openFile(self.sceneFile, force=True)
+        builder = pulse.BlueprintBuilder(
+            self.blueprint, useRecording=True, recordingDir=os.path.join(self.tempDir, 'recordings'))
+        builder.start()
+        return builder
+
+    def test_replayMatchesBuild(self):
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 1)
+        builder = self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 1)
+        self.assertEqual(builder.errors, [])
+        self.assertIsNotNone(builder.rig)
+        self.assertEqual(pm.PyNode('recordedNode').translateX.get(), 2)
+
+    def test_unsavedChangesAreNotReplayed(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        pm.group(em=True, n='unsavedNode')
+        self.build(reopen=False)
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+
+    def test_mismatchBuildsNormally(self):
+        self.blueprint.rootGroup.addChild(CreateApiNodeTestAction())
+        self.build()
+        builder = self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertEqual(builder.errors, [])
+        self.assertTrue(pm.objExists('apiNode'))
+        self.assertEqual(len(pm.ls('recordedNode*')), 1)
+        # the rejected recording is not replayed again
+        self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 3)
+
+    def test_checkpointsAreNotRecorded(self):
+        group = pulse.BuildGroup(displayName='Group')
+        group.addChild(CreateNodeTestAction(nodeName='groupedNode'))
+        self.blueprint.rootGroup.addChild(group)
+        pm.openFile(self.sceneFile, force=True)
+        builder = pulse.BlueprintBuilder(
+            self.blueprint, blueprintFile=self.sceneFile, useRecording=True,
+            recordingDir=os.path.join(self.tempDir, 'recordings'),
+            useCheckpoints=True, checkpointDir=os.path.join(self.tempDir, 'checkpoints'))
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        self.assertTrue(builder.checkpoints.isValid(1))
+        commands = [call[0] for section in builder.recorder.sections for call in section['calls']]
+        self.assertIn('createNode', commands)
+        self.assertNotIn('file', commands)
+
+    def test_failedReplayBuildsNormally(self):
+        self.build()
+        pm.openFile(self.sceneFile, force=True)
+        key = pulse.buildcache.getBuildKey(self.blueprint, None, pulse.getRegisteredActions().values())
+        recordings = pulse.recording.BuildRecordings(os.path.join(self.tempDir, 'recordings'))
+        path = recordings.getFilePath(key)
+        with open(path) as fp:
+            data = json.load(fp)
+        # a command that raises when replayed, after the recorded node is created
+        data['sections'][-1]['calls'].append(['setAttr', ['missingNode.translateX', 1], {}])
+        with open(path, 'w') as fp:
+            json.dump(data, fp)
+        builder = self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertTrue(builder.isFinished)
+        self.assertEqual(builder.errors, [])
+        self.assertEqual(len(pm.ls('recordedNode*')), 1)
+        self.assertTrue(pulse.recording.BuildRecordings(os.path.join(self.tempDir, 'recordings')).isRejected(key))
+
+    def test_apiAttrChangesMismatch(self):
+        self.blueprint.rootGroup.addChild(LockApiTestAction(nodeName='recordedNode'))
+        self.build()
+        builder = self.build()
+        self.assertEqual(CreateNodeTestAction.runCount, 2)
+        self.assertEqual(builder.errors, [])
+        self.assertTrue(pm.PyNode('recordedNode').translateY.isLocked())
+        self.assertEqual(pm.PyNode('recordedNode').translateY.get(), 3)
+
+
+class TestIsolatedBuild(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pm.undoInfo(state=True)
+        pulse.registerActions([CreateNodeTestAction, FailingTestAction])
+        self.blueprint = pulse.Blueprint()
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def build(self, failingNodeName):
+        for action in (CreateNodeTestAction(nodeName='nodeA'),
+                       FailingTestAction(nodeName=failingNodeName),
+                       CreateNodeTestAction(nodeName='nodeB')):
+            self.blueprint.rootGroup.addChild(action)
+        builder = pulse.BlueprintBuilder(self.blueprint, isolateActions=True)
+        builder.start()
+        self.assertEqual(len(builder.errors), 1)
+        return builder
+
+    def test_failedStepIsUndone(self):
+        self.build('failedNode')
+        self.assertFalse(pm.objExists('failedNode'))
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertEqual(pm.PyNode('nodeA').translateX.get(), 2)
+        self.assertTrue(pm.objExists('nodeB'))
+
+    def test_emptyFailedStepKeepsPriorSteps(self):
+        # a step that changes nothing leaves no undo chunk,
+        # so undoing it must not undo the step before it
+        builder = self.build('')
+        self.assertIsNotNone(builder.rig)
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertEqual(pm.PyNode('nodeA').translateX.get(), 2)
+        self.assertTrue(pm.objExists('nodeB'))
+
+
+class TestIsolatedBatch(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pm.undoInfo(state=True)
+        pulse.loadBuiltinActions()
+        self.blueprint = pulse.Blueprint()
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def test_undoneVariantsAreReported(self):
+        nodes = [pm.group(em=True, n='ctl{0}'.format(i)) for i in range(3)]
+        batch = pulse.BatchBuildAction.fromAction(pulse.getActionClass('AnimControl')())
+        batch.addVariantAttr('controlNode')
+        for node in (nodes[0], None, nodes[2]):
+            batch.addVariant()
+            batch.variantValues[-1]['controlNode'] = node
+        batch.invalidateHash()
+        self.blueprint.rootGroup.addChild(batch)
+        failures = []
+        builder = pulse.BlueprintBuilder(self.blueprint, isolateActions=True)
+        builder.events.subscribe(ActionFailed, failures.append)
+        builder.start()
+        plan = self.blueprint.getPlan()
+        self.assertEqual(len(builder.errors), 3)
+        self.assertEqual(sorted([f.path for f in failures]), [plan.getActionPath(i) for i in range(3)])
+        # the changes of the variants that succeeded were undone
+        for node in (nodes[0], nodes[2]):
+            self.assertIsNone(node.getParent())
+            self.assertFalse(node.v.isLocked())
+
+
+class TestDisabledUndo(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pm.undoInfo(state=True)
+        pulse.registerActions([CreateNodeTestAction, InterruptTestAction])
+        self.blueprint = pulse.Blueprint()
+        self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName='nodeA'))
+
+    def tearDown(self):
+        pm.undoInfo(state=True)
+        pm.newFile(force=True)
+
+    def test_undoIsRestored(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, disableUndo=True)
+        builder.start()
+        self.assertTrue(builder.isFinished)
+        self.assertTrue(pm.undoInfo(query=True, state=True))
+
+    def test_undoIsRestoredWhenBuildRaises(self):
+        self.blueprint.rootGroup.addChild(InterruptTestAction())
+        builder = pulse.BlueprintBuilder(self.blueprint, disableUndo=True)
+        with self.assertRaises(KeyboardInterrupt):
+            builder.start()
+        builder.closeLogs()
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertTrue(pm.undoInfo(query=True, state=True))
+
+    def test_undoIsRestoredWhenCancelled(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, disableUndo=True, timeSlice=0)
+        builder.start()
+        # paused after the first time slice
+        self.assertFalse(builder.isFinished)
+        self.assertFalse(pm.undoInfo(query=True, state=True))
+        builder.cancel()
+        self.assertTrue(builder.isCancelled)
+        self.assertTrue(pm.undoInfo(query=True, state=True))
+
+
+class TestBuildRun(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.registerActions([CreateNodeTestAction, InterruptTestAction])
+        self.blueprint = pulse.Blueprint()
+        for name in ('nodeA', 'nodeB', 'nodeC'):
+            self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName=name))
+
+    def tearDown(self):
+        pm.newFile(force=True)
+
+    def test_runReturnsAfterTimeSlice(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, timeSlice=0)
+        builder.start()
+        self.assertTrue(builder.isStarted)
+        self.assertFalse(builder.isRunning)
+        self.assertFalse(builder.isFinished)
+        self.assertFalse(pm.objExists('nodeC'))
+        builder.cancel()
+
+    def test_resumeAfterPause(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, timeSlice=0)
+        builder.start()
+        runCount = 1
+        while not builder.isFinished and runCount < 100:
+            builder.run()
+            runCount += 1
+        self.assertTrue(builder.isFinished)
+        self.assertGreater(runCount, 3)
+        self.assertEqual(builder.errors, [])
+        for name in ('nodeA', 'nodeB', 'nodeC'):
+            self.assertTrue(pm.objExists(name))
+
+    def test_cancelWhilePaused(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, timeSlice=0)
+        builder.start()
+        builder.run()
+        builder.cancel()
+        self.assertTrue(builder.isCancelled)
+        # a cancelled build cannot be continued
+        builder.run()
+        self.assertFalse(builder.isFinished)
+        self.assertFalse(pm.objExists('nodeC'))
+
+    def test_runRaises(self):
+        self.blueprint.rootGroup.insertChild(1, InterruptTestAction())
+        builder = pulse.BlueprintBuilder(self.blueprint)
+        with self.assertRaises(KeyboardInterrupt):
+            builder.start()
+        builder.closeLogs()
+        self.assertFalse(builder.isRunning)
+        self.assertTrue(pm.objExists('nodeA'))
+        self.assertFalse(pm.objExists('nodeB'))
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        pulse.registerActions([CreateNodeTestAction])
+        self.tempDir = tempfile.mkdtemp()
+        self.dbFile = os.path.join(self.tempDir, 'telemetry.db')
+        self.store = pulse.telemetry.TelemetryStore(self.dbFile)
+        self.blueprint = pulse.Blueprint()
+        # top-level actions with the same display name
+        for name in ('nodeA', 'nodeB'):
+            self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName=name))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def recordBuild(self, wallTimes, firstRootIndex=0):
+        """
+        Record a build of the blueprint in which each step took the given time
+        """
+        plan = self.blueprint.getPlan()
+        telemetry = pulse.telemetry.BuildTelemetry(self.store, 'testRig', 'testHash')
+        telemetry.onBuildStarted(BuildStarted(None, len(wallTimes), plan, firstRootIndex))
+        for step, wallTime in enumerate(wallTimes):
+            actions, paths = plan.getStep(firstRootIndex + step)
+            telemetry.onActionFinished(ActionFinished(
+                None, step, len(wallTimes), paths[0], actions, time.time(), wallTime, wallTime, 0, False))
+        telemetry.onBuildFinished(BuildFinished(None, sum(wallTimes), 0))
+        return telemetry
+
+    def test_duplicateNamesHaveUniqueKeys(self):
+        self.recordBuild([1.0, 2.0])
+        build = self.store.getBuilds('testRig')[0]
+        keys = [row['key'] for row in self.store.getActions(build['id'])]
+        self.assertEqual(keys, ['Create Node', 'Create Node #2'])
+
+    def test_findRegressions(self):
+        for i in range(3):
+            self.recordBuild([1.0, 1.0])
+        self.recordBuild([1.0, 3.0])
+        regressions = self.store.findRegressions('testRig')
+        self.assertEqual([r.key for r in regressions], ['Create Node #2'])
+        self.assertAlmostEqual(regressions[0].ratio, 3.0)
+        self.assertEqual(self.store.findRegressions('testRig', threshold=4.0), [])
+
+    def test_resumedBuildsAreNotRecorded(self):
+        self.recordBuild([1.0, 2.0])
+        telemetry = self.recordBuild([2.0], firstRootIndex=1)
+        self.assertEqual(len(self.store.getBuilds('testRig')), 1)
+        # only the remaining steps are expected to run
+        self.assertAlmostEqual(telemetry.expectedTime, 2.0)
+
+    def test_reportCommand(self):
+        for i in range(3):
+            self.recordBuild([1.0, 1.0])
+        self.store.close()
+        self.assertEqual(pulse.telemetry.main(['--db', self.dbFile]), 0)
+        self.recordBuild([1.0, 3.0])
+        self.store.close()
+        self.assertEqual(pulse.telemetry.main(['--db', self.dbFile, 'testRig']), 1)
+
+
+class TestBuildLog(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.registerActions([CreateNodeTestAction])
+        self.tempDir = tempfile.mkdtemp()
+        self.blueprint = pulse.Blueprint()
+        self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName='loggedNode'))
+
+    def tearDown(self):
+        pm.newFile(force=True)
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def test_loggerIsRestored(self):
+        log = logging.getLogger('pulse.build')
+        handlers = list(log.handlers)
+        propagate = log.propagate
+        builder = pulse.BlueprintBuilder(self.blueprint, logDir=self.tempDir)
+        self.assertFalse(log.propagate)
+        builder.start()
+        self.assertEqual(log.propagate, propagate)
+        self.assertEqual(log.handlers, handlers)
+        with open(builder.logFile) as fp:
+            self.assertIn('Built Rig', fp.read())
+
+    def test_writeErrorsAreHandled(self):
+        handler = pulse.buildlog.QueuedFileHandler(os.path.join(self.tempDir, 'test.log'))
+        failedRecords = []
+        handler.handleError = failedRecords.append
+        stream = handler.stream
+
+        class FullStream(object):
+            def write(self, text):
+                raise IOError('No space left on device')
+
+        handler.stream = FullStream()
+        handler.handle(logging.makeLogRecord(dict(msg='lost')))
+        # does not block on the failed record
+        handler.flush()
+        self.assertEqual([r.msg for r in failedRecords], ['lost'])
+        # the writer thread is still running
+        handler.stream = stream
+        handler.handle(logging.makeLogRecord(dict(msg='written')))
+        handler.close()
+        with open(handler.filename) as fp:
+            self.assertEqual(fp.read(), 'written\n')
+
+
+class TestBuildTrace(unittest.TestCase):
+
+    def setUp(self):
+        pm.newFile(force=True)
+        pulse.registerActions([CreateNodeTestAction])
+        self.tempDir = tempfile.mkdtemp()
+        self.blueprint = pulse.Blueprint()
+        self.blueprint.rootGroup.addChild(CreateNodeTestAction(nodeName='tracedNode'))
+
+    def tearDown(self):
+        pm.newFile(force=True)
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def getActionEvents(self, countNodes):
+        builder = pulse.BlueprintBuilder(self.blueprint, logDir=self.tempDir, trace=True, countNodes=countNodes)
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        self.assertTrue(os.path.isfile(builder.traceFile))
+        return [e for e in builder.trace.getTraceEvents() if e['cat'] == 'action']
+
+    def test_countsNodes(self):
+        events = self.getActionEvents(countNodes=True)
+        self.assertEqual([e['args']['nodeDelta'] for e in events], [1])
+
+    def test_uncountedNodesAreOmitted(self):
+        events = self.getActionEvents(countNodes=False)
+        self.assertEqual(len(events), 1)
+        self.assertNotIn('nodeDelta', events[0]['args'])
+
+
+class TestCommandCounter(SavedSceneTestCase):
+
+    def setUp(self):
+        super(TestCommandCounter, self).setUp()
+        self.addNodeGroups(['nodeA', 'nodeB'])
+
+    def test_countsCommandsOfEachStep(self):
+        createNode = pm.cmds.createNode
+        builder = pulse.BlueprintBuilder(self.blueprint, countCommands=True)
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        # commands are no longer hooked after the build
+        self.assertIs(pm.cmds.createNode, createNode)
+        counter = builder.commandCounter
+        plan = self.blueprint.getPlan()
+        for index in range(plan.getActionCount()):
+            stats = dict([(name, count) for name, count, cumTime
+                          in counter.getCommandStats(plan.getActionPath(index))])
+            self.assertEqual(stats.get('createNode'), 1)
+            self.assertEqual(stats.get('setAttr'), 1)
+        offenderKeys = [o['key'] for o in counter.getTopOffenders()]
+        self.assertIn(plan.getActionPath(0), offenderKeys)
+        self.assertIn(plan.getActionPath(1), offenderKeys)
+
+
+class TestMemoryMonitor(SavedSceneTestCase):
+
+    def setUp(self):
+        super(TestMemoryMonitor, self).setUp()
+        self.addNodeGroups(['nodeA', 'nodeB'])
+
+    def test_recordsEachStep(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, trackMemory=True)
+        builder.start()
+        self.assertEqual(builder.errors, [])
+        monitor = builder.memoryMonitor
+        plan = self.blueprint.getPlan()
+        self.assertEqual([r.key for r in monitor.records], [plan.getActionPath(0), plan.getActionPath(1)])
+        for record in monitor.records:
+            self.assertEqual(record.deltas['nodes'], 1)
+            self.assertIn('objects', record.deltas)
+        summary = monitor.getSummary()
+        self.assertEqual(len(summary['nodes']), 2)
+        self.assertEqual(summary['nodes'][0]['delta'], 1)
+
+    def test_thresholdsCanBeOverridden(self):
+        builder = pulse.BlueprintBuilder(self.blueprint, trackMemory=True, memoryThresholds={'nodes': 0})
+        builder.start()
+        for record in builder.memoryMonitor.records:
+            self.assertEqual(record.getExceededThresholds(builder.memoryMonitor.thresholds), ['nodes'])
+
+
+class TestHeadlessBuild(SavedSceneTestCase):
+
+    def setUp(self):
+        super(TestHeadlessBuild, self).setUp()
+        # workers import pulse from the same paths as this process
+        self.pythonPath = os.environ.get('PYTHONPATH')
+        os.environ['PYTHONPATH'] = os.pathsep.join(sys.path)
+
+    def setUpScene(self):
+        blueprint = pulse.Blueprint()
+        blueprint.rigName = 'headlessRig'
+        blueprint.initializeDefaultActions()
+        blueprint.saveToDefaultNode()
+
+    def tearDown(self):
+        if self.pythonPath is None:
+            del os.environ['PYTHONPATH']
+        else:
+            os.environ['PYTHONPATH'] = self.pythonPath
+        super(TestHeadlessBuild, self).tearDown()
+
+    def test_buildBlueprintFiles(self):
+        missingFile = os.path.join(self.tempDir, 'missing.ma')
+        summary = pulse.build.buildBlueprintFiles(
+            [self.sceneFile, missingFile], workers=1, logDir=self.tempDir, telemetry=False)
+        self.assertEqual(summary['succeeded'], 1)
+        self.assertEqual(summary['failed'], 1)
+        built, failed = summary['results']
+        self.assertEqual(built['rigName'], 'headlessRig')
+        self.assertTrue(built['success'])
+        self.assertEqual(failed['blueprintFile'], missingFile)
+        self.assertTrue(failed['errors'])
+        self.assertTrue(set(built).issuperset(failed))
+
+    def test_workerCrash(self):
+        worker = pulse.build.BuildWorker(sys.executable)
+        worker.args = [sys.executable, '-c', 'import sys; sys.stdin.readline(); sys.exit(3)']
+        result = worker.build(self.sceneFile)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['returnCode'], 3)
+        self.assertIsNone(result['rigName'])
+        self.assertIsNone(result['buildTime'])
+        self.assertIsNone(worker.proc)
+
+    def test_workerTimeout(self):
+        worker = pulse.build.BuildWorker(sys.executable, timeout=1)
+        worker.args = [sys.executable, '-c', 'import time; time.sleep(60)']
+        result = worker.build(self.sceneFile)
+        self.assertFalse(result['success'])
+        self.assertTrue(result['isTimedOut'])
+        self.assertIn('timed out', result['errors'][0])
+        self.assertLess(result['wallTime'], 30)
+        self.assertIsNone(result['buildTime'])
+        self.assertIsNone(worker.proc)